@@ -0,0 +1,141 @@
+"""Кэш ответов API Практикума для условных запросов."""
+import hashlib
+import re
+import threading
+import time
+from http import HTTPStatus
+
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(\d+)')
+
+
+class CachedResponse:
+    """Валидаторы и хэш последнего обработанного ответа одной подписки.
+
+    Поле current_date меняется в каждом ответе, поэтому хэш считается
+    по телу без него: пустые ответы подряд дают один и тот же хэш,
+    и их не нужно ни декодировать, ни проверять.
+    """
+
+    __slots__ = ('etag', 'last_modified', 'digest', '_candidate')
+
+    def __init__(self):
+        """Пустой кэш: запросы уходят без валидаторов."""
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self._candidate = None
+
+    def headers(self):
+        """Заголовки условного запроса."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def is_fresh(self, response):
+        """Совпадает ли ответ с последним обработанным."""
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            self._candidate = None
+            return True
+        self._candidate = hashlib.blake2b(
+            CURRENT_DATE.sub(b'', response.content), digest_size=16
+        ).digest()
+        return self._candidate == self.digest
+
+    def commit(self, response):
+        """Запоминает ответ после того, как он успешно обработан."""
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        if self._candidate is not None:
+            self.digest = self._candidate
+
+
+class SharedResponse:
+    """Ответ API, общий для подписок, получивших его одним запросом.
+
+    Тело разбирается не больше одного раза, при первом вызове parse();
+    ошибка разбора тоже запоминается и достаётся всем подпискам.
+    Исход запроса сообщается один раз на весь ответ: on_failure, если
+    тело не разобралось, иначе on_success - после разбора или при
+    settle(), когда разбор не понадобился.
+    """
+
+    __slots__ = (
+        'response', '_parse', '_parsed', '_error', '_on_success',
+        '_on_failure', '_settled', '_lock',
+    )
+
+    def __init__(self, response, parse, on_success=None, on_failure=None):
+        """Ответ response; parse разбирает его тело."""
+        self.response = response
+        self._parse = parse
+        self._parsed = None
+        self._error = None
+        self._on_success = on_success
+        self._on_failure = on_failure
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def parse(self):
+        """Разобранное тело ответа."""
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            if self._parsed is None:
+                try:
+                    self._parsed = self._parse(self.response.content)
+                except Exception as error:
+                    self._error = error
+                    self._settle(self._on_failure)
+                    raise
+                self._settle(self._on_success)
+            return self._parsed
+
+    def settle(self):
+        """Сообщает об успехе, если исход ещё не сообщён."""
+        with self._lock:
+            self._settle(self._on_success)
+
+    def _settle(self, callback):
+        if not self._settled:
+            self._settled = True
+            if callback is not None:
+                callback()
+
+
+def current_date(response):
+    """current_date из тела ответа без полного разбора JSON."""
+    match = CURRENT_DATE.search(response.content or b'')
+    return int(match.group(1)) if match else None
+
+
+class TTLCache:
+    """Кэш значений на ttl секунд с чтением через load().
+
+    Хранит не больше max_size ключей: при переполнении вытесняются
+    самые старые записи.
+    """
+
+    def __init__(self, ttl, max_size=1024, clock=time.monotonic):
+        """Кэш на ttl секунд не больше чем на max_size ключей."""
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """Значение из кэша или результат load(), который запоминается."""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[0] > self.clock():
+                return entry[1]
+        value = load()
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (self.clock() + self.ttl, value)
+            while len(self._items) > self.max_size:
+                del self._items[next(iter(self._items))]
+        return value
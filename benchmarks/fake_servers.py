@@ -0,0 +1,191 @@
+"""Локальные заглушки API Я.Практикума и Telegram Bot API.
+
+Статус работы каждого токена меняется каждые change_period секунд от
+общего момента start, поэтому заглушка Telegram сама вычисляет, сколько
+прошло от смены статуса до получения уведомления.
+"""
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STATUSES = ('reviewing', 'rejected', 'reviewing', 'approved')
+HOMEWORK_NAME = re.compile(r'"(?P<token>[^"#]+)#(?P<change>\d+)"')
+
+
+def percentile(values, share):
+    """Перцентиль отсортированного списка."""
+    if not values:
+        return None
+    position = min(int(len(values) * share), len(values) - 1)
+    return values[position]
+
+
+class Options:
+    """Параметры заглушек."""
+
+    def __init__(self, start, change_period=5.0, api_latency=0.0,
+                 api_error_rate=0.0, payload_size=0, telegram_latency=0.0,
+                 telegram_error_rate=0.0):
+        """Параметры заглушек; start - момент запуска прогона."""
+        self.start = start
+        self.change_period = change_period
+        self.api_latency = api_latency
+        self.api_error_rate = api_error_rate
+        self.payload_size = payload_size
+        self.telegram_latency = telegram_latency
+        self.telegram_error_rate = telegram_error_rate
+
+    def change_time(self, change):
+        """Момент смены статуса номер change."""
+        return self.start + change * self.change_period
+
+
+class StatsMixin:
+    """Отдаёт накопленную статистику по GET /__stats."""
+
+    def send_json(self, data, status=200):
+        """Ответ в формате JSON."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Заглушки не пишут в лог каждый запрос."""
+
+
+class PracticumHandler(StatsMixin, BaseHTTPRequestHandler):
+    """Заглушка эндпоинта homework_statuses."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """Ответ со статусом единственной работы токена."""
+        server = self.server
+        url = urlsplit(self.path)
+        if url.path == '/__stats':
+            self.send_json(server.stats())
+            return
+        options = server.options
+        time.sleep(options.api_latency)
+        server.count('requests')
+        if random.random() < options.api_error_rate:
+            server.count('errors')
+            self.send_json({'code': 'unavailable'}, status=500)
+            return
+        token = self.headers.get('Authorization', '').replace('OAuth ', '')
+        from_date = int(parse_qs(url.query).get('from_date', ['0'])[0])
+        now = time.time()
+        change = int((now - options.start) // options.change_period)
+        homeworks = []
+        changed_at = options.change_time(change)
+        if change >= 0 and int(changed_at) >= from_date:
+            homeworks.append({
+                'id': token,
+                'status': STATUSES[change % len(STATUSES)],
+                'homework_name': f'{token}#{change}',
+                'reviewer_comment': 'x' * options.payload_size,
+                'date_updated': datetime.fromtimestamp(
+                    changed_at, timezone.utc
+                ).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'lesson_name': 'Итоговый проект',
+            })
+        self.send_json({'homeworks': homeworks, 'current_date': int(now)})
+
+
+class TelegramHandler(StatsMixin, BaseHTTPRequestHandler):
+    """Заглушка метода sendMessage Bot API."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """Статистика доставленных уведомлений."""
+        self.send_json(self.server.stats())
+
+    def do_POST(self):
+        """Принимает сообщение и считает задержку уведомления."""
+        server = self.server
+        options = server.options
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(options.telegram_latency)
+        if random.random() < options.telegram_error_rate:
+            server.count('errors')
+            self.send_json(
+                {'ok': False, 'error_code': 429, 'description': 'Too Many',
+                 'parameters': {'retry_after': 1}},
+                status=429,
+            )
+            return
+        received = time.time()
+        server.count('messages')
+        for match in HOMEWORK_NAME.finditer(data.get('text', '')):
+            changed_at = options.change_time(int(match.group('change')))
+            server.observe(received - changed_at)
+        self.send_json({'ok': True, 'result': {
+            'message_id': server.counters['messages'],
+            'date': int(received),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+
+class FakeServer(ThreadingHTTPServer):
+    """HTTP-сервер заглушки со счётчиками."""
+
+    daemon_threads = True
+
+    def __init__(self, handler, options, host='127.0.0.1', port=0):
+        """Сервер с обработчиком handler на host:port."""
+        super().__init__((host, port), handler)
+        self.options = options
+        self.counters = {'requests': 0, 'errors': 0, 'messages': 0}
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Адрес сервера."""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name):
+        """Увеличивает счётчик."""
+        with self._lock:
+            self.counters[name] += 1
+
+    def observe(self, latency):
+        """Запоминает задержку уведомления."""
+        with self._lock:
+            self.latencies.append(latency)
+
+    def stats(self):
+        """Счётчики и перцентили задержек."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters)
+        stats['notifications'] = len(latencies)
+        stats['latency_p50'] = percentile(latencies, 0.5)
+        stats['latency_p99'] = percentile(latencies, 0.99)
+        return stats
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def serve(options, connection):
+    """Точка входа процесса заглушек: отдаёт адреса и работает до kill."""
+    practicum = FakeServer(PracticumHandler, options).start()
+    telegram = FakeServer(TelegramHandler, options).start()
+    connection.send((practicum.url, telegram.url))
+    connection.recv()
@@ -0,0 +1,131 @@
+"""Прогон бота с N подписками на локальных заглушках.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run --subscriptions 1000 --duration 60
+
+Заглушки работают в отдельном процессе, поэтому CPU и RSS в отчёте
+относятся только к боту.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import resource
+import time
+import urllib.request
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from benchmarks.fake_servers import Options, serve
+from state import MemoryStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+
+
+def parse_args(argv=None):
+    """Параметры прогона."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscriptions', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--retry-time', type=int, default=2)
+    parser.add_argument('--change-period', type=float, default=5)
+    parser.add_argument('--api-latency', type=float, default=0.01)
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--payload-size', type=int, default=0)
+    parser.add_argument('--telegram-latency', type=float, default=0.01)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--max-in-flight', type=int, default=32)
+    return parser.parse_args(argv)
+
+
+def fetch_stats(url):
+    """Статистика заглушки."""
+    with urllib.request.urlopen(f'{url}/__stats') as response:
+        return json.load(response)
+
+
+def configure_bot(args, practicum_url):
+    """Настраивает модуль бота на заглушки и параметры прогона."""
+    homework.logger = logging.getLogger('homework_bot')
+    logging.getLogger('homework_bot').setLevel(logging.WARNING)
+    homework.ENDPOINT = f'{practicum_url}/api/user_api/homework_statuses/'
+    homework.RETRY_TIME = args.retry_time
+    homework.REVIEWING_RETRY_TIME = args.retry_time
+    homework.IDLE_RETRY_TIME = args.retry_time
+    homework.MAX_BACKOFF = args.retry_time * 4
+    homework.MAX_IN_FLIGHT = args.max_in_flight
+    homework.HTTP_POOL_SIZE = args.max_in_flight
+
+
+def run_bot(args, telegram_url):
+    """Гоняет движок бота duration секунд."""
+    registry = SubscriptionRegistry(
+        Subscription(f'token{number}', number)
+        for number in range(args.subscriptions)
+    )
+    bot = telegram.Bot(
+        token='123456:benchmark',
+        base_url=f'{telegram_url}/bot',
+        request=Request(con_pool_size=homework.OUTBOX_WORKERS),
+    )
+    engine = homework.build_engine(registry, bot, MemoryStateStore())
+
+    async def run():
+        asyncio.get_running_loop().call_later(args.duration, engine.stop)
+        await engine.run()
+
+    asyncio.run(run())
+
+
+def main(argv=None):
+    """Запускает заглушки, бота и печатает отчёт в JSON."""
+    args = parse_args(argv)
+    options = Options(
+        start=time.time() + args.retry_time,
+        change_period=args.change_period,
+        api_latency=args.api_latency,
+        api_error_rate=args.api_error_rate,
+        payload_size=args.payload_size,
+        telegram_latency=args.telegram_latency,
+        telegram_error_rate=args.telegram_error_rate,
+    )
+    parent, child = multiprocessing.Pipe()
+    servers = multiprocessing.Process(
+        target=serve, args=(options, child), daemon=True
+    )
+    servers.start()
+    practicum_url, telegram_url = parent.recv()
+
+    configure_bot(args, practicum_url)
+    started = time.monotonic()
+    cpu_started = time.process_time()
+    run_bot(args, telegram_url)
+    elapsed = time.monotonic() - started
+    cpu = time.process_time() - cpu_started
+
+    api = fetch_stats(practicum_url)
+    notifications = fetch_stats(telegram_url)
+    servers.kill()
+    report = {
+        'subscriptions': args.subscriptions,
+        'duration': round(elapsed, 3),
+        'polls': api['requests'],
+        'polls_per_sec': round(api['requests'] / elapsed, 2),
+        'api_errors': api['errors'],
+        'messages': notifications['messages'],
+        'notifications': notifications['notifications'],
+        'latency_p50': notifications['latency_p50'],
+        'latency_p99': notifications['latency_p99'],
+        'cpu_seconds': round(cpu, 3),
+        'cpu_percent': round(100 * cpu / elapsed, 1),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == '__main__':
+    main()
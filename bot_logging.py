@@ -0,0 +1,120 @@
+"""Настройка логирования: очередь, ротация файлов и JSON-строки."""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s - %(name)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись как одну строку JSON."""
+
+    def format(self, record):
+        """Запись лога в виде JSON-объекта."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class ThreadQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler для очереди внутри процесса.
+
+    Запись кладётся в очередь как есть: форматирование и ввод-вывод
+    выполняет поток QueueListener, а не поток, который пишет в лог.
+    """
+
+    def prepare(self, record):
+        """Запись не нужно готовить к сериализации."""
+        return record
+
+
+def file_handler(path, max_bytes=0, backup_count=5, when=None):
+    """Файловый обработчик с ротацией по размеру или по времени."""
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='UTF-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, mode='a', maxBytes=max_bytes, backupCount=backup_count,
+        encoding='UTF-8',
+    )
+
+
+def configure(logger, level, handlers, json_lines=False, use_queue=True):
+    """Подключает обработчики к логгеру, при use_queue - через очередь.
+
+    Возвращает запущенный QueueListener или None.
+    """
+    text_formatter = logging.Formatter(TEXT_FORMAT)
+    for handler in handlers:
+        is_stream = type(handler) is logging.StreamHandler
+        handler.setFormatter(
+            JsonFormatter() if json_lines and not is_stream
+            else text_formatter
+        )
+    logger.setLevel(level)
+    if not use_queue:
+        for handler in handlers:
+            logger.addHandler(handler)
+        return None
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(stop_listener, listener)
+    logger.addHandler(ThreadQueueHandler(log_queue))
+    return listener
+
+
+def stop_listener(listener):
+    """Дописывает очередь и останавливает поток; повторный вызов безопасен."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+class ForwardHandler(logging.Handler):
+    """Передаёт запись логгеру с тем же именем в этом процессе."""
+
+    def handle(self, record):
+        """Запись обрабатывается обработчиками логгера record.name."""
+        logging.getLogger(record.name).handle(record)
+        return True
+
+    def emit(self, record):
+        """Вывод выполняет handle."""
+
+
+def forward(log_queue):
+    """Слушатель очереди записей из процессов-воркеров.
+
+    Записи попадают в логгеры супервизора и пишутся его обработчиками,
+    так что в файл лога пишет только один процесс.
+    """
+    listener = logging.handlers.QueueListener(log_queue, ForwardHandler())
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def configure_worker(logger, level, log_queue):
+    """Логи воркера уходят в очередь между процессами."""
+    logger.handlers.clear()
+    logger.setLevel(level)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    return logger
+
+
+def stdout_handler():
+    """Обработчик вывода в stdout."""
+    return logging.StreamHandler(stream=sys.stdout)
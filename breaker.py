@@ -0,0 +1,100 @@
+"""Предохранитель (circuit breaker) для запросов к внешнему API."""
+import enum
+import threading
+import time
+
+
+class BreakerState(enum.Enum):
+    """Состояние предохранителя."""
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold сбоев API подряд.
+
+    В разомкнутом состоянии запросы не выполняются. Через reset_timeout
+    секунд предохранитель пропускает half_open_calls пробных запросов:
+    успех замыкает его, сбой снова размыкает. on_change(old, new)
+    вызывается при каждой смене состояния вне блокировки.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60,
+                 half_open_calls=1, on_change=None, clock=time.monotonic):
+        """Предохранитель в замкнутом состоянии."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.on_change = on_change
+        self.clock = clock
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+        self._trials = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Текущее состояние с учётом истёкшего reset_timeout."""
+        with self._lock:
+            change = self._expire()
+        self._notify(change)
+        return self._state
+
+    def allow(self):
+        """Можно ли выполнить запрос сейчас."""
+        with self._lock:
+            change = self._expire()
+            if self._state is BreakerState.CLOSED:
+                allowed = True
+            elif (
+                self._state is BreakerState.HALF_OPEN
+                and self._trials < self.half_open_calls
+            ):
+                self._trials += 1
+                allowed = True
+            else:
+                allowed = False
+        self._notify(change)
+        return allowed
+
+    def record_success(self):
+        """API ответило: сбрасывает счётчик и замыкает предохранитель."""
+        with self._lock:
+            self._failures = 0
+            change = None
+            if self._state is BreakerState.HALF_OPEN:
+                change = self._set(BreakerState.CLOSED)
+        self._notify(change)
+
+    def record_failure(self):
+        """Сбой API: после порога или пробного запроса размыкает."""
+        with self._lock:
+            self._failures += 1
+            change = None
+            if self._state is BreakerState.HALF_OPEN or (
+                self._state is BreakerState.CLOSED
+                and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = self.clock()
+                change = self._set(BreakerState.OPEN)
+        self._notify(change)
+
+    def _expire(self):
+        if (
+            self._state is BreakerState.OPEN
+            and self.clock() - self._opened_at >= self.reset_timeout
+        ):
+            self._trials = 0
+            return self._set(BreakerState.HALF_OPEN)
+        return None
+
+    def _set(self, state):
+        old, self._state = self._state, state
+        return old, state
+
+    def _notify(self, change):
+        if change is not None and self.on_change is not None:
+            self.on_change(*change)
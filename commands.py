@@ -0,0 +1,84 @@
+"""Команды боту в Telegram, полученные через long polling."""
+import logging
+import threading
+
+from telegram.error import TelegramError
+
+logger = logging.getLogger('homework_bot.commands')
+
+
+def parse_command(text):
+    """Пара (команда, аргумент) из текста сообщения или None.
+
+    Упоминание бота в команде (/status@homework_bot) отбрасывается.
+    """
+    if not text or not text.startswith('/'):
+        return None
+    command, _, argument = text[1:].partition(' ')
+    return command.split('@', 1)[0].lower(), argument.strip()
+
+
+class UpdatePoller:
+    """Забирает сообщения getUpdates в фоновом потоке.
+
+    handle(chat_id, command, argument) вызывается в потоке опроса для
+    каждой команды; непустой ответ уходит через reply(chat_id, text).
+    Сбои Telegram пишутся в лог, и опрос повторяется через retry_delay.
+    """
+
+    def __init__(self, bot, handle, reply, timeout=30, retry_delay=5):
+        """Приёмник команд бота bot; ответы уходят через reply."""
+        self.bot = bot
+        self.handle = handle
+        self.reply = reply
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self._offset = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def poll_once(self):
+        """Один запрос getUpdates; возвращает число обработанных команд."""
+        updates = self.bot.get_updates(
+            offset=self._offset, timeout=self.timeout,
+            allowed_updates=['message'],
+        )
+        handled = 0
+        for update in updates:
+            self._offset = update.update_id + 1
+            message = update.effective_message
+            parsed = message and parse_command(message.text)
+            if not parsed:
+                continue
+            chat_id = message.chat_id
+            try:
+                answer = self.handle(chat_id, *parsed)
+                if answer:
+                    self.reply(chat_id, answer)
+            except Exception as error:
+                logger.error(
+                    f'Сбой при обработке команды /{parsed[0]} - {error}'
+                )
+                continue
+            handled += 1
+        return handled
+
+    def start(self):
+        """Запускает опрос в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self._run, name='commands', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает опрос, не дожидаясь текущего getUpdates."""
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll_once()
+            except TelegramError as error:
+                logger.error(f'Не удалось получить команды - {error}')
+                self._stopped.wait(self.retry_delay)
@@ -0,0 +1,179 @@
+"""Файл конфигурации, который можно менять без перезапуска бота."""
+import json
+import logging
+import os
+import threading
+
+from exceptions import ConfigError, HomeworksBotError
+from records import HomeworkStatus
+
+logger = logging.getLogger('homework_bot.config')
+
+INTERVALS = (
+    'retry_time', 'reviewing_retry_time', 'idle_retry_time', 'max_backoff',
+)
+KEYS = frozenset(
+    INTERVALS + ('endpoint', 'homework_statuses', 'subscriptions')
+)
+
+
+class Config:
+    """Проверенная конфигурация.
+
+    intervals - словарь интервалов из INTERVALS в секундах,
+    subscriptions - список пар (token, chat_id) или None, если
+    подписки в файле не заданы.
+    """
+
+    __slots__ = ('intervals', 'endpoint', 'homework_statuses', 'subscriptions')
+
+    def __init__(self, intervals, endpoint, homework_statuses,
+                 subscriptions=None):
+        """Настройки; subscriptions - None, если подписки не заданы."""
+        self.intervals = intervals
+        self.endpoint = endpoint
+        self.homework_statuses = homework_statuses
+        self.subscriptions = subscriptions
+
+
+def _intervals(data, defaults):
+    intervals = dict(defaults.intervals)
+    for key in INTERVALS:
+        if key not in data:
+            continue
+        value = data[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ConfigError(f'{key} должен быть целым числом секунд > 0')
+        intervals[key] = value
+    return intervals
+
+
+def _endpoint(data, defaults):
+    endpoint = data.get('endpoint', defaults.endpoint)
+    if not isinstance(endpoint, str) or not endpoint.startswith(
+        ('http://', 'https://')
+    ):
+        raise ConfigError(f'endpoint должен быть URL, а не {endpoint!r}')
+    return endpoint
+
+
+def _statuses(data, defaults):
+    statuses = dict(defaults.homework_statuses)
+    update = data.get('homework_statuses', {})
+    if not isinstance(update, dict):
+        raise ConfigError('homework_statuses должен быть объектом')
+    known = {status.value for status in HomeworkStatus}
+    for status, verdict in update.items():
+        if status not in known:
+            raise ConfigError(f'Неизвестный статус работы {status!r}')
+        if not isinstance(verdict, str) or not verdict:
+            raise ConfigError(f'Вердикт для {status!r} должен быть строкой')
+        if '{' in verdict or '}' in verdict:
+            raise ConfigError(f'Фигурные скобки в вердикте для {status!r}')
+        statuses[status] = verdict
+    return statuses
+
+
+def _subscriptions(data):
+    if 'subscriptions' not in data:
+        return None
+    items = data['subscriptions']
+    if not isinstance(items, list):
+        raise ConfigError('subscriptions должен быть списком')
+    pairs = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ConfigError(f'Неверная подписка {item!r}')
+        token, chat_id = item.get('token'), item.get('chat_id')
+        if not isinstance(token, str) or not token:
+            raise ConfigError(f'У подписки {item!r} нет токена')
+        if isinstance(chat_id, bool) or not isinstance(chat_id, (int, str)):
+            raise ConfigError(f'У подписки {item!r} нет chat_id')
+        pairs.append((token, chat_id))
+    return pairs
+
+
+def parse_config(data, defaults):
+    """Проверяет данные файла и дополняет их значениями defaults."""
+    if not isinstance(data, dict):
+        raise ConfigError('Конфигурация должна быть объектом JSON')
+    unknown = data.keys() - KEYS
+    if unknown:
+        raise ConfigError(f'Неизвестные ключи: {", ".join(sorted(unknown))}')
+    return Config(
+        _intervals(data, defaults),
+        _endpoint(data, defaults),
+        _statuses(data, defaults),
+        _subscriptions(data),
+    )
+
+
+def load_config(path, defaults):
+    """Читает и проверяет файл конфигурации."""
+    try:
+        with open(path, encoding='UTF-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError) as error:
+        raise ConfigError(f'Не удалось прочитать {path} - {error}') from error
+    return parse_config(data, defaults)
+
+
+class FileWatcher:
+    """Следит за файлами и вызывает reload() после их изменения.
+
+    Изменение определяется по времени модификации и размеру. Если
+    reload() бросил HomeworksBotError, ошибка пишется в лог, а
+    прежняя конфигурация продолжает действовать.
+    """
+
+    def __init__(self, paths, reload, interval=2.0):
+        """Запоминает состояние файлов paths; None среди путей пропускается."""
+        self.paths = [path for path in paths if path]
+        self.reload = reload
+        self.interval = interval
+        self._signature = self._stat()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Проверяет файлы; возвращает True, если изменения применены."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.reload()
+        except HomeworksBotError as error:
+            logger.error(f'Конфигурация не применена - {error}')
+            return False
+        logger.info('Конфигурация перечитана')
+        return True
+
+    def start(self):
+        """Запускает проверку в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self._run, name='config', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает проверку."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _stat(self):
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return signature
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
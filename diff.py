@@ -0,0 +1,65 @@
+"""Определение изменившихся статусов работ."""
+import threading
+from collections import Counter
+
+
+class HomeworkIndex:
+    """Индекс последних отправленных статусов работ одной подписки.
+
+    Хранит для каждой работы пару (status, date_updated) по ключу
+    записи Homework. changes() сравнивает пары, а не тексты сообщений,
+    и смотрит только на работы из ответа API, то есть на обновлённые
+    после from_date.
+
+    Индекс пишут потоки опроса и приёма событий, а читают цикл движка
+    и команды, поэтому изменение и обход словаря идут под блокировкой.
+    """
+
+    __slots__ = ('_entries', '_on_commit', '_lock')
+
+    def __init__(self, entries=None, on_commit=None):
+        """Индекс из сохранённых записей entries."""
+        self._entries = {} if entries is None else entries
+        self._on_commit = on_commit
+        self._lock = threading.Lock()
+
+    def changes(self, homeworks):
+        """Работы, состояние которых отличается от индекса.
+
+        Порядок - от старых изменений к новым: API отдаёт работы
+        начиная с последней обновлённой.
+        """
+        entries = self._entries
+        return [
+            homework for homework in reversed(homeworks)
+            if entries.get(homework.key) != homework.state
+        ]
+
+    def commit(self, homework):
+        """Запоминает состояние работы после успешной отправки."""
+        with self._lock:
+            self._entries[homework.key] = homework.state
+        if self._on_commit is not None:
+            self._on_commit(
+                homework.key, homework.status, homework.date_updated
+            )
+
+    def has_status(self, status):
+        """Есть ли в индексе работа с указанным статусом."""
+        with self._lock:
+            return any(
+                state[0] == status for state in self._entries.values()
+            )
+
+    def count_statuses(self):
+        """Сколько работ в каждом статусе."""
+        with self._lock:
+            return Counter(state[0] for state in self._entries.values())
+
+    def get(self, key):
+        """Пара (status, date_updated) работы или None."""
+        return self._entries.get(key)
+
+    def __len__(self):
+        """Количество работ в индексе."""
+        return len(self._entries)
@@ -0,0 +1,181 @@
+"""Асинхронный движок опроса подписок."""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import PollOutcome
+
+logger = logging.getLogger('homework_bot.engine')
+
+
+class AsyncEngine:
+    """Опрашивает подписки конкурентно по расписанию планировщика.
+
+    poll - блокирующая функция опроса одной подписки. Она выполняется
+    в пуле потоков, поэтому медленный ответ API или Telegram по одной
+    подписке не задерживает остальные. Число одновременных опросов
+    ограничено max_in_flight, частота запросов - rate_limiter; при
+    нехватке слотов планировщик отдаёт опросы по классам приоритета.
+    Результат poll передаётся планировщику для выбора интервала.
+    Если admit(subscription) вернул False, опрос сбрасывается без
+    запуска и планируется заново с результатом SHED. После stop()
+    новые опросы не запускаются, а начатые дожидаются до deadline -
+    drain_timeout секунд от вызова stop(). Тот же срок остаётся
+    функциям at_exit на остальные этапы остановки.
+    """
+
+    def __init__(self, scheduler, poll, max_in_flight=16,
+                 rate_limiter=None, admit=None, drain_timeout=None):
+        """Движок с планировщиком scheduler и функцией опроса poll."""
+        self.scheduler = scheduler
+        self.poll = poll
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = rate_limiter
+        self.admit = admit
+        self.drain_timeout = drain_timeout
+        self.deadline = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix='poll'
+        )
+        self._semaphore = None
+        self._wakeup = None
+        self._tasks = set()
+        self._running = False
+        self._starters = []
+        self._closers = []
+        self._detached = set()
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Выполняет блокирующий вызов в пуле потоков движка."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def at_start(self, callback):
+        """Регистрирует функцию, которая вызовется в запущенном цикле."""
+        self._starters.append(callback)
+
+    def at_exit(self, callback):
+        """Регистрирует функцию, которая вызовется после остановки цикла.
+
+        Функции вызываются в обратном порядке регистрации.
+        """
+        self._closers.append(callback)
+
+    async def run(self):
+        """Основной цикл: запускает опросы, время которых наступило."""
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._running = True
+        try:
+            for callback in self._starters:
+                callback()
+            while self._running:
+                self._dispatch()
+                await self._sleep_until_next()
+            if self._tasks:
+                timeout = None
+                if self.deadline is not None:
+                    timeout = max(self.deadline - time.monotonic(), 0)
+                _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+                if pending:
+                    logger.warning(
+                        f'Не дождались завершения опросов: {len(pending)}'
+                    )
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            self._executor.shutdown(wait=False)
+            for callback in reversed(self._closers):
+                callback()
+
+    def stop(self):
+        """Останавливает цикл после завершения текущих опросов.
+
+        Срок остановки deadline (по time.monotonic) считается от первого
+        вызова.
+        """
+        if self.deadline is None and self.drain_timeout is not None:
+            self.deadline = time.monotonic() + self.drain_timeout
+        self._running = False
+        self._wake()
+
+    def add(self, subscription):
+        """Ставит подписку в расписание работающего движка."""
+        self._detached.discard(subscription.key)
+        self.scheduler.add(subscription)
+        self._wake()
+
+    def remove(self, subscription):
+        """Снимает подписку; начатый опрос не будет перепланирован."""
+        self._detached.add(subscription.key)
+        self.scheduler.remove(subscription)
+
+    def retune(self, interval, policy):
+        """Меняет интервалы опроса работающего движка."""
+        self.scheduler.retune(interval, policy)
+        self._wake()
+
+    @property
+    def in_flight(self):
+        """Количество опросов, которые сейчас выполняются или ждут слота."""
+        return len(self._tasks)
+
+    def _dispatch(self):
+        # Берём из планировщика не больше свободных слотов: остальные
+        # наступившие опросы ждут там в очереди своего приоритета.
+        while len(self._tasks) < self.max_in_flight:
+            due = self.scheduler.pop_due(
+                limit=self.max_in_flight - len(self._tasks)
+            )
+            if not due:
+                return
+            for subscription in due:
+                if self.admit is None or self.admit(subscription):
+                    self._spawn(subscription)
+                else:
+                    self.scheduler.reschedule(subscription, PollOutcome.SHED)
+
+    def _spawn(self, subscription):
+        task = asyncio.ensure_future(self._poll(subscription))
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        # Слот освобождается только здесь, поэтому и будим цикл здесь.
+        self._tasks.discard(task)
+        self._wakeup.set()
+
+    async def _poll(self, subscription):
+        outcome = None
+        async with self._semaphore:
+            try:
+                if self.rate_limiter is not None:
+                    await asyncio.sleep(self.rate_limiter.reserve())
+                self.scheduler.started(subscription)
+                outcome = await self.run_blocking(self.poll, subscription)
+            finally:
+                if subscription.key in self._detached:
+                    self._detached.discard(subscription.key)
+                else:
+                    self.scheduler.reschedule(subscription, outcome)
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _sleep_until_next(self):
+        deadline = self.scheduler.next_deadline()
+        timeout = None
+        # Без свободных слотов будит только завершение опроса.
+        if deadline is not None and len(self._tasks) < self.max_in_flight:
+            timeout = max(deadline - self.scheduler.clock(), 0)
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
@@ -24,4 +24,31 @@ class StatusCodeError(HomeworksBotError):
     Статус_код не 200.
     """
 
+    def __init__(self, message='', status_code=None):
+        """Ошибка с HTTP-кодом ответа или None для сетевого сбоя."""
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SubscriptionError(HomeworksBotError):
+    """Ошибка загрузки реестра подписок."""
+
+    pass
+
+
+class ResponseFormatError(HomeworksBotError, TypeError):
+    """Ответ API не соответствует ожидаемой схеме."""
+
+    pass
+
+
+class CircuitOpenError(HomeworksBotError):
+    """Запрос не выполнен: предохранитель API разомкнут."""
+
+    pass
+
+
+class ConfigError(HomeworksBotError):
+    """Файл конфигурации не прошёл проверку."""
+
     pass
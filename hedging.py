@@ -0,0 +1,111 @@
+"""Дублирующие (hedged) запросы для срезания хвоста задержек."""
+import bisect
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import API_HEDGES
+
+
+class LatencyTracker:
+    """Скользящий квантиль задержки по последним window запросам."""
+
+    def __init__(self, window=200, quantile=0.95, min_samples=20):
+        """Окно из window последних задержек."""
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Учитывает задержку одного запроса."""
+        with self._lock:
+            if len(self._samples) == self._samples.maxlen:
+                oldest = self._samples[0]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._samples.append(value)
+            bisect.insort(self._sorted, value)
+
+    def value(self):
+        """Квантиль или None, пока наблюдений меньше min_samples."""
+        with self._lock:
+            if len(self._sorted) < self.min_samples:
+                return None
+            position = int(self.quantile * (len(self._sorted) - 1))
+            return self._sorted[position]
+
+
+class HedgedClient:
+    """Обёртка над сессией: get() с дублирующим запросом.
+
+    Если первый запрос не ответил за квантиль задержки (но не раньше
+    min_delay), отправляется второй такой же, и возвращается ответ,
+    пришедший первым. Проигравший запрос не прерывается - он
+    ограничен собственными таймаутами, - а его ответ закрывается,
+    как только он придёт. Пока задержка не набрана или enabled()
+    возвращает False, запросы не дублируются.
+    """
+
+    def __init__(self, session, tracker=None, max_workers=32,
+                 min_delay=0.05, enabled=None, clock=time.monotonic):
+        """Клиент поверх сессии session."""
+        self.session = session
+        self.tracker = tracker or LatencyTracker()
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='hedge'
+        )
+
+    def hedge_delay(self):
+        """Через сколько секунд отправлять второй запрос или None."""
+        if self.enabled is not None and not self.enabled():
+            return None
+        latency = self.tracker.value()
+        if latency is None:
+            return None
+        return max(latency, self.min_delay)
+
+    def get(self, **kwargs):
+        """GET с дублированием; интерфейс как у requests.Session.get."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(kwargs)
+        first = self._executor.submit(self._timed, kwargs)
+        done, _ = wait([first], delay)
+        if done:
+            return first.result()
+        API_HEDGES.labels('sent').inc()
+        second = self._executor.submit(self._timed, kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    if future is second:
+                        API_HEDGES.labels('won').inc()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def close(self):
+        """Закрывает пул потоков и сессию."""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _timed(self, kwargs):
+        started = self.clock()
+        response = self.session.get(**kwargs)
+        self.tracker.observe(self.clock() - started)
+        return response
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
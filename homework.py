@@ -1,14 +1,51 @@
+import asyncio
+import functools
 import logging
+import multiprocessing
 import os
+import signal
+import socket
 import sys
 import time
+from collections import OrderedDict
 from http import HTTPStatus
 
 import requests
 import telegram
 from dotenv import load_dotenv
+from telegram.utils.request import Request
 
-from exceptions import ErrorApi, ErrorSendMessage, StatusCodeError
+import bot_logging
+import tracing
+from api_cache import (CachedResponse, SharedResponse, TTLCache,
+                       current_date)
+from breaker import BreakerState, CircuitBreaker
+from commands import UpdatePoller
+from config import Config, FileWatcher, load_config
+from diff import HomeworkIndex
+from engine import AsyncEngine
+from exceptions import (CircuitOpenError, ErrorApi, ErrorSendMessage,
+                        HomeworksBotError, ResponseFormatError,
+                        StatusCodeError)
+from hedging import HedgedClient
+from http_pool import PooledSession
+from ingest import IngestServer
+from leases import LeaseKeeper, LeaseStore
+from metrics import (API_BREAKER, API_CACHE_HITS, API_LATENCY,
+                     API_RESPONSES, CHECK_RESPONSE_FAILURES, HTTP_POOL,
+                     MESSAGES_FAILED, MESSAGES_SENT, OUTBOX_BACKLOG,
+                     POLLS_SHED, SUBSCRIPTIONS, start_metrics_server)
+from outbox import Outbox
+from profiling import Profiler
+from records import compile_templates
+from scheduler import AdaptiveInterval, PollOutcome, Scheduler, TokenBucket
+from schema import parse_response
+from sharding import Ownership, Supervisor, WorkerChannel
+from singleflight import SingleFlight
+from state import open_state_store
+from subscriptions import (Subscription, SubscriptionRegistry,
+                           load_subscriptions)
+from timeline import Timeline
 
 load_dotenv()
 
@@ -16,10 +53,61 @@ load_dotenv()
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+CONFIG_FILE = os.getenv('CONFIG_FILE')
+CONFIG_CHECK_TIME = float(os.getenv('CONFIG_CHECK_TIME', 2))
+STATE_DB = os.getenv('STATE_DB', 'bot_state.db')
+TIMELINE_DB = os.getenv('TIMELINE_DB', 'bot_timeline.db')
 
 RETRY_TIME = 600
+RECONCILE_TIME = 3600
+REVIEWING_RETRY_TIME = 120
+IDLE_RETRY_TIME = 1800
+IDLE_AFTER = 3 * 24 * 60 * 60
+MAX_BACKOFF = 3600
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))
+BREAKER_RESET_TIME = int(os.getenv('BREAKER_RESET_TIME', 60))
+POLL_RATE_LIMIT = float(os.getenv('POLL_RATE_LIMIT', 0))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 4))
+OUTBOX_MAX_BACKLOG = int(os.getenv('OUTBOX_MAX_BACKLOG', 10000))
+OUTBOX_RATE = 30
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+WORKERS = int(os.getenv('WORKERS', 0))
+SUPERVISOR_FLAG = '--supervisor'
+LEASE_DB = os.getenv('LEASE_DB')
+LEASE_SHARDS = int(os.getenv('LEASE_SHARDS', 64))
+LEASE_TTL = int(os.getenv('LEASE_TTL', 30))
+NODE_ID = os.getenv('NODE_ID') or f'{socket.gethostname()}:{os.getpid()}'
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+INGEST_PORT = int(os.getenv('INGEST_PORT', 0))
+INGEST_HOST = os.getenv('INGEST_HOST', '127.0.0.1')
+INGEST_SECRET = os.getenv('INGEST_SECRET')
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+LOG_FILE = os.getenv('LOG_FILE', 'bot_logger.log')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN')
+LOG_JSON = os.getenv('LOG_JSON', '').lower() in ('1', 'true', 'yes')
+LOG_QUEUE = os.getenv('LOG_QUEUE', '1').lower() in ('1', 'true', 'yes')
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 16))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', MAX_IN_FLIGHT))
+HTTP_KEEPALIVE_IDLE = int(os.getenv('HTTP_KEEPALIVE_IDLE', 60))
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', 3.05))
+API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', 10))
+API_HEDGE = os.getenv('API_HEDGE', '').lower() in ('1', 'true', 'yes')
+COMMANDS = os.getenv('COMMANDS', '').lower() in ('1', 'true', 'yes')
+COMMAND_CACHE_TTL = int(os.getenv('COMMAND_CACHE_TTL', 30))
+COMMAND_POLL_TIMEOUT = 30
+COMMAND_LIST_LIMIT = 50
+TRACE_FILE = os.getenv('TRACE_FILE')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.1))
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+PROFILE_SECONDS = int(os.getenv('PROFILE_SECONDS', 30))
+PROFILE_MAX_SECONDS = 300
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+ANSWER_CODES = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
 
 
 HOMEWORK_STATUSES = {
@@ -27,75 +115,157 @@ HOMEWORK_STATUSES = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.',
 }
+STATUS_TEMPLATES = compile_templates(HOMEWORK_STATUSES)
+STATUS_NAMES = OrderedDict((
+    ('reviewing', 'на ревью'),
+    ('rejected', 'на доработке'),
+    ('approved', 'принято'),
+))
+HELP_TEXT = (
+    '/status - сводка по работам\n'
+    '/homeworks - все работы и их статусы\n'
+    '/history - последние смены статусов и время ревью\n'
+    '/pause - приостановить уведомления\n'
+    '/resume - возобновить уведомления'
+)
+DEFAULT_CONFIG = Config(
+    {
+        'retry_time': RETRY_TIME,
+        'reviewing_retry_time': REVIEWING_RETRY_TIME,
+        'idle_retry_time': IDLE_RETRY_TIME,
+        'max_backoff': MAX_BACKOFF,
+    },
+    ENDPOINT,
+    dict(HOMEWORK_STATUSES),
+)
 
 
 def get_logger():
     """Задаём параметры логирования."""
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.DEBUG)
-    fileHandler = logging.FileHandler(
-        'bot_logger.log', mode='a', encoding='UTF-8'
-    )
-    streamHandler = logging.StreamHandler(stream=sys.stdout)
-    formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] %(message)s - %(name)s'
-    )
-    logger.addHandler(fileHandler)
-    logger.addHandler(streamHandler)
-    fileHandler.setFormatter(formatter)
-    streamHandler.setFormatter(formatter)
+    logger = logging.getLogger('homework_bot')
+    bot_logging.configure(
+        logger,
+        LOG_LEVEL,
+        [
+            bot_logging.file_handler(
+                LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN
+            ),
+            bot_logging.stdout_handler(),
+        ],
+        json_lines=LOG_JSON,
+        use_queue=LOG_QUEUE,
+    )
     return logger
 
 
 def send_message(bot, message):
     """Отправка сообщения в телеграмм."""
+    send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправка сообщения в указанный чат."""
     try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+        with tracing.trace('telegram.send', chat_id=chat_id):
+            bot.send_message(chat_id=chat_id, text=message)
+        MESSAGES_SENT.inc()
         logger.info('Информация отправлена в чат.')
     except Exception as error:
+        MESSAGES_FAILED.inc()
         raise ErrorSendMessage(f'Сбой при отправке сообщения - {error}')
 
 
 def get_api_answer(current_timestamp):
     """Проверка респонса."""
+    return fetch_homeworks(HEADERS, current_timestamp)
+
+
+def fetch_homeworks(headers, current_timestamp, http=requests):
+    """Запрос статусов работ с заголовками авторизации подписки.
+
+    http - модуль requests или сессия с общим пулом соединений.
+    """
+    return decode_response(
+        request_homeworks(headers, current_timestamp, http)
+    )
+
+
+def decode_response(homework_statuses):
+    """JSON из ответа API."""
     try:
-        timestamp = current_timestamp or int(time.time())
-        params = {'from_date': timestamp}
-        homework_statuses = requests.get(
-            url=ENDPOINT, headers=HEADERS, params=params
+        with tracing.span('api.decode'):
+            return homework_statuses.json()
+    except Exception as error:
+        raise ErrorApi(f'Ошибка API - {error}')
+
+
+def request_homeworks(headers, current_timestamp, http=requests):
+    """Запрос к API; возвращает ответ со статусом 200 или 304.
+
+    Время на соединение и на чтение ответа ограничено отдельно, поэтому
+    зависшее соединение не блокирует опрос дольше таймаутов.
+    """
+    try:
+        timestamp = (
+            int(time.time()) if current_timestamp is None
+            else current_timestamp
         )
-        if homework_statuses.status_code != HTTPStatus.OK:
+        params = {'from_date': timestamp}
+        started = time.perf_counter()
+        try:
+            with tracing.span('api.request') as span:
+                homework_statuses = http.get(
+                    url=ENDPOINT, headers=headers, params=params,
+                    timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT),
+                )
+                span.set('http.status_code', homework_statuses.status_code)
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started)
+        API_RESPONSES.labels(homework_statuses.status_code).inc()
+        if homework_statuses.status_code not in ANSWER_CODES:
             raise StatusCodeError(
                 'Ошибка при запросе к основному API - '
-                f'ERROR {homework_statuses.status_code}'
+                f'ERROR {homework_statuses.status_code}',
+                homework_statuses.status_code,
             )
-        return homework_statuses.json()
+        return homework_statuses
 
     except StatusCodeError as error:
-        raise StatusCodeError(f'{error}') from error
+        raise StatusCodeError(f'{error}', error.status_code) from error
     except Exception as error:
+        API_RESPONSES.labels('error').inc()
         raise ErrorApi(f'Ошибка API - {error}')
 
 
 def check_response(response):
     """Проверка корректности ответа API."""
-    if 'current_date' and 'homeworks' not in response:
-        raise TypeError(f'Неверный формат данных {type(response)}')
-    if not isinstance(response, dict):
-        raise TypeError(f'Неверный формат данных {type(response)}')
-    homeworks = response.get('homeworks')
-    if not isinstance(homeworks, list):
-        raise TypeError(f'Неверный формат данных {type(homeworks)}')
+    with tracing.span('api.check'):
+        if not isinstance(response, dict):
+            raise TypeError(f'Неверный формат данных {type(response)}')
+        if 'current_date' not in response or 'homeworks' not in response:
+            raise TypeError('В ответе API нет current_date или homeworks')
+        homeworks = response.get('homeworks')
+        if not isinstance(homeworks, list):
+            raise TypeError(f'Неверный формат данных {type(homeworks)}')
 
-    return homeworks
+        return homeworks
 
 
 def parse_status(homework):
     """Проверка статуса работы."""
-    homework_name = homework.get('homework_name')
-    homework_status = homework.get('status')
-    verdict = HOMEWORK_STATUSES[homework_status]
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    with tracing.span('status.parse'):
+        template = STATUS_TEMPLATES[homework.get('status')]
+        return template(homework.get('homework_name'))
+
+
+def read_response(content):
+    """Разбор и проверка тела ответа с учётом отказов в метриках."""
+    try:
+        with tracing.span('api.parse', bytes=len(content)):
+            return parse_response(content)
+    except ResponseFormatError:
+        CHECK_RESPONSE_FAILURES.inc()
+        raise
 
 
 def check_tokens():
@@ -103,53 +273,856 @@ def check_tokens():
     return all([PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID])
 
 
+def get_headers(token):
+    """Заголовки авторизации для токена."""
+    return {'Authorization': f'OAuth {token}'}
+
+
+def read_config():
+    """Конфигурация из CONFIG_FILE поверх значений по умолчанию или None."""
+    if not CONFIG_FILE:
+        return None
+    return load_config(CONFIG_FILE, DEFAULT_CONFIG)
+
+
+def apply_settings(config):
+    """Подменяет настройки модуля значениями из config."""
+    global ENDPOINT, HOMEWORK_STATUSES, STATUS_TEMPLATES
+    global RETRY_TIME, REVIEWING_RETRY_TIME, IDLE_RETRY_TIME, MAX_BACKOFF
+    RETRY_TIME = config.intervals['retry_time']
+    REVIEWING_RETRY_TIME = config.intervals['reviewing_retry_time']
+    IDLE_RETRY_TIME = config.intervals['idle_retry_time']
+    MAX_BACKOFF = config.intervals['max_backoff']
+    ENDPOINT = config.endpoint
+    STATUS_TEMPLATES = compile_templates(config.homework_statuses)
+    HOMEWORK_STATUSES = config.homework_statuses
+
+
+def load_registry(config=None):
+    """Реестр подписок из конфигурации, файла или окружения."""
+    if config is not None and config.subscriptions is not None:
+        return SubscriptionRegistry(
+            Subscription(token, chat_id)
+            for token, chat_id in config.subscriptions
+        )
+    if SUBSCRIPTIONS_FILE:
+        return load_subscriptions(SUBSCRIPTIONS_FILE)
+    if check_tokens():
+        return SubscriptionRegistry(
+            [Subscription(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+        )
+    return SubscriptionRegistry()
+
+
+def notify(outbox, subscription, message):
+    """Ставит сообщение в очередь, если оно отличается от предыдущего."""
+    if message != subscription.last_report:
+        outbox.put(subscription.chat_id, message)
+        subscription.last_report = message
+
+
+def notify_changes(outbox, subscription, homeworks):
+    """Отправляет все изменившиеся статусы работ подписки."""
+    with tracing.span('status.notify') as span:
+        changes = subscription.index.changes(homeworks)
+        span.set('changes', len(changes))
+        if not changes:
+            logger.debug('Нет новых статусов')
+            return PollOutcome.UNCHANGED
+        for homework in changes:
+            message = homework.render(STATUS_TEMPLATES)
+            logger.info(message)
+            outbox.put(subscription.chat_id, message)
+            subscription.index.commit(homework)
+            subscription.last_report = message
+            if subscription.timeline is not None:
+                subscription.timeline.append(subscription.chat_id, homework)
+        return PollOutcome.CHANGED
+
+
+def prepare_subscription(store, subscription, current_timestamp,
+                         timeline=None):
+    """Восстанавливает курсор и индекс работ подписки из хранилища."""
+    subscription.from_date = (
+        store.get_cursor(subscription.key) or current_timestamp
+    )
+    subscription.index = HomeworkIndex(
+        store.get_homeworks(subscription.key),
+        functools.partial(store.set_homework, subscription.key),
+    )
+    subscription.cache = CachedResponse()
+    subscription.timeline = timeline
+
+
+def report_error(outbox, subscription, error):
+    """Логирует сбой и однократно сообщает о нём в чат подписки."""
+    error_message = f'Сбой в работе программы: {error}'
+    logger.error(error_message)
+    try:
+        notify(outbox, subscription, error_message)
+    except ErrorSendMessage as send_error:
+        logger.error(f'ErrorSendMessage: {send_error}')
+
+
+def handle_event(outbox, registry, token, homeworks):
+    """Push-событие: рассылает изменения всем подпискам на токен."""
+    notified = 0
+    for subscription in registry.by_token(token):
+        if subscription.paused:
+            continue
+        with subscription.lock:
+            outcome = notify_changes(outbox, subscription, homeworks)
+        if outcome is PollOutcome.CHANGED:
+            notified += 1
+    return notified
+
+
+def poll_subscription(outbox, session, store, breaker, subscription,
+                      flights=None):
+    """Один опрос API по подписке."""
+    with tracing.trace('poll', chat_id=subscription.chat_id) as span:
+        with subscription.lock:
+            outcome = poll_locked(
+                outbox, session, store, breaker, subscription, flights
+            )
+        span.set('outcome', outcome.value)
+        return outcome
+
+
+def advance_cursor(store, subscription, current_date):
+    """Сдвигает курсор from_date подписки."""
+    if current_date:
+        subscription.from_date = current_date
+        store.set_cursor(subscription.key, current_date)
+
+
+def is_upstream_error(error):
+    """Сбой на стороне API, а не конкретной подписки (например, токена)."""
+    if isinstance(error, StatusCodeError):
+        return error.status_code is None or (
+            error.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or error.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        )
+    return isinstance(error, (ErrorApi, ResponseFormatError))
+
+
+def request_guarded(breaker, session, headers, from_date):
+    """Запрос к API через предохранитель.
+
+    Ответ может достаться нескольким подпискам и разбирается один раз.
+    Успех запроса засчитывается только после разбора тела (или когда
+    разбор не нужен), чтобы пробный запрос с битым ответом не замыкал
+    предохранитель.
+    """
+    if not breaker.allow():
+        raise CircuitOpenError('API Практикума недоступно, опрос пропущен')
+    try:
+        raw = request_homeworks(headers, from_date, session)
+    except Exception as error:
+        if is_upstream_error(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    return SharedResponse(
+        raw, read_response, breaker.record_success, breaker.record_failure
+    )
+
+
+def fetch_guarded(breaker, session, subscription, flights=None):
+    """Запрос и разбор ответа API через предохранитель.
+
+    Возвращает ответ и (current_date, homeworks) или None, если ответ
+    совпал с прошлым. С flights одновременные опросы одного токена
+    с тем же from_date и теми же валидаторами кэша делают один запрос,
+    а его разобранный ответ получают все.
+    """
+    cache = subscription.cache
+    headers = get_headers(subscription.token)
+    headers.update(cache.headers())
+    request = functools.partial(
+        request_guarded, breaker, session, headers, subscription.from_date
+    )
+    if flights is None:
+        shared = request()
+    else:
+        shared = flights.do((
+            subscription.token, subscription.from_date, cache.etag,
+            cache.last_modified,
+        ), request)
+    raw = shared.response
+    try:
+        if cache.is_fresh(raw):
+            return raw, None
+        return raw, shared.parse()
+    finally:
+        # Сбой разбора уже засчитан; всё остальное - успешный запрос.
+        shared.settle()
+
+
+def poll_locked(outbox, session, store, breaker, subscription,
+                flights=None):
+    """Опрос подписки; вызывается под её блокировкой.
+
+    Если ответ совпал с прошлым (304 или тот же хэш тела), проверка
+    и разбор статусов пропускаются. О сбоях API в чат подписки
+    не пишется: о них один раз сообщает report_outage. Ошибка токена
+    (401, 403, 404) идёт в чат подписки и не трогает предохранитель,
+    но, как и сбой API, откладывает следующий опрос с backoff.
+    """
+    try:
+        raw, parsed = fetch_guarded(breaker, session, subscription, flights)
+        if parsed is None:
+            API_CACHE_HITS.inc()
+            advance_cursor(store, subscription, current_date(raw))
+            return PollOutcome.UNCHANGED
+        date, homeworks = parsed
+        outcome = notify_changes(outbox, subscription, homeworks)
+        advance_cursor(store, subscription, date)
+        subscription.cache.commit(raw)
+        return outcome
+
+    except CircuitOpenError:
+        POLLS_SHED.inc()
+        return PollOutcome.SHED
+
+    except ErrorSendMessage as error:
+        logger.error(f'ErrorSendMessage: {error}')
+        return PollOutcome.UNCHANGED
+
+    except Exception as error:
+        if is_upstream_error(error):
+            logger.error(f'Сбой API: {error}')
+            return PollOutcome.FAILED
+        report_error(outbox, subscription, error)
+        if isinstance(error, StatusCodeError):
+            return PollOutcome.FAILED
+        return PollOutcome.UNCHANGED
+
+
+def admit_poll(breaker, subscription):
+    """Пока предохранитель разомкнут, опросы сбрасываются до запуска.
+
+    Такие опросы не занимают слот движка и откладываются на обычный
+    интервал подписки. В пробном режиме допускаются все опросы;
+    пробный запрос обычно достаётся подписке с работой на ревью,
+    потому что планировщик отдаёт их первыми. Опросы подписок на паузе
+    сбрасываются всегда.
+    """
+    if subscription.paused:
+        return False
+    if breaker.state is not BreakerState.OPEN:
+        return True
+    POLLS_SHED.inc()
+    return False
+
+
+def report_outage(outbox, old, new):
+    """Одно сообщение на весь сбой API вместо сообщения в каждый чат."""
+    API_BREAKER.set(new.value)
+    logger.warning(f'Предохранитель API: {old.name} -> {new.name}')
+    if new is BreakerState.OPEN and old is BreakerState.CLOSED:
+        message = (
+            'Сбой в работе программы: API Практикума недоступно, '
+            'опрос приостановлен'
+        )
+    elif new is BreakerState.CLOSED:
+        message = 'API Практикума снова доступно, опрос возобновлён'
+    else:
+        return
+    if not TELEGRAM_CHAT_ID:
+        return
+    try:
+        outbox.put(TELEGRAM_CHAT_ID, message)
+    except ErrorSendMessage as error:
+        logger.error(f'ErrorSendMessage: {error}')
+
+
+def fetch_all_homeworks(http, token):
+    """Все работы токена: запрос с from_date=0 мимо курсора подписки."""
+    _, homeworks = read_response(
+        request_homeworks(get_headers(token), 0, http).content
+    )
+    return homeworks
+
+
+def format_duration(seconds):
+    """Длительность в часах для ответов на команды."""
+    return f'{seconds / 3600:.1f} ч'
+
+
+def command_status(shard, chat_id, argument):
+    """Сводка по работам чата из индекса в памяти, без запроса к API."""
+    counts = {}
+    last_reports = []
+    paused = False
+    for subscription in shard.by_chat(chat_id):
+        for status, count in subscription.index.count_statuses().items():
+            counts[status] = counts.get(status, 0) + count
+        if subscription.last_report:
+            last_reports.append(subscription.last_report)
+        paused = paused or subscription.paused
+    lines = [
+        f'{name.capitalize()}: {counts[status]}'
+        for status, name in STATUS_NAMES.items() if counts.get(status)
+    ] or ['Работ пока нет']
+    if last_reports:
+        lines.append('Последнее уведомление: ' + last_reports[-1])
+    if paused:
+        lines.append('Уведомления на паузе, /resume - возобновить')
+    return '\n'.join(lines)
+
+
+def command_homeworks(http, cache, breaker, shard, chat_id, argument):
+    """Все работы чата; ответ API кэшируется на COMMAND_CACHE_TTL."""
+    if breaker.state is BreakerState.OPEN:
+        return 'API Практикума сейчас недоступно, попробуйте позже'
+    tokens = {subscription.token for subscription in shard.by_chat(chat_id)}
+    lines = []
+    try:
+        for token in sorted(tokens):
+            homeworks = cache.get(
+                token, functools.partial(fetch_all_homeworks, http, token)
+            )
+            lines.extend(
+                f'{homework.name}: {STATUS_NAMES[homework.status]}'
+                for homework in homeworks
+            )
+    except HomeworksBotError as error:
+        logger.error(f'Не удалось получить список работ - {error}')
+        return 'Не удалось получить список работ, попробуйте позже'
+    return '\n'.join(lines[:COMMAND_LIST_LIMIT]) or 'Работ пока нет'
+
+
+def command_history(timeline, chat_id, argument):
+    """Последние смены статусов и время ревью из журнала."""
+    if timeline is None:
+        return 'История статусов не ведётся'
+    events = timeline.history(chat_id, limit=10)
+    if not events:
+        return 'Смен статусов пока не было'
+    lines = [
+        f'{time.strftime("%d.%m.%Y %H:%M", time.gmtime(event.at))} UTC '
+        f'{event.name}: {STATUS_NAMES[event.status]}'
+        for event in events
+    ]
+    stats = timeline.review_stats(chat_id)
+    if stats.count:
+        lines.append(
+            f'Ревью: {stats.count}, в среднем '
+            f'{format_duration(stats.average)}, самое долгое '
+            f'{format_duration(stats.longest)}'
+        )
+    return '\n'.join(lines)
+
+
+def command_pause(shard, paused, chat_id, argument):
+    """Ставит уведомления чата на паузу или снимает с неё.
+
+    Пока подписка на паузе, API по ней не опрашивается; после снятия
+    паузы изменения за это время приходят со следующим опросом.
+    """
+    for subscription in shard.by_chat(chat_id):
+        subscription.paused = paused
+    if paused:
+        return 'Уведомления на паузе, /resume - возобновить'
+    return 'Уведомления возобновлены'
+
+
+def command_profile(profiler, chat_id, argument):
+    """Снимок профиля по команде из чата администратора TELEGRAM_CHAT_ID.
+
+    Аргумент - длительность в секундах, не больше PROFILE_MAX_SECONDS.
+    """
+    if profiler is None or str(chat_id) != str(TELEGRAM_CHAT_ID):
+        return HELP_TEXT
+    duration = None
+    if argument.isdigit():
+        duration = min(max(int(argument), 1), PROFILE_MAX_SECONDS)
+    path = profiler.trigger(duration)
+    if path is None:
+        return 'Профиль уже снимается'
+    return f'Снимаю профиль {duration or profiler.duration} с: {path}'
+
+
+def handle_command(handlers, shard, chat_id, command, argument):
+    """Ответ на команду; чаты без подписок игнорируются."""
+    if not shard.by_chat(chat_id):
+        return None
+    handler = handlers.get(command)
+    if handler is None:
+        return HELP_TEXT
+    return handler(chat_id, argument)
+
+
+def make_commands(http, breaker, shard, timeline, profiler=None):
+    """Обработчики команд по их именам."""
+    return {
+        'profile': functools.partial(command_profile, profiler),
+        'status': functools.partial(command_status, shard),
+        'homeworks': functools.partial(
+            command_homeworks, http, TTLCache(COMMAND_CACHE_TTL), breaker,
+            shard,
+        ),
+        'history': functools.partial(command_history, timeline),
+        'pause': functools.partial(command_pause, shard, True),
+        'resume': functools.partial(command_pause, shard, False),
+    }
+
+
+def start_commands(engine, bot, outbox, handle):
+    """Запускает приём команд на время работы движка."""
+    poller = UpdatePoller(bot, handle, outbox.put, COMMAND_POLL_TIMEOUT)
+    poller.start()
+    engine.at_exit(poller.stop)
+
+
+def setup_commands(engine, bot, outbox, shard, dynamic, handlers):
+    """Подключает команды к движку.
+
+    getUpdates допускает только одного получателя на токен бота, а шард
+    воркера или узла видит не все чаты, поэтому команды работают только
+    в одном процессе без аренды шардов.
+    """
+    if dynamic:
+        logger.warning(
+            'Команды работают только в одном процессе без аренды шардов'
+        )
+        return
+    engine.at_start(functools.partial(
+        start_commands, engine, bot, outbox,
+        functools.partial(handle_command, handlers, shard),
+    ))
+
+
+def make_policy():
+    """Окно планировщика и политика интервалов по текущим настройкам.
+
+    При включённом приёме push-событий опрос нужен только для сверки
+    пропущенных событий и идёт раз в RECONCILE_TIME.
+    """
+    if INGEST_PORT:
+        return RECONCILE_TIME, AdaptiveInterval(
+            RECONCILE_TIME, RECONCILE_TIME, RECONCILE_TIME, IDLE_AFTER,
+            MAX_BACKOFF,
+        )
+    return RETRY_TIME, AdaptiveInterval(
+        RETRY_TIME, REVIEWING_RETRY_TIME, IDLE_RETRY_TIME, IDLE_AFTER,
+        MAX_BACKOFF,
+    )
+
+
+def make_scheduler():
+    """Планировщик опросов."""
+    interval, policy = make_policy()
+    return Scheduler(interval, policy=policy)
+
+
+def start_ingest(events):
+    """Запускает приём push-событий, если задан INGEST_PORT."""
+    if not INGEST_PORT:
+        return None
+    server = IngestServer(
+        (INGEST_HOST, INGEST_PORT), events, INGEST_SECRET
+    ).start()
+    logger.debug(f'Приём событий на {INGEST_HOST}:{INGEST_PORT}/events')
+    return server
+
+
+def rebalance(engine, store, registry, shard, ownership, timeline=None):
+    """Приводит шард процесса к текущему правилу владения."""
+    current_timestamp = int(time.time())
+    for subscription in registry:
+        owned = ownership.owns(subscription)
+        if owned and subscription.key not in shard:
+            store.reload(subscription.key)
+            prepare_subscription(
+                store, subscription, current_timestamp, timeline
+            )
+            shard.add(subscription)
+            engine.add(subscription)
+        elif not owned and subscription.key in shard:
+            shard.remove(subscription.key)
+            engine.remove(subscription)
+    store.flush()
+    logger.info(
+        f'{ownership.name or NODE_ID}: подписок в шарде {len(shard)}'
+    )
+
+
+def update_ownership(engine, store, registry, shard, ownership, kind,
+                     value, timeline=None, restore=None):
+    """Новое кольцо воркеров или набор аренд: пересобирает шард.
+
+    restore(select) забирает сохранённые сообщения чатов, которые
+    теперь принадлежат процессу: отправлять их должен тот же outbox,
+    что и новые сообщения этих чатов.
+    """
+    setattr(ownership, kind, value)
+    rebalance(engine, store, registry, shard, ownership, timeline)
+    if restore is not None:
+        restore(ownership.owns_chat)
+
+
+def connect_ownership(engine, update, channel, keeper, events):
+    """Подключает источники владения при запуске цикла движка."""
+    loop = asyncio.get_running_loop()
+    if channel is not None:
+        channel.serve(loop, update, events, engine.stop)
+    if keeper is not None:
+        keeper.start(functools.partial(
+            loop.call_soon_threadsafe, update, 'leases'
+        ))
+
+
+def apply_config(engine, store, registry, shard, ownership, config, fresh,
+                 timeline=None):
+    """Применяет перечитанные настройки и подписки в цикле движка.
+
+    Опрос не останавливается: расписание перестраивается на месте,
+    у оставшихся подписок сохраняется всё их состояние.
+    """
+    if config is not None:
+        apply_settings(config)
+        engine.retune(*make_policy())
+    added, removed = registry.replace(fresh)
+    for subscription in removed:
+        shard.remove(subscription.key)
+        engine.remove(subscription)
+    if ownership is not None:
+        rebalance(engine, store, registry, shard, ownership, timeline)
+    else:
+        current_timestamp = int(time.time())
+        for subscription in added:
+            prepare_subscription(
+                store, subscription, current_timestamp, timeline
+            )
+            engine.add(subscription)
+        store.flush()
+    logger.info(
+        f'Конфигурация применена: подписок добавлено {len(added)}, '
+        f'удалено {len(removed)}'
+    )
+
+
+def reload_config(loop, apply):
+    """Перечитывает файлы в потоке наблюдателя и передаёт их в цикл."""
+    config = read_config()
+    fresh = load_registry(config)
+    loop.call_soon_threadsafe(apply, config, fresh)
+
+
+def watch_config(engine, apply):
+    """Следит за CONFIG_FILE и SUBSCRIPTIONS_FILE, пока работает движок."""
+    watcher = FileWatcher(
+        [CONFIG_FILE, SUBSCRIPTIONS_FILE],
+        functools.partial(reload_config, asyncio.get_running_loop(), apply),
+        CONFIG_CHECK_TIME,
+    ).start()
+    engine.at_exit(watcher.stop)
+
+
+def handle_signals(engine, signals):
+    """Сигналы останавливают движок с дренажом, а не обрывают опрос."""
+    loop = asyncio.get_running_loop()
+    for signum in signals:
+        loop.add_signal_handler(signum, engine.stop)
+
+
+def handle_profile_signal(profiler):
+    """SIGUSR1 снимает профиль процесса."""
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGUSR1, profiler.trigger
+    )
+
+
+def setup_diagnostics(engine, channel):
+    """Включает трассировку и профилирование, если они заданы.
+
+    Воркеры пишут трассы каждый в свой файл TRACE_FILE.<воркер>.
+    Возвращает профилировщик или None.
+    """
+    if TRACE_FILE:
+        path = TRACE_FILE if channel is None else (
+            f'{TRACE_FILE}.{channel.name}'
+        )
+        exporter = tracing.OtlpFileExporter(path)
+        tracing.configure(tracing.Tracer(exporter, TRACE_SAMPLE_RATE))
+        engine.at_exit(exporter.close)
+        engine.at_exit(functools.partial(tracing.configure, None))
+    if not PROFILE_DIR:
+        return None
+    profiler = Profiler(PROFILE_DIR, PROFILE_SECONDS)
+    engine.at_start(functools.partial(handle_profile_signal, profiler))
+    return profiler
+
+
+def restore_outbox(outbox, store, select=None):
+    """Ставит в очередь сообщения, не доставленные до остановки.
+
+    select(chat_id) отбирает сообщения чатов этого процесса.
+    """
+    messages = store.take_messages(select)
+    for chat_id, text in messages:
+        outbox.put(chat_id, text)
+    if messages:
+        logger.info(f'Восстановлено неотправленных сообщений: {len(messages)}')
+
+
+def save_pending(outbox, store):
+    """Сохраняет в store сообщения, которые не успели уйти."""
+    messages = outbox.take_pending()
+    if messages:
+        store.save_messages(messages)
+        logger.warning(
+            f'Не успели отправить сообщений: {len(messages)}, '
+            'они уйдут после запуска'
+        )
+
+
+def drain_outbox(outbox, store, deadline=None):
+    """Досылает очередь до deadline (time.monotonic), остаток сохраняет.
+
+    Без deadline на всё отводится SHUTDOWN_TIMEOUT секунд. Очередь
+    сохраняется до ожидания потоков отправки, поэтому поток, зависший
+    на запросе к Telegram, не отнимает у записи время; пачки, которые
+    вернулись в очередь после неудачной отправки, сохраняются вторым
+    проходом.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    outbox.drain(max(deadline - time.monotonic(), 0))
+    outbox.shutdown()
+    save_pending(outbox, store)
+    outbox.join(max(deadline - time.monotonic(), 0))
+    save_pending(outbox, store)
+
+
+def open_timeline():
+    """Журнал смен статусов в TIMELINE_DB или None, если он выключен."""
+    return Timeline(TIMELINE_DB) if TIMELINE_DB else None
+
+
+def make_keeper():
+    """Аренда шардов узла, если задан LEASE_DB."""
+    if not LEASE_DB:
+        return None
+    return LeaseKeeper(LeaseStore(LEASE_DB, LEASE_SHARDS), NODE_ID, LEASE_TTL)
+
+
+def make_http(breaker):
+    """Сессия с пулом соединений и клиент для запросов к API поверх неё.
+
+    С API_HEDGE запросы идут через HedgedClient, а пул не меньше
+    2 * MAX_IN_FLIGHT: у каждого из одновременных опросов может быть
+    дубль, и без своего соединения дубль ждал бы в очереди пула как раз
+    за теми медленными запросами, которые должен обогнать.
+    """
+    pool_size = HTTP_POOL_SIZE
+    if API_HEDGE:
+        pool_size = max(pool_size, 2 * MAX_IN_FLIGHT)
+    session = PooledSession(pool_size, HTTP_KEEPALIVE_IDLE)
+    if not API_HEDGE:
+        return session, session
+    return session, HedgedClient(
+        session, max_workers=2 * MAX_IN_FLIGHT,
+        enabled=lambda: breaker.state is BreakerState.CLOSED,
+    )
+
+
+def build_engine(registry, bot, store, channel=None,
+                 outbox_rate=OUTBOX_RATE, keeper=None, timeline=None):
+    """Собирает движок опроса подписок со всеми зависимостями.
+
+    Если задан channel (процесс-воркер) или keeper (аренда шардов),
+    движок начинает с пустого шарда и берёт из registry только
+    подписки, которые отдают ему кольцо супервизора и аренды узла.
+
+    При остановке движок дожидается начатых опросов, сохраняет курсоры,
+    досылает очередь сообщений и только потом закрывает хранилище;
+    на всё вместе отводится SHUTDOWN_TIMEOUT секунд от сигнала.
+    Смены статусов дописываются в timeline, если он задан.
+    """
+    current_timestamp = int(time.time())
+    scheduler = make_scheduler()
+    dynamic = channel is not None or keeper is not None
+    shard = SubscriptionRegistry() if dynamic else registry
+    for subscription in shard:
+        prepare_subscription(store, subscription, current_timestamp, timeline)
+        scheduler.add(subscription)
+
+    outbox = Outbox(
+        bot, workers=OUTBOX_WORKERS, rate=outbox_rate,
+        max_backlog=OUTBOX_MAX_BACKLOG,
+    )
+    outbox.start()
+    if not dynamic:
+        restore_outbox(outbox, store)
+    breaker = CircuitBreaker(
+        BREAKER_THRESHOLD, BREAKER_RESET_TIME,
+        on_change=functools.partial(report_outage, outbox),
+    )
+    session, http = make_http(breaker)
+    SUBSCRIPTIONS.set_function(shard.__len__)
+    OUTBOX_BACKLOG.set_function(lambda: outbox.backlog)
+    HTTP_POOL.set_function(session.stats.snapshot)
+    engine = AsyncEngine(
+        scheduler,
+        functools.partial(
+            poll_subscription, outbox, http, store, breaker,
+            flights=SingleFlight(),
+        ),
+        MAX_IN_FLIGHT,
+        TokenBucket(POLL_RATE_LIMIT) if POLL_RATE_LIMIT else None,
+        functools.partial(admit_poll, breaker),
+        SHUTDOWN_TIMEOUT,
+    )
+    profiler = setup_diagnostics(engine, channel)
+    if keeper is not None:
+        engine.at_exit(keeper.stop)
+    engine.at_exit(store.close)
+    if timeline is not None:
+        engine.at_exit(timeline.close)
+    engine.at_exit(http.close)
+    engine.at_exit(lambda: drain_outbox(outbox, store, engine.deadline))
+    engine.at_exit(store.flush)
+    engine.at_exit(lambda: logger.debug(f'Пул HTTP: {session.stats}'))
+    # Воркер игнорирует SIGINT: Ctrl+C обрабатывает супервизор.
+    signals = (signal.SIGTERM,) if channel else (signal.SIGTERM, signal.SIGINT)
+    engine.at_start(functools.partial(handle_signals, engine, signals))
+    events = functools.partial(handle_event, outbox, shard)
+    ownership = None
+    if dynamic:
+        ownership = Ownership(
+            channel and channel.name,
+            frozenset() if LEASE_DB else None,
+            LEASE_SHARDS,
+        )
+        update = functools.partial(
+            update_ownership, engine, store, registry, shard, ownership,
+            timeline=timeline,
+            restore=functools.partial(restore_outbox, outbox, store),
+        )
+        engine.at_start(functools.partial(
+            connect_ownership, engine, update, channel, keeper, events
+        ))
+    if CONFIG_FILE or SUBSCRIPTIONS_FILE:
+        engine.at_start(functools.partial(
+            watch_config, engine, functools.partial(
+                apply_config, engine, store, registry, shard, ownership,
+                timeline=timeline,
+            ),
+        ))
+    if COMMANDS:
+        setup_commands(
+            engine, bot, outbox, shard, dynamic,
+            make_commands(http, breaker, shard, timeline, profiler),
+        )
+    if channel is None:
+        server = start_ingest(events)
+        if server is not None:
+            engine.at_exit(server.stop)
+    return engine
+
+
+def make_bot():
+    """Клиент Telegram с пулом соединений под отправку сообщений."""
+    return telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(con_pool_size=OUTBOX_WORKERS + int(COMMANDS)),
+    )
+
+
+def run_worker(name, connection, workers, log_queue):
+    """Точка входа процесса-воркера: опрос своего шарда подписок."""
+    global logger
+    logger = bot_logging.configure_worker(
+        logging.getLogger('homework_bot'), LOG_LEVEL, log_queue
+    )
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT + 1 + int(name.rsplit('-')[-1]))
+    config = read_config()
+    if config is not None:
+        apply_settings(config)
+    engine = build_engine(
+        load_registry(config), make_bot(), open_state_store(STATE_DB),
+        WorkerChannel(name, connection), OUTBOX_RATE / workers,
+        timeline=open_timeline(),
+    )
+    asyncio.run(engine.run())
+
+
+def run_supervisor(workers):
+    """Запускает воркеры по шардам подписок и следит за ними.
+
+    SIGTTIN добавляет воркер, SIGTTOU снимает; SIGTERM и SIGINT
+    останавливают всех. Возвращает False, если все воркеры сняты
+    из-за частых падений.
+    """
+    context = multiprocessing.get_context('spawn')
+    log_queue = context.Queue()
+    bot_logging.forward(log_queue)
+    supervisor = Supervisor(run_worker, (workers, log_queue), context)
+    actions = {
+        signal.SIGTERM: supervisor.stop,
+        signal.SIGINT: supervisor.stop,
+        signal.SIGTTIN: supervisor.add_worker,
+        signal.SIGTTOU: supervisor.remove_worker,
+    }
+    if PROFILE_DIR:
+        actions[signal.SIGUSR1] = functools.partial(
+            supervisor.signal_workers, signal.SIGUSR1
+        )
+    for signum, action in actions.items():
+        signal.signal(signum, lambda *args, action=action: (
+            supervisor.request(action)
+        ))
+    server = start_ingest(
+        lambda token, homeworks: supervisor.broadcast(
+            ('event', token, homeworks)
+        )
+    )
+    supervisor.start(workers)
+    keeper = make_keeper()
+    if keeper is not None:
+        keeper.start(lambda shards: supervisor.request(
+            functools.partial(supervisor.publish, 'leases', shards)
+        ))
+    logger.debug(f'Супервизор запущен, воркеров: {workers}')
+    healthy = supervisor.run(stop_timeout=SHUTDOWN_TIMEOUT + 5)
+    if keeper is not None:
+        keeper.stop()
+    if server is not None:
+        server.stop()
+    return healthy
+
+
 def main():
     """Основная логика работы бота."""
-    previous_report = {'status': None}
-    current_report = {'status': None}
-
-    if not check_tokens():
+    config = read_config()
+    if config is not None:
+        apply_settings(config)
+    registry = load_registry(config)
+    if not TELEGRAM_TOKEN or not registry:
         logger.critical('Отсутствует одна из переменных окружения')
         logger.debug('Бот не запустился - завершение программы')
         sys.exit(0)
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    logger.debug('Бот запущен успешно')
-    current_timestamp = int(time.time())
-
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if homeworks:
-                homework = homeworks[0]
-                message = parse_status(homework)
-                logger.info(message)
-
-                current_report['status'] = message
-                if current_report != previous_report:
-                    send_message(bot, message)
-                    previous_report = current_report.copy()
-            else:
-                current_report['status'] = 'Нет новых статусов'
-                logger.debug('Нет новых статусов')
-            current_timestamp = response.get('current_date')
-
-        except ErrorSendMessage as error:
-            error_message = f'ErrorSendMessage: {error}'
-            logger.error(error_message)
-
-        except Exception as error:
-            error_message = f'Сбой в работе программы: {error}'
-            logger.error(error_message)
-
-            current_report['status'] = error_message
-            if current_report != previous_report:
-                send_message(bot, error_message)
-                previous_report = current_report.copy()
-
-        finally:
-            time.sleep(RETRY_TIME)
+    logger.debug(f'Бот запущен успешно, подписок: {len(registry)}')
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+        logger.debug(f'Метрики доступны на порту {METRICS_PORT}')
+    if SUPERVISOR_FLAG in sys.argv[1:]:
+        if not run_supervisor(WORKERS or os.cpu_count()):
+            logger.critical('Все воркеры сняты из-за частых падений')
+            sys.exit(1)
+        return
+    engine = build_engine(
+        registry, make_bot(), open_state_store(STATE_DB),
+        keeper=make_keeper(), timeline=open_timeline(),
+    )
+    asyncio.run(engine.run())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+"""Общий пул keep-alive соединений к API Я.Практикума."""
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import tracing
+
+
+class PoolStats:
+    """Счётчики пула: созданные и переиспользованные соединения."""
+
+    def __init__(self):
+        """Нулевые счётчики."""
+        self._lock = threading.Lock()
+        self.created = 0
+        self.checkouts = 0
+        self.wait_time = 0.0
+
+    def on_created(self):
+        """Учитывает новое соединение."""
+        with self._lock:
+            self.created += 1
+
+    def on_checkout(self, waited):
+        """Учитывает выдачу соединения из пула и время ожидания."""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += waited
+
+    @property
+    def reused(self):
+        """Сколько раз соединение было взято из пула повторно."""
+        return max(self.checkouts - self.created, 0)
+
+    def snapshot(self):
+        """Текущие значения счётчиков."""
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': max(self.checkouts - self.created, 0),
+                'checkouts': self.checkouts,
+                'wait_time': self.wait_time,
+            }
+
+    def __str__(self):
+        """Сводка счётчиков для лога."""
+        return (
+            'Соединений создано: {created}, переиспользовано: {reused}, '
+            'ожидание пула: {wait_time:.3f} с'.format(**self.snapshot())
+        )
+
+
+def _traced(connection_class):
+    """Класс соединения urllib3 со спанами этапов запроса.
+
+    http.connect - DNS и TCP, http.tls - рукопожатие TLS, http.wait -
+    от отправки запроса до заголовков ответа, то есть время сервера.
+    """
+
+    class TracedConnection(connection_class):
+
+        def _new_conn(self):
+            with tracing.span('http.connect', host=self.host):
+                connection = super()._new_conn()
+            self._connected_at = time.time_ns()
+            return connection
+
+        def connect(self):
+            super().connect()
+            if isinstance(self, HTTPSConnection) and tracing.active():
+                tracing.record(
+                    'http.tls', self._connected_at, time.time_ns()
+                )
+
+        def getresponse(self):
+            # Без аргументов: проба urllib3 getresponse(buffering=True)
+            # падает с TypeError до открытия спана.
+            with tracing.span('http.wait'):
+                return super().getresponse()
+
+    return TracedConnection
+
+
+TracedHTTPConnection = _traced(HTTPConnection)
+TracedHTTPSConnection = _traced(HTTPSConnection)
+
+
+def _instrumented(pool_class, stats):
+    """Класс пула urllib3, который пишет статистику в stats."""
+
+    class InstrumentedPool(pool_class):
+
+        ConnectionCls = (
+            TracedHTTPSConnection if issubclass(
+                pool_class, HTTPSConnectionPool
+            ) else TracedHTTPConnection
+        )
+
+        def _new_conn(self):
+            stats.on_created()
+            return super()._new_conn()
+
+        def _get_conn(self, timeout=None):
+            started = time.monotonic()
+            connection = super()._get_conn(timeout)
+            stats.on_checkout(time.monotonic() - started)
+            return connection
+
+    return InstrumentedPool
+
+
+def _keepalive_options(idle):
+    """Опции сокета для TCP keep-alive."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if idle and hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, idle))
+    return options
+
+
+class PooledAdapter(HTTPAdapter):
+    """Адаптер requests с инструментированным пулом и keep-alive."""
+
+    def __init__(self, stats, keepalive_idle=None, **kwargs):
+        """Адаптер, пишущий статистику пула в stats."""
+        self.stats = stats
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        """Создаёт менеджер пулов с нашими классами пулов."""
+        pool_kwargs.setdefault(
+            'socket_options', _keepalive_options(self.keepalive_idle)
+        )
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _instrumented(HTTPConnectionPool, self.stats),
+            'https': _instrumented(HTTPSConnectionPool, self.stats),
+        }
+
+
+class PooledSession(requests.Session):
+    """Сессия requests с общим пулом соединений для всех подписок.
+
+    pool_size - максимум соединений к одному хосту. При block=True
+    запросы сверх лимита ждут свободного соединения, а не открывают
+    новые; время ожидания попадает в stats.wait_time.
+    """
+
+    def __init__(self, pool_size=10, keepalive_idle=60, block=True):
+        """Сессия с пулом на pool_size соединений к хосту."""
+        super().__init__()
+        self.stats = PoolStats()
+        adapter = PooledAdapter(
+            self.stats,
+            keepalive_idle,
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            pool_block=block,
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
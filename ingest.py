@@ -0,0 +1,105 @@
+"""Приём событий о смене статусов по HTTP (push вместо опроса)."""
+import hmac
+import json
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import INGEST_EVENTS
+from schema import homework_from_dict
+
+logger = logging.getLogger('homework_bot.ingest')
+
+MAX_BODY = 1024 * 1024
+SECRET_HEADER = 'X-Ingest-Secret'
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """Принимает POST /events с телом {"token": .., "homeworks": [..]}.
+
+    Работы передаются в том же формате, что и в ответе API Практикума,
+    и проверяются той же схемой.
+    """
+
+    def do_POST(self):
+        """Разбирает событие и передаёт его обработчику сервера."""
+        server = self.server
+        if self.path.split('?')[0] != '/events':
+            self.reply(HTTPStatus.NOT_FOUND, 'unknown path')
+            return
+        if server.secret and not hmac.compare_digest(
+            self.headers.get(SECRET_HEADER, ''), server.secret
+        ):
+            INGEST_EVENTS.labels('forbidden').inc()
+            self.reply(HTTPStatus.FORBIDDEN, 'bad secret')
+            return
+        try:
+            token, homeworks = self.read_event()
+        except (ValueError, TypeError, KeyError) as error:
+            INGEST_EVENTS.labels('invalid').inc()
+            self.reply(HTTPStatus.BAD_REQUEST, f'invalid event: {error}')
+            return
+        try:
+            notified = server.handle_event(token, homeworks)
+        except Exception as error:
+            INGEST_EVENTS.labels('failed').inc()
+            logger.error(f'Сбой при обработке события - {error}')
+            self.reply(HTTPStatus.INTERNAL_SERVER_ERROR, str(error))
+            return
+        INGEST_EVENTS.labels('accepted').inc()
+        self.reply(HTTPStatus.ACCEPTED, 'accepted', notified=notified)
+
+    def read_event(self):
+        """Токен и список записей Homework из тела запроса."""
+        length = int(self.headers.get('Content-Length', 0))
+        if not 0 < length <= MAX_BODY:
+            raise ValueError(f'body length {length}')
+        event = json.loads(self.rfile.read(length))
+        token = event['token']
+        homeworks = event['homeworks']
+        if not isinstance(token, str) or not isinstance(homeworks, list):
+            raise TypeError('token must be str and homeworks must be list')
+        return token, [homework_from_dict(item) for item in homeworks]
+
+    def reply(self, status, message, **extra):
+        """Ответ в формате JSON."""
+        body = json.dumps(dict(status=message, **extra)).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Каждый запрос в лог не пишется."""
+
+
+class IngestServer(ThreadingHTTPServer):
+    """HTTP-сервер приёма событий.
+
+    handle_event(token, homeworks) возвращает число отправленных
+    уведомлений; secret, если задан, сверяется с заголовком
+    X-Ingest-Secret.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, handle_event, secret=None):
+        """Сервер на address; события передаются в handle_event."""
+        super().__init__(address, IngestHandler)
+        self.handle_event = handle_event
+        self.secret = secret
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        thread = threading.Thread(
+            target=self.serve_forever, name='ingest', daemon=True
+        )
+        thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает сервер."""
+        self.shutdown()
+        self.server_close()
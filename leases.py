@@ -0,0 +1,185 @@
+"""Аренда шардов подписок между узлами через общее хранилище."""
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('homework_bot.leases')
+
+
+class LeaseStore:
+    """Таблица аренды шардов в SQLite.
+
+    Файл базы должен быть общим для всех узлов. Каждая операция идёт
+    одной транзакцией BEGIN IMMEDIATE, поэтому два узла не могут
+    одновременно взять один шард.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS leases ('
+        'shard INTEGER PRIMARY KEY, owner TEXT, expires REAL)',
+        'CREATE TABLE IF NOT EXISTS nodes ('
+        'node TEXT PRIMARY KEY, expires REAL)',
+    )
+
+    def __init__(self, path, shards=64, timeout=10):
+        """Открывает базу аренд path с shards шардами."""
+        self.path = path
+        self.shards = shards
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        with self._transaction() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            connection.executemany(
+                'INSERT OR IGNORE INTO leases VALUES (?, NULL, 0)',
+                ((shard,) for shard in range(shards)),
+            )
+
+    def acquire(self, node, now, ttl, grace):
+        """Продлевает аренды узла и добирает или отдаёт шарды.
+
+        Доля узла - shards, делённое на число живых узлов с округлением
+        вверх. Лишние шарды освобождаются, но взять их можно только
+        через grace секунд, чтобы прежний владелец успел остановить
+        опрос. Возвращает шарды, которыми узел владеет до now + ttl.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO nodes VALUES (?, ?)',
+                (node, now + ttl),
+            )
+            connection.execute('DELETE FROM nodes WHERE expires < ?', (now,))
+            nodes = connection.execute(
+                'SELECT COUNT(*) FROM nodes'
+            ).fetchone()[0]
+            connection.execute(
+                'UPDATE leases SET expires = ? '
+                'WHERE owner = ? AND expires >= ?',
+                (now + ttl, node, now),
+            )
+            owned = [row[0] for row in connection.execute(
+                'SELECT shard FROM leases WHERE owner = ? AND expires >= ? '
+                'ORDER BY shard', (node, now),
+            )]
+            share = -(-self.shards // nodes)
+            if len(owned) > share:
+                connection.executemany(
+                    'UPDATE leases SET owner = NULL, expires = ? '
+                    'WHERE shard = ?',
+                    ((now + grace, shard) for shard in owned[share:]),
+                )
+                owned = owned[:share]
+            elif len(owned) < share:
+                free = [row[0] for row in connection.execute(
+                    'SELECT shard FROM leases WHERE expires < ? '
+                    'ORDER BY shard LIMIT ?', (now, share - len(owned)),
+                )]
+                connection.executemany(
+                    'UPDATE leases SET owner = ?, expires = ? '
+                    'WHERE shard = ?',
+                    ((node, now + ttl, shard) for shard in free),
+                )
+                owned += free
+        return frozenset(owned)
+
+    def release(self, node):
+        """Освобождает все шарды узла сразу."""
+        with self._transaction() as connection:
+            connection.execute(
+                'UPDATE leases SET owner = NULL, expires = 0 WHERE owner = ?',
+                (node,),
+            )
+            connection.execute('DELETE FROM nodes WHERE node = ?', (node,))
+
+    def owners(self):
+        """Текущие владельцы шардов: shard -> (owner, expires)."""
+        return {
+            shard: (owner, expires)
+            for shard, owner, expires in self._connection.execute(
+                'SELECT shard, owner, expires FROM leases'
+            )
+        }
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        self._connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+
+class LeaseKeeper:
+    """Держит аренды узла в фоновом потоке.
+
+    Продлевает их каждые ttl / 3 секунд и вызывает on_change(shards)
+    при изменении набора шардов. Если продлить аренды не удаётся,
+    узел отказывается от шардов раньше, чем их смогут взять другие.
+    """
+
+    def __init__(self, store, node, ttl=30, clock=time.time):
+        """Аренда шардов узла node на ttl секунд."""
+        self.store = store
+        self.node = node
+        self.ttl = ttl
+        self.renew_interval = ttl / 3
+        self.clock = clock
+        self.owned = frozenset()
+        self._valid_until = 0
+        self._on_change = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def tick(self):
+        """Одно продление аренд; возвращает текущий набор шардов."""
+        now = self.clock()
+        try:
+            owned = self.store.acquire(
+                self.node, now, self.ttl, self.renew_interval
+            )
+            self._valid_until = now + self.ttl - self.renew_interval
+        except sqlite3.Error as error:
+            logger.error(f'Не удалось продлить аренду шардов - {error}')
+            owned = self.owned if now < self._valid_until else frozenset()
+        if owned != self.owned:
+            logger.info(f'{self.node}: шардов в аренде {len(owned)}')
+            self.owned = owned
+            if self._on_change is not None:
+                self._on_change(owned)
+        return owned
+
+    def start(self, on_change):
+        """Запускает продление аренд в фоновом потоке."""
+        self._on_change = on_change
+        self._thread = threading.Thread(
+            target=self._run, name='leases', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает продление и освобождает шарды узла."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.store.release(self.node)
+        except sqlite3.Error as error:
+            logger.error(f'Не удалось освободить шарды - {error}')
+        self.store.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.tick()
+            self._stopped.wait(self.renew_interval)
@@ -0,0 +1,305 @@
+"""Метрики бота в текстовом формате Prometheus."""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+LAG_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Набор метрик, которые отдаются одной страницей."""
+
+    def __init__(self):
+        """Пустой набор метрик."""
+        self._metrics = []
+
+    def register(self, metric):
+        """Добавляет метрику в набор."""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате экспозиции."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class _Value:
+    """Одно значение метрики; inc() не создаёт объектов."""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Увеличивает значение."""
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        """Устанавливает значение."""
+        self.value = value
+
+
+class Counter:
+    """Счётчик, опционально с одной меткой.
+
+    Дочерние значения для меток кэшируются: labels() на горячем пути -
+    это поиск в словаре без создания объектов.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, help, label=None, registry=None):
+        """Счётчик name; с registry он сразу регистрируется."""
+        self.name = name
+        self.help = help
+        self.label = label
+        self._value = _Value()
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def inc(self, amount=1):
+        """Увеличивает счётчик без метки."""
+        self._value.inc(amount)
+
+    def labels(self, value):
+        """Значение счётчика для метки value."""
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(value, _Value())
+        return child
+
+    @property
+    def value(self):
+        """Текущее значение счётчика без метки."""
+        return self._value.value
+
+    def samples(self):
+        """Строки экспозиции."""
+        if self.label is None:
+            return [f'{self.name} {_format_value(self._value.value)}']
+        return [
+            f'{self.name}{{{self.label}="{value}"}} '
+            f'{_format_value(child.value)}'
+            for value, child in sorted(
+                self._children.items(), key=lambda item: str(item[0])
+            )
+        ]
+
+
+class Gauge(Counter):
+    """Текущее значение; может вычисляться функцией при чтении.
+
+    Для метрики с меткой функция возвращает словарь метка -> значение.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, label=None, registry=None):
+        """Показатель name; с registry он сразу регистрируется."""
+        super().__init__(name, help, label, registry)
+        self._function = None
+
+    def set(self, value):
+        """Устанавливает значение."""
+        self._value.set(value)
+
+    def set_function(self, function):
+        """Значение будет браться из function при каждом чтении."""
+        self._function = function
+
+    def samples(self):
+        """Строки экспозиции."""
+        if self._function is not None:
+            value = self._function()
+            if self.label is None:
+                self._value.set(value)
+            else:
+                for label, item in value.items():
+                    self.labels(label).set(item)
+        return super().samples()
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, registry=None):
+        """Гистограмма name с корзинами buckets."""
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def observe(self, value):
+        """Учитывает одно наблюдение."""
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += value
+
+    @property
+    def count(self):
+        """Количество наблюдений."""
+        return sum(self._counts)
+
+    def samples(self):
+        """Строки экспозиции."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f'{self.name}_sum {_format_value(total)}')
+        lines.append(f'{self.name}_count {cumulative}')
+        return lines
+
+
+REGISTRY = Registry()
+
+API_LATENCY = Histogram(
+    'homework_api_request_seconds',
+    'Время запроса к API Практикума.',
+    registry=REGISTRY,
+)
+API_RESPONSES = Counter(
+    'homework_api_responses_total',
+    'Ответы API Практикума по статус-коду.',
+    label='code', registry=REGISTRY,
+)
+API_HEDGES = Counter(
+    'homework_api_hedges_total',
+    'Дублирующие запросы к API: sent - отправлено, won - ответил первым.',
+    label='result', registry=REGISTRY,
+)
+API_COALESCED = Counter(
+    'homework_api_coalesced_total',
+    'Опросы, получившие ответ чужого одинакового запроса к API.',
+    registry=REGISTRY,
+)
+API_CACHE_HITS = Counter(
+    'homework_api_cache_hits_total',
+    'Ответы API, совпавшие с прошлым (304 или тот же хэш тела).',
+    registry=REGISTRY,
+)
+CHECK_RESPONSE_FAILURES = Counter(
+    'homework_check_response_failures_total',
+    'Ответы API, не прошедшие проверку формата.',
+    registry=REGISTRY,
+)
+MESSAGES = Counter(
+    'homework_messages_total',
+    'Сообщения в Telegram по результату отправки.',
+    label='result', registry=REGISTRY,
+)
+MESSAGES_SENT = MESSAGES.labels('sent')
+MESSAGES_RETRIED = MESSAGES.labels('retried')
+MESSAGES_FAILED = MESSAGES.labels('failed')
+POLL_LAG = Histogram(
+    'homework_poll_lag_seconds',
+    'Опоздание опроса относительно расписания.',
+    buckets=LAG_BUCKETS, registry=REGISTRY,
+)
+POLLS_LATE = Counter(
+    'homework_polls_late_total',
+    'Опросы, начатые позже срока больше допустимого, по классу приоритета.',
+    label='priority', registry=REGISTRY,
+)
+INGEST_EVENTS = Counter(
+    'homework_ingest_events_total',
+    'Push-события о смене статусов по результату обработки.',
+    label='result', registry=REGISTRY,
+)
+SUBSCRIPTIONS = Gauge(
+    'homework_subscriptions',
+    'Количество подписок.',
+    registry=REGISTRY,
+)
+OUTBOX_BACKLOG = Gauge(
+    'homework_outbox_backlog',
+    'Сообщения в очереди на отправку.',
+    registry=REGISTRY,
+)
+API_BREAKER = Gauge(
+    'homework_api_breaker_state',
+    'Предохранитель API: 0 - замкнут, 1 - пробный режим, 2 - разомкнут.',
+    registry=REGISTRY,
+)
+POLLS_SHED = Counter(
+    'homework_polls_shed_total',
+    'Опросы, пропущенные, пока API недоступно.',
+    registry=REGISTRY,
+)
+TIMELINE_ERRORS = Counter(
+    'homework_timeline_errors_total',
+    'Сбои журнала статусов: write - неудачные записи, dropped - события, '
+    'вытесненные из переполненного буфера.',
+    label='kind', registry=REGISTRY,
+)
+TIMELINE_WRITE_ERRORS = TIMELINE_ERRORS.labels('write')
+TIMELINE_DROPPED = TIMELINE_ERRORS.labels('dropped')
+HTTP_POOL = Gauge(
+    'homework_http_pool',
+    'Пул HTTP: соединения created/reused/checkouts, wait_time в секундах.',
+    label='stat', registry=REGISTRY,
+)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт метрики по GET /metrics."""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        """Ответ на запрос метрик."""
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Запросы к метрикам не логируются."""
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    )
+    thread.start()
+    return server
@@ -0,0 +1,244 @@
+"""Очередь исходящих сообщений в Telegram."""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+from telegram.error import (BadRequest, ChatMigrated, InvalidToken,
+                            RetryAfter, Unauthorized)
+
+import tracing
+from exceptions import ErrorSendMessage
+from metrics import MESSAGES_FAILED, MESSAGES_RETRIED, MESSAGES_SENT
+from scheduler import TokenBucket
+
+logger = logging.getLogger('homework_bot.outbox')
+
+MESSAGE_LIMIT = 4096
+SEPARATOR = '\n\n'
+PERMANENT_ERRORS = (BadRequest, ChatMigrated, InvalidToken, Unauthorized)
+
+
+class Outbox:
+    """Отправляет сообщения пулом потоков с учётом лимитов Telegram.
+
+    - в один чат - не чаще раза в chat_interval секунд;
+    - всего - не больше rate сообщений в секунду;
+    - на RetryAfter чат откладывается на указанное Telegram время;
+    - сетевые ошибки повторяются до max_attempts раз с задержкой;
+    - несколько ожидающих сообщений в один чат склеиваются в одно;
+    - в очереди не больше max_backlog сообщений.
+    """
+
+    def __init__(self, bot, workers=4, chat_interval=1.0, rate=30,
+                 max_backlog=10000, max_attempts=5, retry_delay=1.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        """Очередь отправки через bot; потоки запускает start()."""
+        self.bot = bot
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.sleep = sleep
+        self._bucket = TokenBucket(rate, clock=clock)
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._ready = []
+        self._queued = set()
+        self._busy = set()
+        self._next_allowed = {}
+        self._attempts = {}
+        self._backlog = 0
+        self._counter = itertools.count()
+        self._threads = []
+        self._running = False
+
+    @property
+    def backlog(self):
+        """Количество сообщений, ещё не доставленных в Telegram."""
+        return self._backlog
+
+    def put(self, chat_id, text):
+        """Ставит сообщение в очередь."""
+        with self._condition:
+            if self._backlog >= self.max_backlog:
+                raise ErrorSendMessage(
+                    f'Очередь сообщений переполнена ({self._backlog})'
+                )
+            self._pending.setdefault(chat_id, deque()).append(text)
+            self._backlog += 1
+            self._schedule(chat_id, self._next_allowed.get(chat_id, 0))
+
+    def start(self):
+        """Запускает потоки отправки."""
+        self._running = True
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'outbox-{number}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def drain(self, timeout=None):
+        """Ждёт отправки очереди; возвращает число недоставленных."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            while self._backlog and self._running:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        break
+                self._condition.wait(remaining)
+            return self._backlog
+
+    def take_pending(self):
+        """Забирает из очереди недоставленные сообщения (chat_id, text).
+
+        Вызывается после shutdown() или stop(), чтобы сохранить их до
+        следующего запуска.
+        """
+        with self._condition:
+            messages = [
+                (chat_id, text)
+                for chat_id, texts in self._pending.items()
+                for text in texts
+            ]
+            self._pending.clear()
+            self._ready.clear()
+            self._queued.clear()
+            self._backlog -= len(messages)
+            return messages
+
+    def stop(self, timeout=None):
+        """Останавливает потоки отправки и ждёт их до timeout секунд."""
+        self.shutdown()
+        self.join(timeout)
+
+    def shutdown(self):
+        """Просит потоки отправки завершиться, не дожидаясь их.
+
+        Начатые отправки доходят до конца; пачка, отправка которой
+        не удалась, возвращается в очередь для take_pending().
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def join(self, timeout=None):
+        """Ждёт потоки отправки, все вместе не дольше timeout секунд."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(
+                None if deadline is None
+                else max(deadline - time.monotonic(), 0)
+            )
+        self._threads = [
+            thread for thread in self._threads if thread.is_alive()
+        ]
+
+    def _schedule(self, chat_id, ready_at):
+        if chat_id in self._queued or chat_id in self._busy:
+            return
+        self._queued.add(chat_id)
+        heapq.heappush(self._ready, (ready_at, next(self._counter), chat_id))
+        self._condition.notify()
+
+    def _take(self):
+        """Ждёт чат, в который уже можно отправлять, и забирает его пачку."""
+        with self._condition:
+            while self._running:
+                timeout = None
+                if self._ready:
+                    ready_at, _, chat_id = self._ready[0]
+                    timeout = ready_at - self.clock()
+                    if timeout <= 0:
+                        heapq.heappop(self._ready)
+                        self._queued.discard(chat_id)
+                        self._busy.add(chat_id)
+                        return chat_id, self._merge(chat_id)
+                self._condition.wait(timeout)
+            return None, None
+
+    def _merge(self, chat_id):
+        """Забирает ожидающие сообщения чата, пока они влезают в одно."""
+        pending = self._pending[chat_id]
+        texts = [pending.popleft()]
+        length = len(texts[0])
+        while pending:
+            length += len(SEPARATOR) + len(pending[0])
+            if length > MESSAGE_LIMIT:
+                break
+            texts.append(pending.popleft())
+        return texts
+
+    def _work(self):
+        while True:
+            chat_id, texts = self._take()
+            if chat_id is None:
+                return
+            self.sleep(self._bucket.reserve())
+            delay = self._deliver(chat_id, texts)
+            self._finish(chat_id, texts, delay)
+
+    def _deliver(self, chat_id, texts):
+        """Отправляет пачку; возвращает задержку до повтора или None."""
+        try:
+            with tracing.trace(
+                'telegram.send', chat_id=chat_id, messages=len(texts)
+            ):
+                self.bot.send_message(
+                    chat_id=chat_id, text=SEPARATOR.join(texts)
+                )
+        except RetryAfter as error:
+            MESSAGES_RETRIED.inc()
+            logger.warning(
+                f'Telegram просит подождать {error.retry_after} с '
+                f'перед отправкой в чат {chat_id}'
+            )
+            return error.retry_after
+        except PERMANENT_ERRORS as error:
+            MESSAGES_FAILED.inc()
+            logger.error(f'Сообщение в чат {chat_id} отброшено - {error}')
+            return None
+        except Exception as error:
+            attempt = self._attempts.get(chat_id, 0) + 1
+            self._attempts[chat_id] = attempt
+            if attempt >= self.max_attempts:
+                MESSAGES_FAILED.inc()
+                logger.error(
+                    f'Сообщение в чат {chat_id} отброшено после '
+                    f'{attempt} попыток - {error}'
+                )
+                return None
+            MESSAGES_RETRIED.inc()
+            logger.warning(f'Сбой при отправке сообщения - {error}')
+            return self.retry_delay * 2 ** (attempt - 1)
+        MESSAGES_SENT.inc()
+        logger.info('Информация отправлена в чат.')
+        return None
+
+    def _finish(self, chat_id, texts, delay):
+        with self._condition:
+            self._busy.discard(chat_id)
+            # Очередь чата могла уже забрать take_pending().
+            pending = self._pending.get(chat_id)
+            if delay is not None:
+                pending = self._pending.setdefault(chat_id, deque())
+                pending.extendleft(reversed(texts))
+                ready_at = self.clock() + delay
+            else:
+                self._attempts.pop(chat_id, None)
+                self._backlog -= len(texts)
+                if not self._backlog:
+                    self._condition.notify_all()
+                ready_at = self.clock() + self.chat_interval
+            self._next_allowed[chat_id] = ready_at
+            if pending:
+                self._schedule(chat_id, ready_at)
+            elif pending is not None:
+                del self._pending[chat_id]
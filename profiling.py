@@ -0,0 +1,116 @@
+"""Снимки профиля работающего бота по запросу."""
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger('homework_bot.profiling')
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return (
+        f'{code.co_name} ({os.path.basename(code.co_filename)}'
+        f':{code.co_firstlineno})'
+    )
+
+
+def sample_stacks(exclude=()):
+    """Стеки всех потоков, кроме exclude, от внешнего вызова к внутреннему."""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        if ident in exclude:
+            continue
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        stack.append(names.get(ident, str(ident)))
+        stacks.append(';'.join(reversed(stack)))
+    return stacks
+
+
+class StackSampler:
+    """Статистический профилировщик всех потоков процесса.
+
+    Раз в interval секунд снимает стеки всех потоков и считает,
+    сколько раз встретился каждый. В отличие от cProfile не требует
+    включения в каждом потоке и не замедляет код между снимками.
+    """
+
+    def __init__(self, interval=0.01, clock=time.monotonic,
+                 sleep=time.sleep):
+        """Снимки стеков раз в interval секунд."""
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+
+    def run(self, duration):
+        """Снимает стеки duration секунд; возвращает счётчик стеков."""
+        counts = collections.Counter()
+        exclude = (threading.get_ident(),)
+        deadline = self.clock() + duration
+        while self.clock() < deadline:
+            counts.update(sample_stacks(exclude))
+            self.sleep(self.interval)
+        return counts
+
+
+def write_folded(path, counts):
+    """Пишет стеки в свёрнутом формате flamegraph.pl и speedscope."""
+    with open(path, 'w', encoding='UTF-8') as file:
+        for stack, count in counts.most_common():
+            file.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    """Снимает профиль в фоне, не больше одного снимка одновременно.
+
+    trigger() можно вызывать из обработчика сигнала или команды:
+    он только запускает поток и сразу возвращает путь будущего файла
+    directory/profile-<pid>-<время>.folded или None, если снимок уже
+    идёт.
+    """
+
+    def __init__(self, directory, duration=30, sampler=None):
+        """Профили пишутся в directory, по duration секунд."""
+        self.directory = directory
+        self.duration = duration
+        self.sampler = sampler or StackSampler()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def trigger(self, duration=None):
+        """Запускает снимок профиля на duration секунд."""
+        duration = duration or self.duration
+        with self._lock:
+            if self._running:
+                return None
+            self._running = True
+        path = os.path.join(
+            self.directory,
+            f'profile-{os.getpid()}-{time.strftime("%Y%m%d-%H%M%S")}.folded',
+        )
+        threading.Thread(
+            target=self._run, args=(path, duration), name='profiler',
+            daemon=True,
+        ).start()
+        logger.info(f'Снимаю профиль {duration} с в {path}')
+        return path
+
+    def _run(self, path, duration):
+        try:
+            counts = self.sampler.run(duration)
+            write_folded(path, counts)
+            logger.info(
+                f'Профиль записан в {path}, снимков стеков: '
+                f'{sum(counts.values())}'
+            )
+        except Exception as error:
+            logger.error(f'Не удалось снять профиль - {error}')
+        finally:
+            with self._lock:
+                self._running = False
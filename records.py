@@ -0,0 +1,82 @@
+"""Компактная запись о домашней работе и шаблоны уведомлений."""
+import sys
+from enum import Enum
+
+MESSAGE_TEMPLATE = 'Изменился статус проверки работы "{{}}". {verdict}'
+
+
+class HomeworkStatus(str, Enum):
+    """Статус проверки работы.
+
+    Члены - строки, поэтому словари по статусам доступны и по
+    строковому значению из ответа API.
+    """
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
+
+def compile_templates(verdicts):
+    """Готовые шаблоны уведомлений по статусам.
+
+    Собираются один раз при запуске; шаблон - связанный str.format,
+    которому остаётся подставить только название работы.
+    """
+    return {
+        HomeworkStatus(status): sys.intern(
+            MESSAGE_TEMPLATE.format(verdict=verdict)
+        ).format
+        for status, verdict in verdicts.items()
+    }
+
+
+class Homework:
+    """Неизменяемая запись о работе из ответа API.
+
+    Хранит только поля, нужные боту; key - ключ работы в индексе
+    изменений: id, а при его отсутствии - название, status - член
+    HomeworkStatus. Текст уведомления собирается только в render().
+    """
+
+    __slots__ = ('key', 'name', 'status', 'date_updated')
+
+    def __init__(self, key, name, status, date_updated=None):
+        """Запись работы с ключом key."""
+        object.__setattr__(self, 'key', key)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'status', status)
+        object.__setattr__(self, 'date_updated', date_updated)
+
+    def __setattr__(self, name, value):
+        """Запись неизменяема."""
+        raise AttributeError('Homework нельзя изменять')
+
+    @property
+    def state(self):
+        """Пара (status, date_updated) для сравнения с индексом."""
+        return self.status, self.date_updated
+
+    def __reduce__(self):
+        """Сериализация для pickle через конструктор."""
+        return Homework, (self.key, self.name, self.status, self.date_updated)
+
+    def render(self, templates):
+        """Текст уведомления по шаблонам compile_templates()."""
+        return templates[self.status](self.name)
+
+    def __eq__(self, other):
+        """Записи равны, если совпадают все поля."""
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return (self.key, self.name, self.state) == (
+            other.key, other.name, other.state
+        )
+
+    def __hash__(self):
+        """Хэш по всем полям."""
+        return hash((self.key, self.status, self.date_updated))
+
+    def __repr__(self):
+        """Отладочное представление записи."""
+        return f'Homework({self.name!r}, {self.status!r})'
@@ -0,0 +1,459 @@
+"""Планировщик опросов подписок."""
+import collections
+import enum
+import itertools
+import random
+import threading
+import time
+import zlib
+
+from metrics import POLL_LAG, POLLS_LATE
+
+
+class PollOutcome(enum.Enum):
+    """Результат одного опроса подписки."""
+
+    UNCHANGED = 'unchanged'
+    CHANGED = 'changed'
+    FAILED = 'failed'
+    SHED = 'shed'
+
+
+class Priority(enum.IntEnum):
+    """Класс приоритета опроса: при нехватке слотов меньший идёт раньше."""
+
+    REVIEWING = 0
+    ACTIVE = 1
+    IDLE = 2
+
+
+def _is_reviewing(subscription):
+    index = subscription.index
+    return index is not None and index.has_status('reviewing')
+
+
+class FixedInterval:
+    """Постоянный интервал между опросами."""
+
+    def __init__(self, interval):
+        """Интервал interval секунд."""
+        self.interval = interval
+
+    def next_interval(self, subscription, failures, quiet_for):
+        """Интервал до следующего опроса подписки."""
+        return self.interval
+
+    def priority(self, subscription, quiet_for):
+        """Класс приоритета подписки."""
+        if _is_reviewing(subscription):
+            return Priority.REVIEWING
+        return Priority.ACTIVE
+
+
+class AdaptiveInterval:
+    """Интервал, зависящий от активности подписки и ошибок API.
+
+    - после ошибок API - экспоненциальный backoff с джиттером,
+      не больше max_backoff;
+    - пока есть работа на ревью - reviewing_interval;
+    - если статусы не менялись дольше idle_after - idle_interval;
+    - в остальных случаях - interval.
+    """
+
+    def __init__(self, interval, reviewing_interval, idle_interval,
+                 idle_after, max_backoff, rand=random.random):
+        """Интервалы в секундах для каждого класса подписок."""
+        self.interval = interval
+        self.reviewing_interval = reviewing_interval
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.max_backoff = max_backoff
+        self.rand = rand
+
+    def backoff(self, failures):
+        """Задержка после failures ошибок подряд."""
+        delay = min(self.max_backoff, self.interval * 2 ** (failures - 1))
+        return delay / 2 + self.rand() * delay / 2
+
+    def priority(self, subscription, quiet_for):
+        """Класс приоритета: работа на ревью, обычная или затихшая."""
+        if _is_reviewing(subscription):
+            return Priority.REVIEWING
+        if quiet_for >= self.idle_after:
+            return Priority.IDLE
+        return Priority.ACTIVE
+
+    def next_interval(self, subscription, failures, quiet_for):
+        """Интервал до следующего опроса подписки."""
+        if failures:
+            return self.backoff(failures)
+        priority = self.priority(subscription, quiet_for)
+        if priority is Priority.REVIEWING:
+            return self.reviewing_interval
+        if priority is Priority.IDLE:
+            return self.idle_interval
+        return self.interval
+
+
+class TokenBucket:
+    """Глобальный бюджет запросов в секунду.
+
+    reserve() не блокирует поток, а возвращает, сколько нужно подождать
+    до отправки запроса: вызывающий код сам решает, как ждать.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        """Бюджет rate запросов в секунду с запасом burst."""
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Резервирует один запрос и возвращает задержку в секундах."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+class Timer:
+    """Срок в колесе таймеров: ключ, момент, класс приоритета и объект."""
+
+    __slots__ = ('key', 'deadline', 'priority', 'item', 'slot')
+
+    def __init__(self, key, deadline, priority, item):
+        """Срок deadline для объекта item."""
+        self.key = key
+        self.deadline = deadline
+        self.priority = priority
+        self.item = item
+        self.slot = None
+
+
+class TimerWheel:
+    """Иерархическое колесо таймеров.
+
+    Уровень 0 - SLOTS ячеек по resolution секунд, каждый следующий
+    уровень в SLOTS раз грубее. Таймер лежит в ячейке того уровня,
+    в диапазон которого попадает его срок, и при повороте колеса
+    спускается ниже, пока не дойдёт до уровня 0. Ячейка - словарь
+    по ключу, поэтому добавление и отмена стоят O(1) при любом числе
+    таймеров. Сроки дальше верхнего уровня ждут в отдельном словаре.
+    """
+
+    BITS = 6
+    SLOTS = 1 << BITS
+    LEVELS = 4
+
+    def __init__(self, resolution=1.0, now=0):
+        """Колесо с текущим моментом now."""
+        self.resolution = resolution
+        self._tick = int(now // resolution)
+        self._levels = [
+            [{} for _ in range(self.SLOTS)] for _ in range(self.LEVELS)
+        ]
+        self._overflow = {}
+        self._timers = {}
+        self._earliest = None
+        self._earliest_known = True
+
+    def add(self, key, deadline, item, priority=Priority.ACTIVE):
+        """Ставит таймер; прежний таймер с тем же ключом отменяется."""
+        self.cancel(key)
+        timer = self._timers[key] = Timer(key, deadline, priority, item)
+        self._place(timer)
+        if self._earliest_known and (
+            self._earliest is None or deadline < self._earliest
+        ):
+            self._earliest = deadline
+        return timer
+
+    def cancel(self, key):
+        """Отменяет таймер по ключу и возвращает его или None."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            del timer.slot[key]
+            if timer.deadline == self._earliest:
+                self._earliest_known = False
+        return timer
+
+    def get(self, key):
+        """Таймер по ключу или None."""
+        return self._timers.get(key)
+
+    def pop_due(self, now):
+        """Снимает таймеры со сроком не позже now, ранние первыми."""
+        due = []
+        target = int(now // self.resolution)
+        while self._tick < target:
+            if not self._timers:
+                self._tick = target
+                break
+            slot = self._levels[0][self._tick % self.SLOTS]
+            if slot:
+                due.extend(self._take(slot))
+                self._tick += 1
+            else:
+                # До ближайшего срока ячейки уровня 0 пусты: перескакиваем
+                # их, но не дальше границы оборота, где таймеры спускаются.
+                earliest = int(self.next_deadline() // self.resolution)
+                boundary = (self._tick // self.SLOTS + 1) * self.SLOTS
+                self._tick = max(
+                    self._tick + 1, min(earliest, boundary, target)
+                )
+            self._cascade()
+        slot = self._levels[0][self._tick % self.SLOTS]
+        due.extend(self._take(slot, now))
+        due.sort(key=lambda timer: timer.deadline)
+        return due
+
+    def next_deadline(self):
+        """Ближайший срок или None, если таймеров нет."""
+        if not self._earliest_known:
+            self._earliest = self._find_earliest()
+            self._earliest_known = True
+        return self._earliest
+
+    def __iter__(self):
+        """Все таймеры колеса."""
+        return iter(list(self._timers.values()))
+
+    def __len__(self):
+        """Количество таймеров."""
+        return len(self._timers)
+
+    def __contains__(self, key):
+        """Есть ли таймер с ключом key."""
+        return key in self._timers
+
+    def _place(self, timer):
+        tick = max(int(timer.deadline // self.resolution), self._tick)
+        delta = tick - self._tick
+        for level in range(self.LEVELS):
+            if delta < 1 << self.BITS * (level + 1):
+                slot = self._levels[level][
+                    (tick >> self.BITS * level) % self.SLOTS
+                ]
+                break
+        else:
+            slot = self._overflow
+        slot[timer.key] = timer
+        timer.slot = slot
+
+    def _cascade(self):
+        # Сверху вниз: таймер, спустившийся с уровня 2 в текущую ячейку
+        # уровня 1, сразу спускается дальше.
+        for level in range(self.LEVELS - 1, 0, -1):
+            if self._tick % (1 << self.BITS * level):
+                continue
+            slot = self._levels[level][
+                (self._tick >> self.BITS * level) % self.SLOTS
+            ]
+            timers = list(slot.values())
+            if level == self.LEVELS - 1:
+                timers.extend(self._overflow.values())
+                self._overflow.clear()
+            slot.clear()
+            for timer in timers:
+                self._place(timer)
+
+    def _take(self, slot, now=None):
+        if not slot:
+            return []
+        if now is None:
+            taken = list(slot.values())
+            slot.clear()
+        else:
+            taken = [timer for timer in slot.values() if timer.deadline <= now]
+            for timer in taken:
+                del slot[timer.key]
+        for timer in taken:
+            del self._timers[timer.key]
+        if taken:
+            self._earliest_known = False
+        return taken
+
+    def _find_earliest(self):
+        candidates = []
+        for level, slots in enumerate(self._levels):
+            current = self._tick >> self.BITS * level
+            # На уровне 0 текущая ячейка - ближайшая, на верхних в ней
+            # могут лежать только сроки через полный оборот.
+            for step in range(self.SLOTS) if level == 0 else range(
+                1, self.SLOTS + 1
+            ):
+                slot = slots[(current + step) % self.SLOTS]
+                if slot:
+                    candidates.append(
+                        min(timer.deadline for timer in slot.values())
+                    )
+                    break
+        if self._overflow:
+            candidates.append(
+                min(timer.deadline for timer in self._overflow.values())
+            )
+        return min(candidates) if candidates else None
+
+
+class Scheduler:
+    """Раскладывает опросы подписок равномерно по окну interval.
+
+    Смещение подписки внутри окна считается по хэшу её токена, поэтому
+    запросы не приходят к API одновременно и не зависят от порядка
+    загрузки реестра, а подписки разных чатов на один токен
+    опрашиваются вместе и могут обойтись одним запросом. Интервал до
+    следующего опроса и класс приоритета выбирает policy по результату
+    предыдущего опроса.
+
+    Сроки хранятся в колесе таймеров (TimerWheel). Наступившие опросы
+    ждут в очереди своего класса, и pop_due(limit=...) отдаёт сначала
+    работы на ревью, затем обычные и затихшие подписки. started()
+    учитывает опоздание начала опроса относительно срока; опросы,
+    опоздавшие больше чем на late_after секунд, считаются по классам.
+    """
+
+    def __init__(self, interval, clock=time.monotonic, policy=None,
+                 resolution=1.0, late_after=5.0):
+        """Пустое расписание с окном interval секунд."""
+        self.interval = interval
+        self.clock = clock
+        self.policy = policy or FixedInterval(interval)
+        self.late_after = late_after
+        self._wheel = TimerWheel(resolution, clock())
+        self._ready = [collections.deque() for _ in Priority]
+        self._ready_keys = {}
+        self._counter = itertools.count()
+        self._due = {}
+        self._failures = {}
+        self._changed_at = {}
+
+    def offset(self, subscription):
+        """Смещение первого опроса подписки внутри окна."""
+        return zlib.crc32(subscription.token.encode()) % self.interval
+
+    def add(self, subscription, now=None):
+        """Ставит подписку в расписание на её слот в текущем окне."""
+        now = self.clock() if now is None else now
+        self._changed_at.setdefault(subscription.key, now)
+        self.push(subscription, now + self.offset(subscription))
+
+    def push(self, subscription, deadline, priority=None):
+        """Ставит опрос подписки на момент deadline.
+
+        Без priority класс остаётся прежним, а у новой подписки
+        определяется по её работам.
+        """
+        key = subscription.key
+        if priority is None:
+            timer = self._wheel.get(key)
+            priority = (
+                timer.priority if timer is not None
+                else self.policy.priority(subscription, 0)
+            )
+        self._ready_keys.pop(key, None)
+        self._wheel.add(key, deadline, subscription, priority)
+
+    def reschedule(self, subscription, outcome=None, now=None):
+        """Ставит следующий опрос подписки с учётом результата опроса."""
+        now = self.clock() if now is None else now
+        key = subscription.key
+        self._due.pop(key, None)
+        if outcome is PollOutcome.FAILED:
+            self._failures[key] = self._failures.get(key, 0) + 1
+        elif outcome is not PollOutcome.SHED:
+            self._failures.pop(key, None)
+        if outcome is PollOutcome.CHANGED:
+            self._changed_at[key] = now
+        quiet_for = now - self._changed_at.setdefault(key, now)
+        interval = self.policy.next_interval(
+            subscription, self._failures.get(key, 0), quiet_for
+        )
+        self.push(
+            subscription, now + interval,
+            self.policy.priority(subscription, quiet_for),
+        )
+
+    def retune(self, interval, policy, now=None):
+        """Меняет интервалы на ходу, не останавливая расписание.
+
+        Опросы, назначенные позже, чем через новый interval, переносятся
+        на свой слот в новом окне.
+        """
+        now = self.clock() if now is None else now
+        self.interval = interval
+        self.policy = policy
+        for timer in self._wheel:
+            if timer.deadline > now + interval:
+                self.push(timer.item, now + self.offset(timer.item))
+
+    def remove(self, subscription):
+        """Снимает подписку с расписания."""
+        key = subscription.key
+        self._wheel.cancel(key)
+        self._ready_keys.pop(key, None)
+        self._due.pop(key, None)
+        self._failures.pop(key, None)
+        self._changed_at.pop(key, None)
+
+    def pop_due(self, now=None, limit=None):
+        """Возвращает подписки, время опроса которых наступило.
+
+        limit ограничивает число подписок; остальные наступившие
+        остаются в очереди до следующего вызова.
+        """
+        now = self.clock() if now is None else now
+        for timer in self._wheel.pop_due(now):
+            token = next(self._counter)
+            self._ready_keys[timer.key] = token
+            self._ready[timer.priority].append(
+                (token, timer.deadline, timer.item)
+            )
+        due = []
+        for priority, queue in zip(Priority, self._ready):
+            while queue and (limit is None or len(due) < limit):
+                token, deadline, subscription = queue.popleft()
+                if self._ready_keys.get(subscription.key) != token:
+                    continue
+                del self._ready_keys[subscription.key]
+                self._due[subscription.key] = (deadline, priority)
+                due.append(subscription)
+        return due
+
+    def started(self, subscription, now=None):
+        """Отмечает начало опроса и возвращает его опоздание в секундах."""
+        entry = self._due.pop(subscription.key, None)
+        if entry is None:
+            return 0
+        now = self.clock() if now is None else now
+        deadline, priority = entry
+        lag = max(now - deadline, 0)
+        POLL_LAG.observe(lag)
+        if lag > self.late_after:
+            POLLS_LATE.labels(priority.name.lower()).inc()
+        return lag
+
+    def next_deadline(self):
+        """Ближайший момент опроса или None, если расписание пусто."""
+        deadlines = [self._wheel.next_deadline()]
+        for queue in self._ready:
+            while queue and (
+                self._ready_keys.get(queue[0][2].key) != queue[0][0]
+            ):
+                queue.popleft()
+            if queue:
+                deadlines.append(queue[0][1])
+        deadlines = [item for item in deadlines if item is not None]
+        return min(deadlines) if deadlines else None
+
+    def __len__(self):
+        """Количество подписок в расписании."""
+        return len(self._wheel) + len(self._ready_keys)
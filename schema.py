@@ -0,0 +1,105 @@
+"""Декодирование и проверка ответа API за один проход."""
+import json
+import sys
+
+from exceptions import ResponseFormatError
+from records import Homework, HomeworkStatus
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RESPONSE_KEYS = frozenset(('homeworks', 'current_date'))
+
+
+def homework_from_dict(data):
+    """Проверяет объект работы и превращает его в Homework."""
+    if not isinstance(data, dict):
+        raise ResponseFormatError(f'Неверный формат работы {type(data)}')
+    name = data.get('homework_name')
+    status = data.get('status')
+    if not isinstance(name, str) or not isinstance(status, str):
+        raise ResponseFormatError(
+            'У работы нет homework_name или status строкой'
+        )
+    try:
+        status = HomeworkStatus(status)
+    except ValueError:
+        raise ResponseFormatError(
+            f'Неизвестный статус работы {status}'
+        ) from None
+    key = data.get('id') or name
+    date_updated = data.get('date_updated')
+    if date_updated is not None and not isinstance(date_updated, str):
+        raise ResponseFormatError(
+            f'Неверный формат date_updated {type(date_updated)}'
+        )
+    name = sys.intern(name)
+    key = name if key is name else sys.intern(str(key))
+    return Homework(key, name, status, date_updated)
+
+
+def _object_hook(data):
+    """Превращает объекты работ в записи по мере разбора.
+
+    json вызывает хук для вложенных объектов раньше, чем для внешнего,
+    поэтому неверная работа прерывает разбор сразу. Прочие объекты
+    остаются словарями и отсеиваются проверкой списка работ.
+    """
+    if 'homework_name' in data or 'status' in data:
+        return homework_from_dict(data)
+    return data
+
+
+def _check_top(response):
+    if not isinstance(response, dict):
+        raise ResponseFormatError(f'Неверный формат данных {type(response)}')
+    if not RESPONSE_KEYS <= response.keys():
+        raise ResponseFormatError(
+            'В ответе API нет ключей '
+            f'{", ".join(sorted(RESPONSE_KEYS - response.keys()))}'
+        )
+    homeworks = response['homeworks']
+    if not isinstance(homeworks, list):
+        raise ResponseFormatError(f'Неверный формат данных {type(homeworks)}')
+    current_date = response['current_date']
+    if not isinstance(current_date, int) or isinstance(current_date, bool):
+        raise ResponseFormatError(
+            f'Неверный формат current_date {type(current_date)}'
+        )
+    return current_date, homeworks
+
+
+def _parse_std(content):
+    try:
+        response = json.loads(content, object_hook=_object_hook)
+    except ValueError as error:
+        raise ResponseFormatError(f'Ответ API не JSON - {error}') from error
+    current_date, homeworks = _check_top(response)
+    for homework in homeworks:
+        if not isinstance(homework, Homework):
+            raise ResponseFormatError(
+                f'Неверный формат работы {type(homework)}'
+            )
+    return current_date, homeworks
+
+
+def _parse_orjson(content):
+    try:
+        response = orjson.loads(content)
+    except orjson.JSONDecodeError as error:
+        raise ResponseFormatError(f'Ответ API не JSON - {error}') from error
+    current_date, homeworks = _check_top(response)
+    return current_date, [homework_from_dict(item) for item in homeworks]
+
+
+def parse_response(content, fast=True):
+    """(current_date, [Homework]) из тела ответа API.
+
+    При fast=True и установленном orjson декодирует им, иначе -
+    стандартным json с проверкой работ прямо во время разбора.
+    """
+    if fast and orjson is not None:
+        return _parse_orjson(content)
+    return _parse_std(content)
@@ -0,0 +1,374 @@
+"""Распределение подписок по процессам-воркерам."""
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+logger = logging.getLogger('homework_bot.sharding')
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def shard_key(subscription):
+    """Ключ шардирования - чат.
+
+    Все подписки одного чата живут в одном воркере, поэтому порядок
+    и частота сообщений в чат контролируются одним outbox.
+    """
+    return str(subscription.chat_id)
+
+
+def lease_shard(subscription, shards):
+    """Номер шарда аренды, к которому относится подписка."""
+    return _hash(shard_key(subscription)) % shards
+
+
+class HashRing:
+    """Консистентное хэширование ключей по узлам.
+
+    Каждый узел занимает replicas точек на кольце; при добавлении или
+    удалении узла переезжает только доля ключей этого узла.
+    """
+
+    def __init__(self, nodes=(), replicas=64):
+        """Кольцо с узлами nodes, по replicas точек на узел."""
+        self.replicas = replicas
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавляет узел на кольцо."""
+        if node in self.nodes:
+            return
+        for replica in range(self.replicas):
+            point = _hash(f'{node}#{replica}')
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove(self, node):
+        """Снимает узел с кольца."""
+        self._points = [
+            point for point in self._points if self._owners[point] != node
+        ]
+        self._owners = {
+            point: owner for point, owner in self._owners.items()
+            if owner != node
+        }
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ, или None для пустого кольца."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+    @property
+    def nodes(self):
+        """Узлы кольца в порядке имён."""
+        return sorted(set(self._owners.values()))
+
+    def __len__(self):
+        """Количество узлов."""
+        return len(self.nodes)
+
+
+class Ownership:
+    """Какие подписки обслуживает процесс.
+
+    name и ring - имя воркера и кольцо воркеров узла (None вне
+    супервизора), leases - шарды, арендованные узлом (None, если
+    аренда выключена). Пока кольцо или аренды не получены, процесс
+    не обслуживает ничего.
+    """
+
+    __slots__ = ('name', 'ring', 'leases', 'shards')
+
+    def __init__(self, name=None, leases=None, shards=64):
+        """Владение воркера name и набора аренд leases."""
+        self.name = name
+        self.ring = None
+        self.leases = leases
+        self.shards = shards
+
+    def owns(self, subscription):
+        """Обслуживает ли процесс подписку."""
+        return self.owns_chat(subscription.chat_id)
+
+    def owns_chat(self, chat_id):
+        """Отправляет ли процесс сообщения в чат.
+
+        Чат без подписок (например, чат администратора) тоже достаётся
+        ровно одному процессу.
+        """
+        key = str(chat_id)
+        if self.name is not None and (
+            self.ring is None or self.ring.node_for(key) != self.name
+        ):
+            return False
+        return self.leases is None or (
+            _hash(key) % self.shards in self.leases
+        )
+
+
+class WorkerChannel:
+    """Сторона воркера в канале управления супервизора.
+
+    Сообщения супервизора: ('ring', nodes) - новый состав воркеров,
+    ('leases', shards) - шарды в аренде узла, ('event', token,
+    homeworks) - push-событие, ('stop',) - остановка.
+    """
+
+    def __init__(self, name, connection):
+        """Канал воркера name через connection."""
+        self.name = name
+        self.connection = connection
+
+    def serve(self, loop, on_state, on_event, on_stop):
+        """Читает канал в фоновом потоке.
+
+        on_state(kind, value) и on_stop вызываются в цикле loop,
+        on_event - в потоке канала. Закрытие канала означает остановку.
+        """
+        thread = threading.Thread(
+            target=self._read, args=(loop, on_state, on_event, on_stop),
+            name='shard-channel', daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def _read(self, loop, on_state, on_event, on_stop):
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == 'ring':
+                loop.call_soon_threadsafe(
+                    on_state, 'ring', HashRing(message[1])
+                )
+            elif kind == 'leases':
+                loop.call_soon_threadsafe(
+                    on_state, 'leases', frozenset(message[1])
+                )
+            elif kind == 'event':
+                try:
+                    on_event(*message[1:])
+                except Exception as error:
+                    logger.error(f'Сбой при обработке события - {error}')
+            elif kind == 'stop':
+                break
+        loop.call_soon_threadsafe(on_stop)
+
+
+class _Worker:
+
+    __slots__ = ('name', 'process', 'connection', 'crashes', 'retiring')
+
+    def __init__(self, name, process, connection):
+        self.name = name
+        self.process = process
+        self.connection = connection
+        self.crashes = deque()
+        self.retiring = False
+
+
+class Supervisor:
+    """Запускает воркеры и перераспределяет между ними шарды.
+
+    target(name, connection, *args) - точка входа воркера. Упавший
+    воркер перезапускается под тем же именем и получает тот же шард;
+    если он падает чаще max_restarts раз за restart_window секунд,
+    он снимается с кольца, и его подписки переходят к остальным.
+    """
+
+    def __init__(self, target, args=(), context=None, max_restarts=5,
+                 restart_window=60, clock=time.monotonic):
+        """Супервизор воркеров с точкой входа target."""
+        self.target = target
+        self.args = args
+        self.context = context or multiprocessing.get_context('spawn')
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.clock = clock
+        self.ring = HashRing()
+        self._workers = {}
+        self._names = (f'worker-{number}' for number in itertools.count())
+        self._send_lock = threading.Lock()
+        self._requests = deque()
+        self._state = {}
+        self._running = False
+        self._crashed = False
+
+    def start(self, count):
+        """Запускает count воркеров и рассылает им кольцо."""
+        self._running = True
+        for _ in range(count):
+            self.ring.add(self._spawn(next(self._names)).name)
+        self.publish('ring', self.ring.nodes)
+        return self
+
+    def publish(self, kind, value):
+        """Рассылает состояние воркерам и запоминает его для новых."""
+        self._state[kind] = value
+        self.broadcast((kind, value))
+
+    def add_worker(self):
+        """Добавляет воркер и перераспределяет шарды."""
+        worker = self._spawn(next(self._names))
+        self.ring.add(worker.name)
+        self.publish('ring', self.ring.nodes)
+        self._replay(worker)
+        logger.info(f'Добавлен {worker.name}, воркеров: {len(self.ring)}')
+
+    def remove_worker(self):
+        """Останавливает последний воркер.
+
+        Его шард переходит к остальным после того, как он завершился
+        и сохранил состояние подписок.
+        """
+        active = [
+            name for name in self.ring.nodes
+            if not self._workers[name].retiring
+        ]
+        if len(active) <= 1:
+            return
+        worker = self._workers[active[-1]]
+        worker.retiring = True
+        self._send(worker, ('stop',))
+
+    def request(self, action):
+        """Откладывает действие до цикла run; безопасно из сигналов."""
+        self._requests.append(action)
+
+    def broadcast(self, message):
+        """Рассылает сообщение живым воркерам; возвращает их число."""
+        return sum(
+            self._send(worker, message)
+            for worker in list(self._workers.values())
+            if not worker.retiring
+        )
+
+    def signal_workers(self, signum):
+        """Передаёт сигнал живым воркерам."""
+        for worker in list(self._workers.values()):
+            if worker.process.is_alive():
+                os.kill(worker.process.pid, signum)
+
+    def stop(self):
+        """Просит все воркеры завершиться."""
+        self._running = False
+        for worker in list(self._workers.values()):
+            self._send(worker, ('stop',))
+
+    def run(self, poll_interval=1.0, stop_timeout=30):
+        """Следит за воркерами, пока супервизор не остановлен.
+
+        Воркеры, не завершившиеся за stop_timeout секунд после stop(),
+        убиваются. Возвращает False, если все воркеры сняты с кольца
+        из-за частых падений.
+        """
+        stop_deadline = None
+        while self._workers:
+            self._handle_requests()
+            if not self._running and stop_deadline is None:
+                stop_deadline = self.clock() + stop_timeout
+            if stop_deadline is not None and self.clock() > stop_deadline:
+                self._kill()
+            sentinels = {
+                worker.process.sentinel: worker
+                for worker in self._workers.values()
+            }
+            ready = wait(list(sentinels), poll_interval)
+            # Сигнал остановки мог прийти вместе с выходом воркера:
+            # такой воркер не должен считаться упавшим.
+            self._handle_requests()
+            for sentinel in ready:
+                self._reap(sentinels[sentinel])
+        return not self._crashed
+
+    @property
+    def workers(self):
+        """Имена запущенных воркеров."""
+        return sorted(self._workers)
+
+    def _spawn(self, name):
+        parent, child = self.context.Pipe()
+        process = self.context.Process(
+            target=self.target, args=(name, child) + tuple(self.args),
+            name=name, daemon=True,
+        )
+        process.start()
+        child.close()
+        worker = self._workers.get(name)
+        if worker is None:
+            worker = self._workers[name] = _Worker(name, process, parent)
+        else:
+            worker.process = process
+            worker.connection = parent
+        return worker
+
+    def _handle_requests(self):
+        while self._requests:
+            self._requests.popleft()()
+
+    def _replay(self, worker):
+        for kind, value in self._state.items():
+            self._send(worker, (kind, value))
+
+    def _send(self, worker, message):
+        with self._send_lock:
+            try:
+                worker.connection.send(message)
+            except (OSError, ValueError):
+                return False
+        return True
+
+    def _reap(self, worker):
+        worker.process.join()
+        worker.connection.close()
+        if not self._running:
+            del self._workers[worker.name]
+            return
+        if worker.retiring:
+            del self._workers[worker.name]
+            self.ring.remove(worker.name)
+            self.publish('ring', self.ring.nodes)
+            logger.info(f'Снят {worker.name}, воркеров: {len(self.ring)}')
+            return
+        now = self.clock()
+        worker.crashes.append(now)
+        while worker.crashes[0] < now - self.restart_window:
+            worker.crashes.popleft()
+        logger.error(
+            f'{worker.name} завершился с кодом {worker.process.exitcode}'
+        )
+        if len(worker.crashes) > self.max_restarts:
+            del self._workers[worker.name]
+            self.ring.remove(worker.name)
+            logger.critical(
+                f'{worker.name} падает слишком часто и снят с кольца'
+            )
+            self.publish('ring', self.ring.nodes)
+            if not self._workers:
+                self._running = False
+                self._crashed = True
+            return
+        self._replay(self._spawn(worker.name))
+
+    def _kill(self):
+        for worker in self._workers.values():
+            if worker.process.is_alive():
+                worker.process.kill()
@@ -0,0 +1,45 @@
+"""Объединение одинаковых одновременных запросов (single-flight)."""
+import threading
+from concurrent.futures import Future
+
+from metrics import API_COALESCED
+
+
+class SingleFlight:
+    """Выполняет одинаковые одновременные вызовы один раз.
+
+    Пока вызов с ключом key выполняется, остальные вызовы с тем же
+    ключом не запускают func, а ждут его и получают тот же результат
+    или то же исключение. Завершённые вызовы не кэшируются.
+    """
+
+    def __init__(self):
+        """Нет вызовов в работе."""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Результат func() - своего или уже идущего вызова с key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            API_COALESCED.inc()
+            return call.result()
+        try:
+            result = func()
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def __len__(self):
+        """Количество вызовов в работе."""
+        return len(self._calls)
@@ -0,0 +1,230 @@
+"""Хранилище состояния подписок: курсор from_date и статусы работ."""
+import sqlite3
+import threading
+import time
+
+
+class StateStore:
+    """Базовое хранилище с пакетной записью изменений.
+
+    Чтение идёт из памяти, изменения копятся в буфере и сбрасываются
+    в бэкенд одной транзакцией, когда набралось batch_size записей
+    или прошло flush_interval секунд с прошлого сброса.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=5.0,
+                 clock=time.monotonic):
+        """Буфер на batch_size записей или flush_interval секунд."""
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._cursors = {}
+        self._homeworks = {}
+        self._pending_cursors = {}
+        self._pending_homeworks = {}
+        self._messages = []
+        self._flushed_at = clock()
+
+    def get_cursor(self, key):
+        """Последний сохранённый current_date подписки."""
+        return self._cursors.get(key)
+
+    def set_cursor(self, key, value):
+        """Запоминает current_date подписки."""
+        with self._lock:
+            self._cursors[key] = value
+            self._pending_cursors[key] = value
+            self._maybe_flush()
+
+    def get_homeworks(self, key):
+        """Индекс работ подписки: ключ работы -> (status, date_updated).
+
+        Возвращается словарь самого хранилища, его нельзя менять
+        напрямую - только через set_homework.
+        """
+        with self._lock:
+            return self._homeworks.setdefault(key, {})
+
+    def set_homework(self, key, homework, status, date_updated=None):
+        """Запоминает отправленный статус работы."""
+        with self._lock:
+            self._homeworks.setdefault(key, {})[homework] = (
+                status, date_updated
+            )
+            self._pending_homeworks[(key, homework)] = (status, date_updated)
+            self._maybe_flush()
+
+    def save_messages(self, messages):
+        """Сохраняет недоставленные сообщения (chat_id, text)."""
+        with self._lock:
+            self._save_messages(list(messages))
+
+    def take_messages(self, select=None):
+        """Забирает сохранённые сообщения; второй раз они не вернутся.
+
+        С select забираются только сообщения чатов, для которых
+        select(chat_id) истинно; остальные остаются в хранилище.
+        """
+        with self._lock:
+            return self._take_messages(select)
+
+    @property
+    def pending(self):
+        """Количество изменений, ещё не записанных в бэкенд."""
+        return len(self._pending_cursors) + len(self._pending_homeworks)
+
+    def flush(self):
+        """Записывает накопленные изменения в бэкенд."""
+        with self._lock:
+            if self.pending:
+                self._write(self._pending_cursors, self._pending_homeworks)
+                self._pending_cursors = {}
+                self._pending_homeworks = {}
+            self._flushed_at = self.clock()
+
+    def close(self):
+        """Сбрасывает изменения и закрывает бэкенд."""
+        self.flush()
+
+    def reload(self, key):
+        """Перечитывает состояние подписки из бэкенда.
+
+        Нужно, когда до этого подписку обслуживал другой процесс.
+        """
+        with self._lock:
+            self.flush()
+            self._reload(key)
+
+    def _reload(self, key):
+        pass
+
+    def _maybe_flush(self):
+        if (
+            self.pending >= self.batch_size
+            or self.clock() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def _write(self, cursors, homeworks):
+        raise NotImplementedError
+
+    def _save_messages(self, messages):
+        self._messages.extend(messages)
+
+    def _take_messages(self, select):
+        taken, kept = [], []
+        for message in self._messages:
+            if select is None or select(message[0]):
+                taken.append(message)
+            else:
+                kept.append(message)
+        self._messages = kept
+        return taken
+
+
+class MemoryStateStore(StateStore):
+    """Хранилище в памяти процесса, теряется при перезапуске."""
+
+    def _write(self, cursors, homeworks):
+        pass
+
+
+class SQLiteStateStore(StateStore):
+    """Хранилище в файле SQLite в режиме WAL."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cursors ('
+        'key TEXT PRIMARY KEY, from_date INTEGER)',
+        'CREATE TABLE IF NOT EXISTS homeworks ('
+        'key TEXT, homework TEXT, status TEXT, date_updated TEXT, '
+        'PRIMARY KEY (key, homework))',
+        'CREATE TABLE IF NOT EXISTS outbox (chat_id, text TEXT)',
+    )
+
+    def __init__(self, path, **kwargs):
+        """Открывает базу path и создаёт таблицы."""
+        super().__init__(**kwargs)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
+        self._load()
+
+    def _load(self):
+        self._cursors = dict(
+            self._connection.execute('SELECT key, from_date FROM cursors')
+        )
+        rows = self._connection.execute(
+            'SELECT key, homework, status, date_updated FROM homeworks'
+        )
+        for key, homework, status, date_updated in rows:
+            self._homeworks.setdefault(key, {})[homework] = (
+                status, date_updated
+            )
+
+    def _reload(self, key):
+        row = self._connection.execute(
+            'SELECT from_date FROM cursors WHERE key = ?', (key,)
+        ).fetchone()
+        if row is not None:
+            self._cursors[key] = row[0]
+        homeworks = self._homeworks.setdefault(key, {})
+        homeworks.clear()
+        rows = self._connection.execute(
+            'SELECT homework, status, date_updated FROM homeworks '
+            'WHERE key = ?', (key,)
+        )
+        for homework, status, date_updated in rows:
+            homeworks[homework] = (status, date_updated)
+
+    def _write(self, cursors, homeworks):
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO cursors VALUES (?, ?)',
+                cursors.items(),
+            )
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO homeworks VALUES (?, ?, ?, ?)',
+                (
+                    (key, homework, status, date_updated)
+                    for (key, homework), (status, date_updated)
+                    in homeworks.items()
+                ),
+            )
+
+    def _save_messages(self, messages):
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO outbox VALUES (?, ?)', messages
+            )
+
+    def _take_messages(self, select):
+        with self._connection:
+            self._connection.execute('BEGIN IMMEDIATE')
+            rows = [
+                row for row in self._connection.execute(
+                    'SELECT rowid, chat_id, text FROM outbox ORDER BY rowid'
+                )
+                if select is None or select(row[1])
+            ]
+            self._connection.executemany(
+                'DELETE FROM outbox WHERE rowid = ?',
+                [(rowid,) for rowid, _, _ in rows],
+            )
+        return [(chat_id, text) for _, chat_id, text in rows]
+
+    def close(self):
+        """Сбрасывает изменения и закрывает соединение с базой."""
+        super().close()
+        self._connection.close()
+
+
+def open_state_store(path):
+    """Хранилище по пути к файлу; ':memory:' - хранилище в памяти."""
+    if not path or path == ':memory:':
+        return MemoryStateStore()
+    return SQLiteStateStore(path)
@@ -0,0 +1,151 @@
+"""Реестр подписок: пары токен Я.Практикума -> чат Telegram."""
+import json
+import sqlite3
+import threading
+
+from exceptions import SubscriptionError
+
+
+class Subscription:
+    """Подписка одного чата на статусы работ одного токена."""
+
+    __slots__ = (
+        'token', 'chat_id', 'from_date', 'last_report', 'index', 'cache',
+        'timeline', 'paused', 'lock',
+    )
+
+    def __init__(self, token, chat_id, from_date=None):
+        """Подписка чата chat_id на токен token."""
+        self.token = token
+        self.chat_id = chat_id
+        self.from_date = from_date
+        self.last_report = None
+        self.index = None
+        self.cache = None
+        self.timeline = None
+        self.paused = False
+        self.lock = threading.Lock()
+
+    @property
+    def key(self):
+        """Уникальный ключ подписки."""
+        return f'{self.token}:{self.chat_id}'
+
+    def __repr__(self):
+        """Представление без токена, чтобы он не попал в лог."""
+        return f'Subscription(chat_id={self.chat_id!r})'
+
+
+class SubscriptionRegistry:
+    """Набор подписок с доступом по ключу, токену и чату."""
+
+    def __init__(self, subscriptions=()):
+        """Реестр из подписок subscriptions."""
+        self._items = {}
+        self._by_token = {}
+        self._by_chat = {}
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def add(self, subscription):
+        """Добавляет подписку, дубликаты игнорируются."""
+        if subscription.key in self._items:
+            return self._items[subscription.key]
+        self._items[subscription.key] = subscription
+        self._by_token.setdefault(subscription.token, []).append(subscription)
+        self._by_chat.setdefault(
+            str(subscription.chat_id), []
+        ).append(subscription)
+        return subscription
+
+    def remove(self, key):
+        """Удаляет подписку по ключу."""
+        subscription = self._items.pop(key, None)
+        if subscription is not None:
+            same_token = self._by_token[subscription.token]
+            same_token.remove(subscription)
+            if not same_token:
+                del self._by_token[subscription.token]
+            same_chat = self._by_chat[str(subscription.chat_id)]
+            same_chat.remove(subscription)
+            if not same_chat:
+                del self._by_chat[str(subscription.chat_id)]
+        return subscription
+
+    def replace(self, subscriptions):
+        """Приводит реестр к новому набору подписок.
+
+        Подписки с теми же ключами остаются прежними объектами вместе
+        с их состоянием. Возвращает списки добавленных и удалённых.
+        """
+        fresh = {
+            subscription.key: subscription for subscription in subscriptions
+        }
+        removed = [
+            self.remove(key) for key in list(self._items) if key not in fresh
+        ]
+        added = [
+            self.add(subscription) for key, subscription in fresh.items()
+            if key not in self._items
+        ]
+        return added, removed
+
+    def get(self, key):
+        """Возвращает подписку по ключу."""
+        return self._items.get(key)
+
+    def by_token(self, token):
+        """Все подписки на токен."""
+        return list(self._by_token.get(token, ()))
+
+    def by_chat(self, chat_id):
+        """Все подписки чата; chat_id можно передать числом или строкой."""
+        return list(self._by_chat.get(str(chat_id), ()))
+
+    def __iter__(self):
+        """Подписки реестра."""
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        """Количество подписок."""
+        return len(self._items)
+
+    def __contains__(self, key):
+        """Есть ли подписка с ключом key."""
+        return key in self._items
+
+
+def _read_json(path):
+    """Читает подписки из JSON-файла вида [{"token": .., "chat_id": ..}]."""
+    with open(path, encoding='UTF-8') as file:
+        data = json.load(file)
+    if not isinstance(data, list):
+        raise SubscriptionError(f'Неверный формат файла подписок {path}')
+    return [(item['token'], item['chat_id']) for item in data]
+
+
+def _read_sqlite(path):
+    """Читает подписки из таблицы subscriptions(token, chat_id)."""
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(
+            'SELECT token, chat_id FROM subscriptions'
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def load_subscriptions(path):
+    """Загружает реестр подписок из JSON-файла или базы SQLite."""
+    reader = _read_sqlite if path.endswith(('.db', '.sqlite')) else _read_json
+    try:
+        pairs = reader(path)
+    except SubscriptionError:
+        raise
+    except Exception as error:
+        raise SubscriptionError(
+            f'Не удалось загрузить подписки из {path} - {error}'
+        ) from error
+    return SubscriptionRegistry(
+        Subscription(token, chat_id) for token, chat_id in pairs if token
+    )
@@ -0,0 +1,47 @@
+import json
+from http import HTTPStatus
+
+
+class Clock:
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeOutbox:
+
+    def __init__(self):
+        self.sent = []
+
+    def put(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+class FakeResponse:
+
+    def __init__(self, homeworks=(), status_code=HTTPStatus.OK,
+                 current_date=1):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = json.dumps(
+            {'homeworks': list(homeworks), 'current_date': current_date}
+        ).encode()
+
+
+class FakeSession:
+
+    def __init__(self, homeworks=(), status_code=HTTPStatus.OK,
+                 current_date=1):
+        self.homeworks = homeworks
+        self.status_code = status_code
+        self.current_date = current_date
+        self.calls = []
+
+    def get(self, **kwargs):
+        self.calls.append(kwargs['params']['from_date'])
+        return FakeResponse(
+            self.homeworks, self.status_code, self.current_date
+        )
@@ -1,3 +1,4 @@
+import logging
 import random
 from datetime import datetime
 
@@ -19,3 +20,13 @@ def current_timestamp():
 @pytest.fixture
 def api_url():
     return 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+
+
+@pytest.fixture
+def homework(monkeypatch):
+    import homework
+    monkeypatch.setattr(
+        homework, 'logger', logging.getLogger('homework_bot.test'),
+        raising=False,
+    )
+    return homework
@@ -0,0 +1,47 @@
+from http import HTTPStatus
+
+from api_cache import CachedResponse, current_date
+
+
+class FakeResponse:
+
+    def __init__(self, content=b'', status_code=HTTPStatus.OK, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestCachedResponse:
+
+    def test_same_body_with_new_current_date_is_fresh(self):
+        cache = CachedResponse()
+        first = FakeResponse(b'{"homeworks": [], "current_date": 100}')
+        assert not cache.is_fresh(first)
+        cache.commit(first)
+        second = FakeResponse(b'{"homeworks": [], "current_date": 200}')
+        assert cache.is_fresh(second), (
+            'Проверьте, что ответ, отличающийся только current_date, '
+            'не разбирается повторно'
+        )
+        assert current_date(second) == 200
+
+    def test_not_committed_response_is_not_cached(self):
+        cache = CachedResponse()
+        response = FakeResponse(b'{"homeworks": [{}], "current_date": 1}')
+        assert not cache.is_fresh(response)
+        assert not cache.is_fresh(response), (
+            'Проверьте, что необработанный ответ не попадает в кэш'
+        )
+
+    def test_conditional_headers(self):
+        cache = CachedResponse()
+        response = FakeResponse(b'{}', headers={
+            'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'
+        })
+        cache.is_fresh(response)
+        cache.commit(response)
+        assert cache.headers() == {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+        }
+        assert cache.is_fresh(FakeResponse(status_code=HTTPStatus.NOT_MODIFIED))
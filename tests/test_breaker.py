@@ -0,0 +1,178 @@
+from http import HTTPStatus
+
+import pytest
+
+from breaker import BreakerState, CircuitBreaker
+from fixtures.fakes import Clock, FakeOutbox, FakeSession
+from records import Homework
+from scheduler import AdaptiveInterval, PollOutcome, Scheduler
+from state import MemoryStateStore
+from subscriptions import Subscription
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_and_recovers(self):
+        clock = Clock()
+        changes = []
+        breaker = CircuitBreaker(
+            3, reset_timeout=60, clock=clock,
+            on_change=lambda old, new: changes.append(new),
+        )
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert not breaker.allow(), (
+            'Проверьте, что после порога сбоев запросы не выполняются'
+        )
+
+        clock.now = 60
+        assert breaker.allow(), 'Проверьте пробный запрос после паузы'
+        assert not breaker.allow(), (
+            'Проверьте, что в пробном режиме запросов не больше '
+            'half_open_calls'
+        )
+        breaker.record_success()
+        assert breaker.state is BreakerState.CLOSED
+        assert changes == [
+            BreakerState.OPEN, BreakerState.HALF_OPEN, BreakerState.CLOSED
+        ]
+
+    def test_failed_trial_reopens(self):
+        clock = Clock()
+        breaker = CircuitBreaker(1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state is BreakerState.OPEN
+        clock.now = 15
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state is BreakerState.CLOSED
+
+
+class TestOutage:
+
+    @pytest.fixture
+    def homework(self, homework, monkeypatch):
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 'admin')
+        return homework
+
+    def make_subscriptions(self, homework, count):
+        store = MemoryStateStore()
+        subscriptions = [Subscription(f'token{i}', i) for i in range(count)]
+        for subscription in subscriptions:
+            homework.prepare_subscription(store, subscription, 0)
+        return store, subscriptions
+
+    def test_outage_is_reported_once(self, homework):
+        outbox = FakeOutbox()
+        breaker = CircuitBreaker(
+            3, on_change=lambda old, new: homework.report_outage(
+                outbox, old, new
+            ),
+        )
+        session = FakeSession(status_code=HTTPStatus.SERVICE_UNAVAILABLE)
+        store, subscriptions = self.make_subscriptions(homework, 10)
+
+        outcomes = [
+            homework.poll_subscription(
+                outbox, session, store, breaker, subscription
+            )
+            for subscription in subscriptions
+        ]
+        assert len(session.calls) == 3, (
+            'Проверьте, что после размыкания предохранителя запросы к API '
+            'не отправляются'
+        )
+        assert outcomes[:3] == [PollOutcome.FAILED] * 3
+        assert outcomes[3:] == [PollOutcome.SHED] * 7
+        assert [chat_id for chat_id, _ in outbox.sent] == ['admin'], (
+            'Проверьте, что о сбое API сообщается один раз, а не в каждый чат'
+        )
+
+    def test_malformed_trial_keeps_breaker_open(self, homework):
+        outbox = FakeOutbox()
+        clock = Clock()
+        breaker = CircuitBreaker(
+            1, reset_timeout=60, clock=clock,
+            on_change=lambda old, new: homework.report_outage(
+                outbox, old, new
+            ),
+        )
+        breaker.record_failure()
+        session = FakeSession([{'status': 'approved'}])
+        store, subscriptions = self.make_subscriptions(homework, 3)
+        for subscription in subscriptions:
+            clock.now += 60
+            outcome = homework.poll_subscription(
+                outbox, session, store, breaker, subscription
+            )
+            assert outcome is PollOutcome.FAILED
+            assert breaker.state is BreakerState.OPEN
+        assert len(session.calls) == 3
+        assert [text for _, text in outbox.sent] == [
+            'Сбой в работе программы: API Практикума недоступно, '
+            'опрос приостановлен'
+        ], (
+            'Проверьте, что пробный запрос с битым ответом не сообщает '
+            'о восстановлении API'
+        )
+
+    def test_subscription_error_goes_to_its_chat(self, homework):
+        outbox = FakeOutbox()
+        breaker = CircuitBreaker(1)
+        store, (subscription,) = self.make_subscriptions(homework, 1)
+        outcome = homework.poll_subscription(
+            outbox, FakeSession(status_code=HTTPStatus.UNAUTHORIZED), store,
+            breaker, subscription,
+        )
+        assert outcome is PollOutcome.FAILED
+        assert breaker.state is BreakerState.CLOSED, (
+            'Проверьте, что ошибка токена не размыкает предохранитель'
+        )
+        assert [chat_id for chat_id, _ in outbox.sent] == [0]
+
+    def test_invalid_token_backs_off(self, homework):
+        breaker = CircuitBreaker(1)
+        session = FakeSession(status_code=HTTPStatus.UNAUTHORIZED)
+        store, (subscription,) = self.make_subscriptions(homework, 1)
+        policy = AdaptiveInterval(
+            600, reviewing_interval=120, idle_interval=1800,
+            idle_after=86400, max_backoff=3600, rand=lambda: 1.0,
+        )
+        scheduler = Scheduler(600, clock=lambda: 0, policy=policy)
+        scheduler.add(subscription, now=0)
+        deadlines = []
+        for _ in range(4):
+            outcome = homework.poll_subscription(
+                FakeOutbox(), session, store, breaker, subscription
+            )
+            scheduler.reschedule(subscription, outcome, now=0)
+            deadlines.append(scheduler.next_deadline())
+        assert deadlines == [600, 1200, 2400, 3600], (
+            'Проверьте, что подписка с неверным токеном опрашивается '
+            'всё реже'
+        )
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_polls_are_shed_while_open(self, homework):
+        clock = Clock()
+        breaker = CircuitBreaker(1, reset_timeout=60, clock=clock)
+        breaker.record_failure()
+        _, (idle, reviewing) = self.make_subscriptions(homework, 2)
+        reviewing.index.commit(Homework('1', 'hw', 'reviewing'))
+        assert not homework.admit_poll(breaker, idle)
+        assert not homework.admit_poll(breaker, reviewing), (
+            'Проверьте, что разомкнутый предохранитель сбрасывает опросы '
+            'до запуска, раз запрос всё равно не будет выполнен'
+        )
+        clock.now = 60
+        assert homework.admit_poll(breaker, idle)
+        assert homework.admit_poll(breaker, reviewing)
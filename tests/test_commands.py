@@ -0,0 +1,224 @@
+import sys
+import threading
+
+from api_cache import TTLCache
+from breaker import CircuitBreaker
+from commands import UpdatePoller, parse_command
+from fixtures.fakes import Clock, FakeOutbox, FakeSession
+from records import Homework
+from state import MemoryStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+from timeline import Timeline
+
+
+class FakeMessage:
+
+    def __init__(self, chat_id, text):
+        self.chat_id = chat_id
+        self.text = text
+
+
+class FakeUpdate:
+
+    def __init__(self, update_id, chat_id, text):
+        self.update_id = update_id
+        self.effective_message = FakeMessage(chat_id, text)
+
+
+class FakeBot:
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.offsets = []
+
+    def get_updates(self, offset=None, timeout=None, **kwargs):
+        self.offsets.append(offset)
+        updates, self.updates = self.updates, []
+        return updates
+
+
+class TestUpdatePoller:
+
+    def test_parse_command(self):
+        assert parse_command('/status@homework_bot') == ('status', '')
+        assert parse_command('/History  hw1 ') == ('history', 'hw1')
+        assert parse_command('привет') is None
+        assert parse_command(None) is None
+
+    def test_commands_are_answered_and_confirmed(self):
+        bot = FakeBot([
+            FakeUpdate(10, 1, '/status'),
+            FakeUpdate(11, 1, 'просто текст'),
+            FakeUpdate(12, 2, '/boom'),
+        ])
+        replies = []
+
+        def handle(chat_id, command, argument):
+            if command == 'boom':
+                raise ValueError('сбой')
+            return f'{command} для {chat_id}'
+
+        poller = UpdatePoller(
+            bot, handle, lambda *args: replies.append(args)
+        )
+        assert poller.poll_once() == 1
+        assert replies == [(1, 'status для 1')]
+        poller.poll_once()
+        assert bot.offsets == [None, 13], (
+            'Проверьте, что полученные обновления подтверждаются offset'
+        )
+
+
+class TestTTLCache:
+
+    def test_burst_is_served_from_cache(self):
+        clock = Clock()
+        cache = TTLCache(30, clock=clock)
+        loads = []
+
+        def load():
+            loads.append(clock.now)
+            return len(loads)
+
+        assert [cache.get('token', load) for _ in range(5)] == [1] * 5
+        clock.now = 30
+        assert cache.get('token', load) == 2, (
+            'Проверьте, что значение перечитывается после ttl'
+        )
+
+    def test_size_is_limited(self):
+        cache = TTLCache(30, max_size=2)
+        for key in 'abc':
+            cache.get(key, lambda: key)
+        assert cache.get('a', lambda: 'new') == 'new'
+
+
+class TestCommandHandlers:
+
+    def make_shard(self, homework, *subscriptions):
+        store = MemoryStateStore()
+        for subscription in subscriptions:
+            homework.prepare_subscription(store, subscription, 1)
+        return SubscriptionRegistry(subscriptions)
+
+    def test_status_from_index(self, homework):
+        subscription = Subscription('token', 1)
+        shard = self.make_shard(homework, subscription)
+        subscription.index.commit(Homework('1', 'hw1', 'approved'))
+        subscription.index.commit(Homework('2', 'hw2', 'reviewing'))
+        subscription.last_report = 'Работа взята на проверку'
+
+        answer = homework.command_status(shard, '1', '')
+        assert 'На ревью: 1' in answer
+        assert 'Принято: 1' in answer
+        assert 'Работа взята на проверку' in answer
+
+    def test_status_during_commits(self, homework):
+        subscription = Subscription('token', 1)
+        shard = self.make_shard(homework, subscription)
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        done = threading.Event()
+
+        def commit():
+            for number in range(20000):
+                subscription.index.commit(
+                    Homework(str(number), f'hw{number}', 'reviewing')
+                )
+            done.set()
+
+        writer = threading.Thread(target=commit)
+        writer.start()
+        try:
+            while not done.is_set():
+                homework.command_status(shard, 1, '')
+        finally:
+            writer.join()
+            sys.setswitchinterval(interval)
+        assert 'На ревью: 20000' in homework.command_status(shard, 1, ''), (
+            'Проверьте, что /status отвечает, пока опросы пишут в индекс'
+        )
+
+    def test_homeworks_burst_makes_one_request(self, homework):
+        subscription = Subscription('token', 1)
+        shard = self.make_shard(homework, subscription)
+        session = FakeSession([
+            {'homework_name': 'hw1', 'status': 'rejected'},
+        ])
+        handlers = homework.make_commands(
+            session, CircuitBreaker(), shard, None
+        )
+        answers = [
+            homework.handle_command(handlers, shard, 1, 'homeworks', '')
+            for _ in range(10)
+        ]
+        assert answers == ['hw1: на доработке'] * 10
+        assert session.calls == [0], (
+            'Проверьте, что серия команд обслуживается одним запросом '
+            'к API с from_date=0'
+        )
+
+    def test_unknown_chat_is_ignored(self, homework):
+        shard = self.make_shard(homework, Subscription('token', 1))
+        handlers = homework.make_commands(None, CircuitBreaker(), shard, None)
+        assert homework.handle_command(handlers, shard, 2, 'status', '') is None
+        assert homework.handle_command(
+            handlers, shard, 1, 'start', ''
+        ) == homework.HELP_TEXT
+
+    def test_profile_only_for_admin(self, homework, monkeypatch):
+        class FakeProfiler:
+            duration = 30
+
+            def trigger(self, duration=None):
+                self.duration = duration
+                return 'profile.folded'
+
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '1')
+        profiler = FakeProfiler()
+        assert homework.command_profile(profiler, 2, '') == (
+            homework.HELP_TEXT
+        ), 'Проверьте, что профиль снимает только администратор'
+        assert homework.command_profile(profiler, 1, '9999') == (
+            'Снимаю профиль 300 с: profile.folded'
+        )
+        assert profiler.duration == homework.PROFILE_MAX_SECONDS
+
+    def test_pause_stops_polls_and_events(self, homework):
+        subscription = Subscription('token', 1)
+        shard = self.make_shard(homework, subscription)
+        homework.command_pause(shard, True, 1, '')
+        assert not homework.admit_poll(CircuitBreaker(), subscription)
+
+        outbox = FakeOutbox()
+        notified = homework.handle_event(
+            outbox, shard, 'token', [Homework('1', 'hw1', 'approved')]
+        )
+        assert notified == 0 and outbox.sent == [], (
+            'Проверьте, что на паузе не приходят и push-уведомления'
+        )
+        homework.command_pause(shard, False, 1, '')
+        assert homework.admit_poll(CircuitBreaker(), subscription)
+
+    def test_history_from_timeline(self, homework):
+        timeline = Timeline(':memory:')
+        timeline.append(1, Homework('1', 'hw1', 'reviewing'), now=0)
+        timeline.append(1, Homework('1', 'hw1', 'approved'), now=7200)
+        answer = homework.command_history(timeline, 1, '')
+        assert answer.splitlines()[0] == '01.01.1970 02:00 UTC hw1: принято'
+        assert 'в среднем 2.0 ч' in answer
+
+    def test_history_for_string_chat_id(self, homework):
+        timeline = Timeline(':memory:')
+        subscription = Subscription('token', '1')
+        self.make_shard(homework, subscription)
+        subscription.timeline = timeline
+        homework.notify_changes(
+            FakeOutbox(), subscription,
+            [Homework('1', 'hw1', 'approved', '1970-01-01T02:00:00Z')],
+        )
+        answer = homework.command_history(timeline, 1, '')
+        assert answer == '01.01.1970 02:00 UTC hw1: принято', (
+            'Проверьте, что история находится, когда chat_id подписки '
+            'строка, а команда пришла с числом'
+        )
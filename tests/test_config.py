@@ -0,0 +1,171 @@
+import json
+import os
+
+import pytest
+
+from config import Config, FileWatcher, load_config, parse_config
+from exceptions import ConfigError
+from scheduler import FixedInterval, Scheduler
+from state import MemoryStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+
+DEFAULTS = Config(
+    {
+        'retry_time': 600, 'reviewing_retry_time': 120,
+        'idle_retry_time': 1800, 'max_backoff': 3600,
+    },
+    'https://example.com/api/',
+    {'approved': 'ok', 'reviewing': 'wait', 'rejected': 'fix'},
+)
+
+
+class TestParseConfig:
+
+    def test_values_override_defaults(self):
+        config = parse_config({
+            'retry_time': 60,
+            'homework_statuses': {'approved': 'Принято'},
+            'subscriptions': [{'token': 'a', 'chat_id': 1}],
+        }, DEFAULTS)
+        assert config.intervals['retry_time'] == 60
+        assert config.intervals['max_backoff'] == 3600, (
+            'Проверьте, что незаданные интервалы берутся из значений '
+            'по умолчанию'
+        )
+        assert config.homework_statuses['approved'] == 'Принято'
+        assert config.homework_statuses['rejected'] == 'fix'
+        assert config.subscriptions == [('a', 1)]
+        assert parse_config({}, DEFAULTS).subscriptions is None
+
+    @pytest.mark.parametrize('data', [
+        [],
+        {'retry': 60},
+        {'retry_time': 0},
+        {'retry_time': '60'},
+        {'retry_time': True},
+        {'endpoint': 'ftp://example.com'},
+        {'homework_statuses': {'lost': 'Потеряна'}},
+        {'homework_statuses': {'approved': ''}},
+        {'homework_statuses': {'approved': 'Работа {name}'}},
+        {'subscriptions': {'token': 'a'}},
+        {'subscriptions': [{'chat_id': 1}]},
+    ])
+    def test_invalid_config(self, data):
+        with pytest.raises(ConfigError):
+            parse_config(data, DEFAULTS)
+
+    def test_broken_json(self, tmp_path):
+        path = tmp_path / 'config.json'
+        path.write_text('{"retry_time": ')
+        with pytest.raises(ConfigError):
+            load_config(str(path), DEFAULTS)
+
+
+class TestFileWatcher:
+
+    def write(self, path, data, mtime):
+        path.write_text(json.dumps(data))
+        os.utime(path, (mtime, mtime))
+
+    def test_invalid_change_keeps_previous_config(self, tmp_path):
+        path = tmp_path / 'config.json'
+        self.write(path, {'retry_time': 60}, 1)
+        applied = []
+        watcher = FileWatcher([str(path), None], lambda: applied.append(
+            load_config(str(path), DEFAULTS).intervals['retry_time']
+        ))
+        assert not watcher.check(), 'Файл не менялся'
+
+        self.write(path, {'retry_time': -1}, 2)
+        assert not watcher.check(), (
+            'Проверьте, что неверная конфигурация не применяется'
+        )
+        assert not watcher.check(), (
+            'Проверьте, что ошибка не повторяется до следующего изменения'
+        )
+        self.write(path, {'retry_time': 30}, 3)
+        assert watcher.check()
+        assert applied == [30]
+
+
+class TestRetune:
+
+    def test_far_deadlines_move_into_new_window(self):
+        scheduler = Scheduler(600, clock=lambda: 0)
+        subscriptions = [Subscription(f'token{i}', i) for i in range(20)]
+        for subscription in subscriptions:
+            scheduler.push(subscription, 500)
+        scheduler.retune(60, FixedInterval(60), now=0)
+        assert len(scheduler) == 20
+        assert scheduler.next_deadline() < 60, (
+            'Проверьте, что после уменьшения интервала опросы переносятся '
+            'в новое окно'
+        )
+        assert len(scheduler.pop_due(now=59)) == 20
+        assert scheduler.pop_due(now=500) == [], (
+            'Проверьте, что старые сроки опроса больше не срабатывают'
+        )
+
+
+class FakeEngine:
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.retuned = []
+
+    def add(self, subscription):
+        self.added.append(subscription.key)
+
+    def remove(self, subscription):
+        self.removed.append(subscription.key)
+
+    def retune(self, interval, policy):
+        self.retuned.append(interval)
+
+
+class TestApplyConfig:
+
+    @pytest.fixture
+    def homework(self, homework, monkeypatch):
+        for name in (
+            'ENDPOINT', 'HOMEWORK_STATUSES', 'STATUS_TEMPLATES', 'RETRY_TIME',
+            'REVIEWING_RETRY_TIME', 'IDLE_RETRY_TIME', 'MAX_BACKOFF',
+            'INGEST_PORT',
+        ):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        homework.INGEST_PORT = 0
+        return homework
+
+    def test_subscriptions_and_settings_swapped(self, homework):
+        store = MemoryStateStore()
+        kept, dropped = Subscription('a', 1), Subscription('b', 2)
+        registry = SubscriptionRegistry([kept, dropped])
+        kept.last_report = 'report'
+        engine = FakeEngine()
+        config = parse_config({
+            'retry_time': 60,
+            'homework_statuses': {'approved': 'Принято.'},
+            'subscriptions': [
+                {'token': 'a', 'chat_id': 1}, {'token': 'c', 'chat_id': 3},
+            ],
+        }, homework.DEFAULT_CONFIG)
+
+        homework.apply_config(
+            engine, store, registry, registry, None, config,
+            homework.load_registry(config),
+        )
+        assert engine.retuned == [60]
+        assert homework.RETRY_TIME == 60
+        assert homework.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}
+        ) == 'Изменился статус проверки работы "hw". Принято.'
+        assert [subscription.key for subscription in registry] == [
+            kept.key, Subscription('c', 3).key
+        ]
+        assert registry.get(kept.key) is kept, (
+            'Проверьте, что оставшиеся подписки сохраняют своё состояние'
+        )
+        assert kept.last_report == 'report'
+        assert engine.removed == [dropped.key]
+        assert engine.added == [Subscription('c', 3).key]
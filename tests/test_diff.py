@@ -0,0 +1,68 @@
+import sys
+import threading
+
+from diff import HomeworkIndex
+from records import Homework
+from state import MemoryStateStore
+
+
+def make_homework(homework_id, status, date_updated):
+    return Homework(
+        str(homework_id), f'hw{homework_id}', status, date_updated
+    )
+
+
+class TestHomeworkIndex:
+
+    def test_all_transitions_are_reported(self):
+        index = HomeworkIndex()
+        homeworks = [
+            make_homework(2, 'approved', '2022-01-02T00:00:00Z'),
+            make_homework(1, 'reviewing', '2022-01-01T00:00:00Z'),
+        ]
+        changes = index.changes(homeworks)
+        assert [hw.key for hw in changes] == ['1', '2'], (
+            'Проверьте, что сообщается о каждой изменившейся работе, '
+            'начиная с самой старой'
+        )
+        for homework in changes:
+            index.commit(homework)
+        assert index.changes(homeworks) == []
+
+    def test_same_status_with_new_date_is_a_change(self):
+        index = HomeworkIndex()
+        index.commit(make_homework(1, 'rejected', '2022-01-01T00:00:00Z'))
+        changes = index.changes(
+            [make_homework(1, 'rejected', '2022-01-05T00:00:00Z')]
+        )
+        assert len(changes) == 1
+
+    def test_commit_goes_to_store(self):
+        store = MemoryStateStore()
+        index = HomeworkIndex(
+            store.get_homeworks('sub'),
+            lambda *args: store.set_homework('sub', *args),
+        )
+        index.commit(make_homework(1, 'approved', None))
+        assert store.get_homeworks('sub') == {'1': ('approved', None)}
+
+    def test_reads_during_commits(self):
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        index = HomeworkIndex()
+        done = threading.Event()
+
+        def commit():
+            for number in range(20000):
+                index.commit(make_homework(number, 'reviewing', None))
+            done.set()
+
+        writer = threading.Thread(target=commit)
+        writer.start()
+        try:
+            while not done.is_set():
+                index.has_status('approved')
+        finally:
+            writer.join()
+            sys.setswitchinterval(interval)
+        assert len(index) == 20000
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+from engine import AsyncEngine
+from scheduler import Scheduler
+from subscriptions import Subscription
+
+
+class TestAsyncEngine:
+
+    def test_concurrent_polls_are_capped(self):
+        scheduler = Scheduler(3600)
+        subscriptions = [Subscription(f'token{i}', i) for i in range(20)]
+        for subscription in subscriptions:
+            scheduler.push(subscription, 0)
+
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0, 'polled': []}
+
+        def poll(subscription):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+                state['polled'].append(subscription)
+            if len(state['polled']) == len(subscriptions):
+                loop.call_soon_threadsafe(engine.stop)
+
+        engine = AsyncEngine(scheduler, poll, max_in_flight=4)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(asyncio.wait_for(engine.run(), 5))
+        finally:
+            loop.close()
+
+        assert len(state['polled']) == len(subscriptions), (
+            'Проверьте, что движок опрашивает все подписки'
+        )
+        assert state['peak'] <= 4, (
+            'Проверьте, что число одновременных опросов ограничено'
+        )
+        assert len(scheduler) == len(subscriptions), (
+            'Проверьте, что после опроса подписка возвращается в расписание'
+        )
+
+    def test_removed_subscription_is_not_rescheduled(self):
+        scheduler = Scheduler(3600)
+        kept, removed = Subscription('token', 1), Subscription('token', 2)
+        scheduler.push(kept, 0)
+        scheduler.push(removed, 0)
+
+        def poll(subscription):
+            if subscription is removed:
+                loop.call_soon_threadsafe(engine.remove, removed)
+                time.sleep(0.05)
+                loop.call_soon_threadsafe(engine.stop)
+
+        engine = AsyncEngine(scheduler, poll)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(asyncio.wait_for(engine.run(), 5))
+        finally:
+            loop.close()
+
+        assert len(scheduler) == 1, (
+            'Проверьте, что снятая во время опроса подписка не '
+            'возвращается в расписание'
+        )
+
+    def test_stop_waits_for_polls_within_timeout(self):
+        scheduler = Scheduler(3600)
+        fast, slow = Subscription('token', 1), Subscription('token', 2)
+        scheduler.push(fast, 0)
+        scheduler.push(slow, 0)
+        finished = []
+
+        def poll(subscription):
+            if subscription is fast:
+                loop.call_soon_threadsafe(engine.stop)
+                time.sleep(0.05)
+            else:
+                time.sleep(1)
+            finished.append(subscription)
+
+        engine = AsyncEngine(scheduler, poll, drain_timeout=0.3)
+        loop = asyncio.new_event_loop()
+        started = time.monotonic()
+        try:
+            loop.run_until_complete(asyncio.wait_for(engine.run(), 5))
+        finally:
+            loop.close()
+
+        assert finished == [fast], (
+            'Проверьте, что начатые опросы дожидаются остановки'
+        )
+        assert time.monotonic() - started < 1, (
+            'Проверьте, что ожидание опросов ограничено drain_timeout'
+        )
+
+    def test_deadline_is_fixed_at_first_stop(self):
+        engine = AsyncEngine(Scheduler(3600), lambda s: None, drain_timeout=5)
+        assert engine.deadline is None
+        before = time.monotonic()
+        engine.stop()
+        deadline = engine.deadline
+        assert before + 5 <= deadline <= time.monotonic() + 5
+        time.sleep(0.01)
+        engine.stop()
+        assert engine.deadline == deadline, (
+            'Проверьте, что повторный stop() не продлевает срок остановки'
+        )
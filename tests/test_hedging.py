@@ -0,0 +1,181 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from breaker import CircuitBreaker
+from exceptions import ErrorApi
+from hedging import HedgedClient, LatencyTracker
+
+
+class FakeResponse:
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Каждый вызов get ждёт очередную задержку из delays."""
+
+    def __init__(self, delays, errors=()):
+        self.delays = list(delays)
+        self.errors = set(errors)
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def get(self, **kwargs):
+        with self.lock:
+            number = len(self.responses)
+            response = FakeResponse(number)
+            self.responses.append(response)
+        time.sleep(self.delays[number])
+        if number in self.errors:
+            raise requests.ConnectionError(f'attempt {number}')
+        return response
+
+    def close(self):
+        pass
+
+
+def warm_tracker(latency=0.01):
+    tracker = LatencyTracker(window=50, min_samples=5)
+    for _ in range(10):
+        tracker.observe(latency)
+    return tracker
+
+
+class TestLatencyTracker:
+
+    def test_quantile_over_window(self):
+        tracker = LatencyTracker(window=100, quantile=0.95, min_samples=10)
+        assert tracker.value() is None
+        for value in range(200):
+            tracker.observe(value)
+        assert tracker.value() == 194, (
+            'Проверьте, что квантиль считается по последним window запросам'
+        )
+
+
+class TestHedgedClient:
+
+    def test_slow_request_is_hedged(self):
+        session = FakeSession([0.5, 0.01])
+        client = HedgedClient(session, warm_tracker(), min_delay=0.01)
+        started = time.monotonic()
+        response = client.get(url='x')
+        assert response.name == 1, 'Проверьте, что побеждает быстрый ответ'
+        assert time.monotonic() - started < 0.3
+        time.sleep(0.6)
+        assert session.responses[0].closed, (
+            'Проверьте, что ответ проигравшего запроса закрывается'
+        )
+        client.close()
+
+    def test_fast_request_is_not_hedged(self):
+        session = FakeSession([0.0])
+        client = HedgedClient(session, warm_tracker(0.2))
+        assert client.get(url='x').name == 0
+        assert len(session.responses) == 1
+        client.close()
+
+    def test_cold_or_disabled_client_does_not_hedge(self):
+        assert HedgedClient(FakeSession([])).hedge_delay() is None
+        client = HedgedClient(
+            FakeSession([]), warm_tracker(), enabled=lambda: False
+        )
+        assert client.hedge_delay() is None
+
+    def test_failed_first_request_falls_back_to_hedge(self):
+        session = FakeSession([0.1, 0.15], errors={0})
+        client = HedgedClient(session, warm_tracker(), min_delay=0.01)
+        assert client.get(url='x').name == 1
+        client.close()
+
+    def test_both_failed(self):
+        session = FakeSession([0.1, 0.1], errors={0, 1})
+        client = HedgedClient(session, warm_tracker(), min_delay=0.01)
+        with pytest.raises(requests.ConnectionError):
+            client.get(url='x')
+        client.close()
+
+
+class TestTimeouts:
+
+    def test_hung_connection_is_cut_by_read_timeout(self, monkeypatch):
+        import homework
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        monkeypatch.setattr(
+            homework, 'ENDPOINT', f'http://127.0.0.1:{port}/api/'
+        )
+        monkeypatch.setattr(homework, 'API_READ_TIMEOUT', 0.2)
+        started = time.monotonic()
+        try:
+            with pytest.raises(ErrorApi):
+                homework.request_homeworks({}, 0, requests.Session())
+        finally:
+            listener.close()
+        assert time.monotonic() - started < 2, (
+            'Проверьте, что запрос к API ограничен таймаутом чтения'
+        )
+
+
+class SlowFirstHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    slow = 2
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            slow = SlowFirstHandler.slow > 0
+            SlowFirstHandler.slow -= 1
+        if slow:
+            time.sleep(1)
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSaturatedPool:
+
+    def test_hedges_get_their_own_connections(self, homework, monkeypatch):
+        monkeypatch.setattr(homework, 'API_HEDGE', True)
+        monkeypatch.setattr(homework, 'MAX_IN_FLIGHT', 2)
+        monkeypatch.setattr(homework, 'HTTP_POOL_SIZE', 2)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SlowFirstHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/'
+        session, http = homework.make_http(CircuitBreaker())
+        http.tracker = warm_tracker()
+        http.min_delay = 0.05
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(2) as executor:
+                responses = list(executor.map(
+                    lambda _: http.get(url=url, timeout=5), range(2)
+                ))
+        finally:
+            elapsed = time.monotonic() - started
+            http.close()
+            server.shutdown()
+            server.server_close()
+        assert [response.status_code for response in responses] == [200] * 2
+        assert elapsed < 0.8, (
+            'Проверьте, что при занятом пуле дубли запросов не ждут '
+            'соединения за медленными запросами'
+        )
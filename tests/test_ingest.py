@@ -0,0 +1,93 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from diff import HomeworkIndex
+from fixtures.fakes import FakeOutbox
+from ingest import IngestServer
+from records import Homework
+from subscriptions import Subscription, SubscriptionRegistry
+
+
+def post(url, data, secret=None):
+    request = urllib.request.Request(
+        url, data=json.dumps(data).encode(), method='POST',
+        headers={'Content-Type': 'application/json'},
+    )
+    if secret:
+        request.add_header('X-Ingest-Secret', secret)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error)
+
+
+@pytest.fixture
+def ingest():
+    events = []
+
+    def handle_event(token, homeworks):
+        events.append((token, homeworks))
+        return len(homeworks)
+
+    server = IngestServer(('127.0.0.1', 0), handle_event, 'secret').start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/events'
+    yield url, events
+    server.stop()
+
+
+class TestIngest:
+
+    def test_event_is_accepted(self, ingest):
+        url, events = ingest
+        homework = {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+        status, body = post(
+            url, {'token': 'abc', 'homeworks': [homework]}, 'secret'
+        )
+        assert status == 202
+        assert body['notified'] == 1
+        assert events == [('abc', [Homework('1', 'hw', 'approved')])]
+
+    def test_bad_secret_is_rejected(self, ingest):
+        url, events = ingest
+        status, _ = post(url, {'token': 'abc', 'homeworks': []}, 'wrong')
+        assert status == 403
+        assert events == []
+
+    def test_malformed_event_is_rejected(self, ingest):
+        url, events = ingest
+        status, _ = post(url, {'token': 'abc', 'homeworks': {}}, 'secret')
+        assert status == 400, (
+            'Проверьте, что событие без списка работ отклоняется'
+        )
+        assert events == []
+
+    def test_homework_without_status_is_rejected(self, ingest):
+        url, events = ingest
+        status, _ = post(
+            url, {'token': 'abc', 'homeworks': [{'homework_name': 'hw'}]},
+            'secret',
+        )
+        assert status == 400, (
+            'Проверьте, что работы в событии проверяются схемой ответа API'
+        )
+        assert events == []
+
+    def test_event_reaches_every_subscription(self, homework):
+        registry = SubscriptionRegistry([
+            Subscription('abc', 1), Subscription('abc', 2),
+            Subscription('other', 3),
+        ])
+        for subscription in registry:
+            subscription.index = HomeworkIndex()
+        outbox = FakeOutbox()
+        homeworks = [Homework('1', 'hw', 'approved')]
+
+        assert homework.handle_event(outbox, registry, 'abc', homeworks) == 2
+        assert [chat_id for chat_id, _ in outbox.sent] == [1, 2]
+        assert homework.handle_event(outbox, registry, 'abc', homeworks) == 0, (
+            'Проверьте, что повторное событие не рассылается второй раз'
+        )
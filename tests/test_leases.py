@@ -0,0 +1,73 @@
+import sqlite3
+
+from fixtures.fakes import Clock
+from leases import LeaseKeeper, LeaseStore
+
+
+def make_keeper(path, node, clock):
+    return LeaseKeeper(LeaseStore(path, shards=8), node, ttl=30, clock=clock)
+
+
+class TestLeases:
+
+    def test_shards_are_split_between_nodes(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        clock = Clock(1000.0)
+        first = make_keeper(path, 'a', clock)
+        second = make_keeper(path, 'b', clock)
+
+        assert len(first.tick()) == 8
+        assert second.tick() == frozenset(), (
+            'Проверьте, что занятые шарды не достаются второму узлу'
+        )
+        assert len(first.tick()) == 4, (
+            'Проверьте, что узел отдаёт шарды сверх своей доли'
+        )
+        assert second.tick() == frozenset(), (
+            'Проверьте, что освобождённый шард нельзя взять сразу'
+        )
+        clock.now += 11
+        assert len(second.tick()) == 4
+        assert first.owned.isdisjoint(second.owned), (
+            'Проверьте, что шард принадлежит только одному узлу'
+        )
+
+    def test_dead_node_shards_are_taken_over(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        clock = Clock(1000.0)
+        first = make_keeper(path, 'a', clock)
+        second = make_keeper(path, 'b', clock)
+        first.tick()
+        clock.now += 31
+        assert len(second.tick()) == 8, (
+            'Проверьте, что шарды упавшего узла переходят к живому'
+        )
+
+    def test_stop_releases_shards(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        clock = Clock(1000.0)
+        first = make_keeper(path, 'a', clock)
+        second = make_keeper(path, 'b', clock)
+        first.tick()
+        first.stop()
+        assert len(second.tick()) == 8
+
+    def test_shards_are_dropped_before_lease_expires(self, tmp_path):
+        clock = Clock(1000.0)
+        keeper = make_keeper(str(tmp_path / 'leases.db'), 'a', clock)
+        changes = []
+        keeper._on_change = changes.append
+        keeper.tick()
+
+        def broken(*args):
+            raise sqlite3.OperationalError('database is locked')
+
+        keeper.store.acquire = broken
+        clock.now += 10
+        assert len(keeper.tick()) == 8
+        clock.now += 10
+        assert keeper.tick() == frozenset(), (
+            'Проверьте, что узел без продления отказывается от шардов '
+            'раньше, чем истечёт аренда'
+        )
+        assert [len(shards) for shards in changes] == [8, 0]
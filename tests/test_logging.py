@@ -0,0 +1,44 @@
+import json
+import logging
+
+import bot_logging
+
+
+class TestBotLogging:
+
+    def test_queue_writes_json_lines(self, tmp_path):
+        path = tmp_path / 'bot.log'
+        logger = logging.getLogger('homework_bot_test.queue')
+        logger.propagate = False
+        handler = bot_logging.file_handler(str(path), max_bytes=0)
+        listener = bot_logging.configure(
+            logger, 'INFO', [handler], json_lines=True
+        )
+        logger.debug('не должно попасть в лог')
+        logger.info('Информация отправлена в чат.')
+        bot_logging.stop_listener(listener)
+        handler.close()
+
+        lines = path.read_text(encoding='UTF-8').splitlines()
+        assert len(lines) == 1, (
+            'Проверьте, что записи ниже уровня логгера отбрасываются'
+        )
+        record = json.loads(lines[0])
+        assert record['message'] == 'Информация отправлена в чат.'
+        assert record['level'] == 'INFO'
+
+    def test_size_rotation(self, tmp_path):
+        path = tmp_path / 'bot.log'
+        logger = logging.getLogger('homework_bot_test.rotation')
+        logger.propagate = False
+        handler = bot_logging.file_handler(
+            str(path), max_bytes=200, backup_count=2
+        )
+        bot_logging.configure(logger, 'DEBUG', [handler], use_queue=False)
+        for number in range(50):
+            logger.info(f'Сообщение номер {number}')
+        handler.close()
+        assert (tmp_path / 'bot.log.1').exists(), (
+            'Проверьте, что файл лога ротируется по размеру'
+        )
+        assert not (tmp_path / 'bot.log.3').exists()
@@ -0,0 +1,52 @@
+import urllib.request
+
+from metrics import Counter, Gauge, Histogram, Registry, start_metrics_server
+
+
+class TestMetrics:
+
+    def test_exposition_format(self):
+        registry = Registry()
+        counter = Counter('test_total', 'Счётчик.', label='code',
+                          registry=registry)
+        histogram = Histogram('test_seconds', 'Время.', buckets=(0.1, 1),
+                              registry=registry)
+        gauge = Gauge('test_items', 'Количество.', registry=registry)
+        counter.labels(200).inc()
+        counter.labels(200).inc()
+        counter.labels(500).inc()
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        gauge.set_function(lambda: 7)
+
+        text = registry.render()
+        assert '# TYPE test_total counter' in text
+        assert 'test_total{code="200"} 2' in text
+        assert 'test_total{code="500"} 1' in text
+        assert 'test_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_seconds_bucket{le="1"} 2' in text
+        assert 'test_seconds_bucket{le="+Inf"} 3' in text
+        assert 'test_seconds_count 3' in text
+        assert 'test_items 7' in text
+
+    def test_labels_are_cached(self):
+        counter = Counter('cached_total', 'Счётчик.', label='result')
+        assert counter.labels('sent') is counter.labels('sent'), (
+            'Проверьте, что значения для меток не создаются на каждый вызов'
+        )
+
+    def test_metrics_endpoint(self):
+        server = start_metrics_server(0)
+        port = server.server_address[1]
+        try:
+            with urllib.request.urlopen(
+                f'http://127.0.0.1:{port}/metrics'
+            ) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert '# TYPE homework_api_request_seconds histogram' in body, (
+            'Проверьте, что метрики отдаются по /metrics'
+        )
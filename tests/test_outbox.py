@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+from exceptions import ErrorSendMessage
+from outbox import Outbox
+
+
+class FakeBot:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+        self.event = threading.Event()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+        self.event.set()
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'Не дождались отправки'
+        time.sleep(0.01)
+
+
+class TestOutbox:
+
+    def test_pending_messages_are_merged(self):
+        bot = FakeBot()
+        outbox = Outbox(bot, workers=1, chat_interval=0)
+        outbox.put(1, 'первое')
+        outbox.put(1, 'второе')
+        outbox.put(2, 'третье')
+        outbox.start()
+        wait_for(lambda: outbox.backlog == 0)
+        outbox.stop()
+        assert (1, 'первое\n\nвторое') in bot.sent, (
+            'Проверьте, что сообщения в один чат склеиваются'
+        )
+        assert (2, 'третье') in bot.sent
+
+    def test_retry_after_is_honored(self):
+        bot = FakeBot(errors=[RetryAfter(0.2)])
+        outbox = Outbox(bot, workers=1, chat_interval=0)
+        outbox.start()
+        started = time.monotonic()
+        outbox.put(1, 'текст')
+        wait_for(lambda: bot.sent)
+        outbox.stop()
+        assert time.monotonic() - started >= 0.2, (
+            'Проверьте, что отправка откладывается на retry_after'
+        )
+        assert bot.sent == [(1, 'текст')]
+
+    def test_permanent_error_drops_message(self):
+        bot = FakeBot(errors=[BadRequest('chat not found')])
+        outbox = Outbox(bot, workers=1, chat_interval=0)
+        outbox.start()
+        outbox.put(1, 'текст')
+        wait_for(lambda: outbox.backlog == 0)
+        outbox.stop()
+        assert bot.sent == []
+
+    def test_backlog_is_bounded(self):
+        outbox = Outbox(FakeBot(), max_backlog=2)
+        outbox.put(1, 'a')
+        outbox.put(2, 'b')
+        with pytest.raises(ErrorSendMessage):
+            outbox.put(3, 'c')
+
+    def test_drain_sends_queue_before_stop(self):
+        bot = FakeBot()
+        outbox = Outbox(bot, workers=2, chat_interval=0)
+        outbox.start()
+        for chat_id in range(10):
+            outbox.put(chat_id, 'текст')
+        assert outbox.drain(timeout=2) == 0
+        outbox.stop()
+        assert len(bot.sent) == 10, (
+            'Проверьте, что при остановке очередь досылается'
+        )
+
+    def test_undelivered_messages_are_handed_over(self):
+        bot = FakeBot(errors=[RetryAfter(60)])
+        outbox = Outbox(bot, workers=1, chat_interval=0)
+        outbox.start()
+        outbox.put(1, 'текст')
+        assert outbox.drain(timeout=0.2) == 1
+        outbox.stop()
+        assert outbox.take_pending() == [(1, 'текст')], (
+            'Проверьте, что недоставленные сообщения можно сохранить'
+        )
+        assert outbox.backlog == 0
+
+    def test_late_send_after_take_pending(self):
+        release = threading.Event()
+
+        class SlowBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                release.wait(2)
+                super().send_message(chat_id=chat_id, text=text)
+
+        bot = SlowBot(errors=[RetryAfter(60)])
+        outbox = Outbox(bot, workers=1, chat_interval=0)
+        outbox.start()
+        outbox.put(1, 'первое')
+        wait_for(lambda: outbox._busy)
+        outbox.put(1, 'второе')
+        outbox.shutdown()
+        assert outbox.take_pending() == [(1, 'второе')]
+        release.set()
+        outbox.join(2)
+        assert outbox.take_pending() == [(1, 'первое')], (
+            'Проверьте, что пачка, вернувшаяся после take_pending(), '
+            'не теряется'
+        )
+        assert outbox.backlog == 0
+
+
+class TestDrainOutbox:
+
+    def test_messages_saved_before_hung_sender(self, homework):
+        release = threading.Event()
+
+        class HungBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                release.wait(5)
+
+        class Store:
+            saved = []
+
+            def save_messages(self, messages):
+                self.saved.extend(messages)
+
+        outbox = Outbox(HungBot(), workers=1, chat_interval=0)
+        outbox.start()
+        outbox.put(1, 'первое')
+        wait_for(lambda: outbox._busy)
+        outbox.put(2, 'второе')
+        store = Store()
+        started = time.monotonic()
+        try:
+            homework.drain_outbox(outbox, store, time.monotonic() + 0.3)
+        finally:
+            release.set()
+        assert time.monotonic() - started < 1, (
+            'Проверьте, что вся остановка укладывается в один срок'
+        )
+        assert store.saved == [(2, 'второе')], (
+            'Проверьте, что очередь сохраняется до ожидания потоков отправки'
+        )
@@ -0,0 +1,62 @@
+import collections
+import threading
+
+from profiling import Profiler, StackSampler, write_folded
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class TestStackSampler:
+
+    def test_samples_other_threads(self, tmp_path):
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=busy_loop, args=(stop,), name='busy', daemon=True
+        )
+        thread.start()
+        try:
+            counts = StackSampler(interval=0.001).run(0.1)
+        finally:
+            stop.set()
+            thread.join()
+        stacks = [stack for stack in counts if stack.startswith('busy;')]
+        assert stacks, 'Проверьте, что снимаются стеки всех потоков'
+        assert any('busy_loop (test_profiling.py:' in stack
+                   for stack in stacks)
+
+        path = tmp_path / 'profile.folded'
+        write_folded(str(path), counts)
+        stack, count = path.read_text().splitlines()[0].rsplit(' ', 1)
+        assert counts[stack] == int(count)
+
+
+class TestProfiler:
+
+    def test_one_snapshot_at_a_time(self, tmp_path):
+        release = threading.Event()
+
+        class Sampler:
+
+            def run(self, duration):
+                release.wait(2)
+                return collections.Counter({'main;poll': 3})
+
+        profiler = Profiler(str(tmp_path), duration=1, sampler=Sampler())
+        path = profiler.trigger()
+        assert path.startswith(str(tmp_path))
+        assert profiler.trigger() is None, (
+            'Проверьте, что второй снимок не запускается, пока идёт первый'
+        )
+        release.set()
+        self.join_profiler()
+        assert open(path).read() == 'main;poll 3\n'
+        assert profiler.trigger() is not None
+        self.join_profiler()
+
+    def join_profiler(self):
+        for thread in threading.enumerate():
+            if thread.name == 'profiler':
+                thread.join(2)
@@ -0,0 +1,224 @@
+import json
+import random
+
+from diff import HomeworkIndex
+from metrics import POLLS_LATE
+from records import Homework
+from scheduler import (AdaptiveInterval, PollOutcome, Priority, Scheduler,
+                       TimerWheel, TokenBucket)
+from subscriptions import (Subscription, SubscriptionRegistry,
+                           load_subscriptions)
+
+
+class TestSubscriptions:
+
+    def test_load_json(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2},
+            {'token': 'a', 'chat_id': 1},
+        ]))
+        registry = load_subscriptions(str(path))
+        assert len(registry) == 2, (
+            'Проверьте, что дубликаты подписок не попадают в реестр'
+        )
+
+    def test_registry_remove(self):
+        subscription = Subscription('a', 1)
+        registry = SubscriptionRegistry([subscription])
+        registry.remove(subscription.key)
+        assert subscription.key not in registry
+
+
+class TestScheduler:
+
+    def test_spread_within_window(self):
+        scheduler = Scheduler(600, clock=lambda: 0)
+        for index in range(1000):
+            scheduler.add(Subscription(f'token{index}', index))
+        offsets = sorted(
+            scheduler.offset(Subscription(f'token{index}', index))
+            for index in range(1000)
+        )
+        assert 0 <= offsets[0] and offsets[-1] < 600
+        assert len(scheduler.pop_due(now=0)) < 10, (
+            'Проверьте, что опросы подписок распределены по окну'
+        )
+        assert len(scheduler.pop_due(now=600)) == 1000 - len(
+            [offset for offset in offsets if offset == 0]
+        )
+
+    def test_reschedule_moves_to_next_window(self):
+        scheduler = Scheduler(600, clock=lambda: 0)
+        subscription = Subscription('token', 1)
+        scheduler.push(subscription, 0)
+        assert scheduler.pop_due(now=0) == [subscription]
+        scheduler.reschedule(subscription, now=0)
+        assert scheduler.pop_due(now=599) == []
+        assert scheduler.next_deadline() == 600
+
+
+class TestTimerWheel:
+
+    def test_matches_sorted_reference(self):
+        rand = random.Random(1)
+        now = 1000.0
+        wheel = TimerWheel(1.0, now)
+        expected = {}
+        for _ in range(2000):
+            choice = rand.random()
+            if choice < 0.5:
+                key = rand.randrange(100)
+                deadline = now + rand.choice((
+                    rand.uniform(-5, 60), rand.uniform(0, 5000),
+                    rand.uniform(0, 10 ** 6), rand.uniform(0, 10 ** 8),
+                ))
+                wheel.add(key, deadline, key)
+                expected[key] = deadline
+            elif choice < 0.6:
+                key = rand.randrange(100)
+                wheel.cancel(key)
+                expected.pop(key, None)
+            else:
+                assert wheel.next_deadline() == min(
+                    expected.values(), default=None
+                ), 'Проверьте ближайший срок колеса таймеров'
+                now += rand.choice((0, rand.uniform(0, 100), 10 ** 5))
+                due = [(timer.key, timer.deadline)
+                       for timer in wheel.pop_due(now)]
+                assert sorted(due) == sorted(
+                    (key, deadline) for key, deadline in expected.items()
+                    if deadline <= now
+                ), 'Проверьте, что колесо отдаёт ровно наступившие сроки'
+                for key, _ in due:
+                    del expected[key]
+        assert len(wheel) == len(expected)
+
+    def test_readd_replaces_timer(self):
+        wheel = TimerWheel(1.0, 0)
+        wheel.add('a', 10, 'a')
+        wheel.add('a', 5000, 'a')
+        assert wheel.pop_due(100) == [], (
+            'Проверьте, что повторное добавление отменяет прежний срок'
+        )
+        assert wheel.next_deadline() == 5000
+
+
+class TestPriority:
+
+    def make_subscription(self, chat_id, status=None):
+        subscription = Subscription('token', chat_id)
+        if status is not None:
+            subscription.index = HomeworkIndex()
+            subscription.index.commit(Homework('1', 'hw', status))
+        return subscription
+
+    def test_reviewing_polls_go_first(self):
+        policy = AdaptiveInterval(600, 120, 1800, 3600, 3600)
+        scheduler = Scheduler(600, clock=lambda: 0, policy=policy)
+        idle = self.make_subscription(1)
+        active = self.make_subscription(2, 'approved')
+        reviewing = self.make_subscription(3, 'reviewing')
+        scheduler.add(idle, now=0)
+        scheduler.reschedule(idle, PollOutcome.UNCHANGED, now=3600)
+        scheduler.push(idle, 10)
+        scheduler.push(active, 20)
+        scheduler.push(reviewing, 30)
+        assert scheduler.pop_due(now=30, limit=1) == [reviewing], (
+            'Проверьте, что работы на ревью опрашиваются первыми'
+        )
+        assert len(scheduler) == 2, (
+            'Проверьте, что наступившие опросы сверх limit остаются в '
+            'расписании'
+        )
+        assert scheduler.next_deadline() == 10
+        assert scheduler.pop_due(now=30) == [active, idle]
+
+    def test_removed_while_waiting(self):
+        scheduler = Scheduler(600, clock=lambda: 0)
+        first, second = Subscription('a', 1), Subscription('b', 2)
+        scheduler.push(first, 0)
+        scheduler.push(second, 0)
+        scheduler.pop_due(now=0, limit=0)
+        scheduler.remove(second)
+        assert scheduler.pop_due(now=0) == [first]
+        assert len(scheduler) == 0
+
+    def test_late_start_is_counted(self):
+        scheduler = Scheduler(600, clock=lambda: 0, late_after=5)
+        subscription = self.make_subscription(1, 'reviewing')
+        scheduler.push(subscription, 100)
+        late = POLLS_LATE.labels('reviewing').value
+        scheduler.pop_due(now=100)
+        assert scheduler.started(subscription, now=102) == 2
+        assert POLLS_LATE.labels('reviewing').value == late
+        scheduler.reschedule(subscription, now=102)
+        scheduler.push(subscription, 200, Priority.REVIEWING)
+        scheduler.pop_due(now=200)
+        assert scheduler.started(subscription, now=230) == 30
+        assert POLLS_LATE.labels('reviewing').value == late + 1, (
+            'Проверьте, что опоздавшие опросы учитываются по классу '
+            'приоритета'
+        )
+
+
+class TestAdaptiveInterval:
+
+    def make_scheduler(self):
+        policy = AdaptiveInterval(
+            600, reviewing_interval=120, idle_interval=1800,
+            idle_after=86400, max_backoff=3600, rand=lambda: 1.0,
+        )
+        return Scheduler(600, clock=lambda: 0, policy=policy)
+
+    def test_reviewing_is_polled_more_often(self):
+        scheduler = self.make_scheduler()
+        subscription = Subscription('token', 1)
+        subscription.index = HomeworkIndex()
+        subscription.index.commit(Homework('1', 'hw', 'reviewing'))
+        scheduler.add(subscription, now=0)
+        scheduler.reschedule(subscription, PollOutcome.UNCHANGED, now=0)
+        assert scheduler.next_deadline() == 120, (
+            'Проверьте, что работы на ревью опрашиваются чаще'
+        )
+
+    def test_backoff_grows_and_resets(self):
+        scheduler = self.make_scheduler()
+        subscription = Subscription('token', 1)
+        scheduler.add(subscription, now=0)
+        deadlines = []
+        for _ in range(5):
+            scheduler.reschedule(subscription, PollOutcome.FAILED, now=0)
+            deadlines.append(scheduler.next_deadline())
+        assert deadlines == [600, 1200, 2400, 3600, 3600], (
+            'Проверьте, что после ошибок интервал растёт экспоненциально'
+        )
+        scheduler.reschedule(subscription, PollOutcome.SHED, now=0)
+        assert scheduler.next_deadline() == 3600, (
+            'Проверьте, что пропущенный опрос не сбрасывает backoff'
+        )
+        scheduler.reschedule(subscription, PollOutcome.UNCHANGED, now=0)
+        assert scheduler.next_deadline() == 600
+
+    def test_quiet_subscription_is_polled_rarely(self):
+        scheduler = self.make_scheduler()
+        subscription = Subscription('token', 1)
+        scheduler.add(subscription, now=0)
+        scheduler.reschedule(
+            subscription, PollOutcome.UNCHANGED, now=86400
+        )
+        assert scheduler.next_deadline() == 86400 + 1800
+
+
+class TestTokenBucket:
+
+    def test_budget_is_respected(self):
+        now = [0]
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+        delays = [bucket.reserve() for _ in range(4)]
+        assert delays == [0, 0, 0.5, 1.0], (
+            'Проверьте, что запросы сверх бюджета откладываются'
+        )
+        now[0] = 10
+        assert bucket.reserve() == 0
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from exceptions import ResponseFormatError
+from records import Homework, HomeworkStatus, compile_templates
+from schema import parse_response
+
+BACKENDS = [True, False]
+
+
+def dump(data):
+    return json.dumps(data).encode()
+
+
+class TestParseResponse:
+
+    @pytest.mark.parametrize('fast', BACKENDS)
+    def test_records_are_built(self, fast):
+        content = dump({
+            'homeworks': [
+                {'id': 7, 'homework_name': 'hw7', 'status': 'approved',
+                 'date_updated': '2022-01-01T00:00:00Z', 'lesson_name': 'x'},
+                {'homework_name': 'hw8', 'status': 'reviewing'},
+            ],
+            'current_date': 100,
+        })
+        current_date, homeworks = parse_response(content, fast)
+        assert current_date == 100
+        assert homeworks == [
+            Homework('7', 'hw7', 'approved', '2022-01-01T00:00:00Z'),
+            Homework('hw8', 'hw8', 'reviewing'),
+        ], 'Проверьте, что работы превращаются в записи Homework'
+
+    @pytest.mark.parametrize('fast', BACKENDS)
+    @pytest.mark.parametrize('data', [
+        [],
+        {},
+        {'current_date': 1},
+        {'homeworks': []},
+        {'homeworks': {}, 'current_date': 1},
+        {'homeworks': [], 'current_date': '1'},
+        {'homeworks': [1], 'current_date': 1},
+        {'homeworks': [{'homework_name': 'hw'}], 'current_date': 1},
+        {'homeworks': [{'status': 'approved'}], 'current_date': 1},
+        {'homeworks': [{'homework_name': 'hw', 'status': 'lost'}],
+         'current_date': 1},
+    ])
+    def test_invalid_response_is_rejected(self, fast, data):
+        with pytest.raises(ResponseFormatError):
+            parse_response(dump(data), fast)
+
+    @pytest.mark.parametrize('fast', BACKENDS)
+    def test_not_json_is_rejected(self, fast):
+        with pytest.raises(ResponseFormatError):
+            parse_response(b'<html>', fast)
+
+    def test_record_is_immutable(self):
+        homework = Homework('1', 'hw', 'approved')
+        with pytest.raises(AttributeError):
+            homework.status = 'rejected'
+
+    @pytest.mark.parametrize('fast', BACKENDS)
+    def test_status_is_enum(self, fast):
+        _, homeworks = parse_response(dump({
+            'homeworks': [{'homework_name': 'hw', 'status': 'rejected'}],
+            'current_date': 1,
+        }), fast)
+        assert homeworks[0].status is HomeworkStatus.REJECTED
+
+
+class TestTemplates:
+
+    def test_render(self):
+        templates = compile_templates({'approved': 'Ура!'})
+        homework = Homework('1', 'hw1', HomeworkStatus.APPROVED)
+        assert homework.render(templates) == (
+            'Изменился статус проверки работы "hw1". Ура!'
+        )
+        assert templates['approved']('hw2').endswith('Ура!'), (
+            'Проверьте, что шаблоны доступны и по строковому статусу'
+        )
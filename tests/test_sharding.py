@@ -0,0 +1,126 @@
+import multiprocessing
+import sys
+
+from fixtures.fakes import FakeOutbox
+from sharding import (HashRing, Ownership, Supervisor, lease_shard,
+                      shard_key)
+from state import MemoryStateStore
+from subscriptions import Subscription
+
+CONTEXT = multiprocessing.get_context('fork')
+
+
+def record_rings(name, connection, rings):
+    while True:
+        message = connection.recv()
+        if message[0] == 'stop':
+            return
+        rings.put((name, message[1]))
+
+
+def crash(name, connection):
+    sys.exit(1)
+
+
+class TestHashRing:
+
+    def test_keys_are_spread_and_move_little(self):
+        keys = [str(number) for number in range(2000)]
+        ring = HashRing(['worker-0', 'worker-1', 'worker-2'])
+        before = {key: ring.node_for(key) for key in keys}
+        counts = [list(before.values()).count(node) for node in ring.nodes]
+        assert min(counts) > 400, (
+            'Проверьте, что ключи распределяются по узлам равномерно'
+        )
+
+        ring.add('worker-3')
+        moved = [key for key in keys if ring.node_for(key) != before[key]]
+        assert all(ring.node_for(key) == 'worker-3' for key in moved), (
+            'Проверьте, что ключи переезжают только на новый узел'
+        )
+        assert len(moved) < len(keys) / 2
+
+    def test_subscriptions_of_one_chat_share_a_shard(self):
+        ring = HashRing(['worker-0', 'worker-1'])
+        first, second = Subscription('a', 7), Subscription('b', 7)
+        assert (
+            ring.node_for(shard_key(first))
+            == ring.node_for(shard_key(second))
+        )
+
+    def test_empty_ring(self):
+        assert HashRing().node_for('key') is None
+
+
+class TestSupervisor:
+
+    def test_workers_get_ring_and_rebalance(self):
+        rings = CONTEXT.Queue()
+        supervisor = Supervisor(record_rings, (rings,), CONTEXT)
+        supervisor.start(2)
+        received = dict(rings.get(timeout=10) for _ in range(2))
+        assert received == {
+            'worker-0': ['worker-0', 'worker-1'],
+            'worker-1': ['worker-0', 'worker-1'],
+        }, 'Проверьте, что каждый воркер получает состав кольца'
+
+        supervisor.add_worker()
+        received = dict(rings.get(timeout=10) for _ in range(3))
+        assert set(received['worker-0']) == {
+            'worker-0', 'worker-1', 'worker-2'
+        }, 'Проверьте, что при добавлении воркера шарды перераспределяются'
+
+        supervisor.stop()
+        assert supervisor.run(poll_interval=0.1, stop_timeout=5)
+        assert supervisor.workers == []
+
+    def test_crashing_worker_leaves_ring(self):
+        supervisor = Supervisor(crash, context=CONTEXT, max_restarts=1)
+        supervisor.start(1)
+        assert not supervisor.run(poll_interval=0.1), (
+            'Проверьте, что супервизор без воркеров сообщает о сбое'
+        )
+        assert len(supervisor.ring) == 0, (
+            'Проверьте, что постоянно падающий воркер снимается с кольца'
+        )
+
+
+class TestOwnership:
+
+    def test_ring_and_leases_are_combined(self):
+        subscriptions = [Subscription('token', chat) for chat in range(50)]
+        ownership = Ownership('worker-0', frozenset(), shards=4)
+        assert not any(map(ownership.owns, subscriptions)), (
+            'Проверьте, что до получения кольца и аренд подписки не берутся'
+        )
+        ownership.ring = HashRing(['worker-0', 'worker-1'])
+        ownership.leases = frozenset({0, 1})
+        owned = [s for s in subscriptions if ownership.owns(s)]
+        assert owned and all(
+            ownership.ring.node_for(shard_key(s)) == 'worker-0'
+            and lease_shard(s, 4) in {0, 1}
+            for s in owned
+        )
+
+    def test_saved_messages_go_to_chat_owner(self, homework):
+        store = MemoryStateStore()
+        messages = [(chat_id, 'текст') for chat_id in range(20)]
+        store.save_messages(messages + [('admin', 'сбой')])
+        ring = HashRing(['worker-0', 'worker-1'])
+        restored = {}
+        for name in ring.nodes:
+            ownership = Ownership(name)
+            ownership.ring = ring
+            outbox = FakeOutbox()
+            homework.restore_outbox(outbox, store, ownership.owns_chat)
+            restored[name] = outbox.sent
+        assert all(
+            ring.node_for(str(chat_id)) == name
+            for name, sent in restored.items() for chat_id, _ in sent
+        ), 'Проверьте, что воркер восстанавливает только сообщения своих чатов'
+        assert sorted(
+            restored['worker-0'] + restored['worker-1'], key=str
+        ) == sorted(messages + [('admin', 'сбой')], key=str)
+
+    def test_without_ring_and_leases_everything_is_owned(self):
+        assert Ownership().owns(Subscription('token', 1))
@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from breaker import BreakerState, CircuitBreaker
+from fixtures.fakes import FakeOutbox, FakeSession
+from metrics import CHECK_RESPONSE_FAILURES
+from scheduler import PollOutcome, Scheduler
+from singleflight import SingleFlight
+from state import MemoryStateStore
+from subscriptions import Subscription
+
+
+class SlowSession(FakeSession):
+
+    def __init__(self, homeworks=None):
+        if homeworks is None:
+            homeworks = [{'homework_name': 'hw', 'status': 'approved'}]
+        super().__init__(homeworks, current_date=100)
+
+    def get(self, **kwargs):
+        # Ждём, пока остальные опросы тоже дойдут до запроса.
+        threading.Event().wait(0.2)
+        return super().get(**kwargs)
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_result(self):
+        flights = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return 'ответ'
+
+        with ThreadPoolExecutor(5) as executor:
+            leader = executor.submit(flights.do, 'key', func)
+            started.wait(2)
+            followers = [
+                executor.submit(flights.do, 'key', func) for _ in range(4)
+            ]
+            threading.Event().wait(0.05)
+            release.set()
+            results = [leader.result()] + [
+                future.result() for future in followers
+            ]
+        assert results == ['ответ'] * 5
+        assert calls == [1], 'Проверьте, что одинаковые вызовы объединяются'
+        assert len(flights) == 0
+
+    def test_error_is_shared_and_not_cached(self):
+        flights = SingleFlight()
+        with pytest.raises(ValueError):
+            flights.do('key', lambda: int('не число'))
+        assert flights.do('key', lambda: 1) == 1, (
+            'Проверьте, что завершённый вызов не кэшируется'
+        )
+
+
+class TestCoalescedPolls:
+
+    def test_same_token_polls_make_one_request(self, homework):
+        store = MemoryStateStore()
+        subscriptions = [Subscription('token', chat_id) for chat_id in (1, 2)]
+        for subscription in subscriptions:
+            homework.prepare_subscription(store, subscription, 50)
+        session = SlowSession()
+        outbox = FakeOutbox()
+        flights = SingleFlight()
+
+        with ThreadPoolExecutor(len(subscriptions)) as executor:
+            outcomes = list(executor.map(
+                lambda subscription: homework.poll_subscription(
+                    outbox, session, store, CircuitBreaker(), subscription,
+                    flights,
+                ),
+                subscriptions,
+            ))
+        assert outcomes == [PollOutcome.CHANGED] * 2
+        assert len(session.calls) == 1, (
+            'Проверьте, что одновременные опросы одного токена делают '
+            'один запрос к API'
+        )
+        assert sorted(chat_id for chat_id, _ in outbox.sent) == [1, 2], (
+            'Проверьте, что ответ доходит до всех чатов токена'
+        )
+        assert [s.from_date for s in subscriptions] == [100, 100]
+
+    def test_malformed_response_counts_once(self, homework):
+        store = MemoryStateStore()
+        subscriptions = [
+            Subscription('token', chat_id) for chat_id in (1, 2, 3)
+        ]
+        for subscription in subscriptions:
+            homework.prepare_subscription(store, subscription, 50)
+        session = SlowSession([{'status': 'approved'}])
+        breaker = CircuitBreaker(3)
+        flights = SingleFlight()
+        failures = CHECK_RESPONSE_FAILURES.value
+
+        with ThreadPoolExecutor(len(subscriptions)) as executor:
+            outcomes = list(executor.map(
+                lambda subscription: homework.poll_subscription(
+                    FakeOutbox(), session, store, breaker, subscription,
+                    flights,
+                ),
+                subscriptions,
+            ))
+        assert outcomes == [PollOutcome.FAILED] * 3
+        assert len(session.calls) == 1
+        assert CHECK_RESPONSE_FAILURES.value == failures + 1, (
+            'Проверьте, что битый общий ответ разбирается один раз'
+        )
+        assert breaker.state is BreakerState.CLOSED, (
+            'Проверьте, что один общий запрос засчитывается '
+            'предохранителю один раз'
+        )
+
+    def test_same_token_shares_slot(self):
+        scheduler = Scheduler(600)
+        assert scheduler.offset(Subscription('token', 1)) == (
+            scheduler.offset(Subscription('token', 2))
+        ), 'Проверьте, что подписки одного токена опрашиваются вместе'
@@ -0,0 +1,74 @@
+from state import MemoryStateStore, SQLiteStateStore, open_state_store
+
+
+class TestStateStore:
+
+    def test_sqlite_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.db')
+        store = SQLiteStateStore(path)
+        store.set_cursor('sub', 1000)
+        store.set_homework('sub', 'hw1', 'reviewing', '2022-01-01T00:00:00Z')
+        store.close()
+
+        store = SQLiteStateStore(path)
+        assert store.get_cursor('sub') == 1000, (
+            'Проверьте, что курсор from_date сохраняется между запусками'
+        )
+        assert store.get_homeworks('sub') == {
+            'hw1': ('reviewing', '2022-01-01T00:00:00Z')
+        }
+        store.close()
+
+    def test_writes_are_batched(self, tmp_path):
+        now = [0]
+        store = SQLiteStateStore(
+            str(tmp_path / 'state.db'), batch_size=3, flush_interval=60,
+            clock=lambda: now[0],
+        )
+        store.set_cursor('a', 1)
+        store.set_cursor('b', 2)
+        assert store.pending == 2, (
+            'Проверьте, что изменения копятся в буфере до сброса'
+        )
+        store.set_homework('a', 'hw', 'approved')
+        assert store.pending == 0
+        store.set_cursor('a', 3)
+        now[0] = 61
+        store.set_cursor('b', 4)
+        assert store.pending == 0, (
+            'Проверьте, что буфер сбрасывается по истечении интервала'
+        )
+        store.close()
+
+    def test_memory_backend(self):
+        store = open_state_store(':memory:')
+        assert isinstance(store, MemoryStateStore)
+        store.set_homework('sub', 'hw', 'approved')
+        assert store.get_homeworks('sub') == {'hw': ('approved', None)}
+
+    def test_undelivered_messages_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'state.db')
+        store = SQLiteStateStore(path)
+        store.save_messages([(1, 'первое'), ('chat', 'второе')])
+        store.close()
+
+        store = SQLiteStateStore(path)
+        assert store.take_messages() == [(1, 'первое'), ('chat', 'второе')], (
+            'Проверьте, что недоставленные сообщения сохраняются '
+            'между запусками'
+        )
+        assert store.take_messages() == [], (
+            'Проверьте, что сообщения выдаются только один раз'
+        )
+        store.close()
+
+    def test_messages_are_taken_by_chat(self, tmp_path):
+        for store in (
+            MemoryStateStore(), SQLiteStateStore(str(tmp_path / 'state.db'))
+        ):
+            store.save_messages([(1, 'первое'), (2, 'второе'), (1, 'третье')])
+            assert store.take_messages(lambda chat_id: chat_id == 1) == [
+                (1, 'первое'), (1, 'третье'),
+            ], 'Проверьте, что забираются только сообщения выбранных чатов'
+            assert store.take_messages() == [(2, 'второе')]
+            store.close()
@@ -0,0 +1,118 @@
+import datetime
+
+from metrics import TIMELINE_DROPPED, TIMELINE_WRITE_ERRORS
+from records import Homework, HomeworkStatus
+from timeline import Timeline, TimelineEvent, parse_time
+
+DAY = 24 * 60 * 60
+
+
+def make_homework(number, status, at):
+    moment = datetime.datetime.fromtimestamp(at, datetime.timezone.utc)
+    return Homework(
+        str(number), f'hw{number}', status,
+        moment.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    )
+
+
+class TestTimeline:
+
+    def test_history_is_newest_first(self, tmp_path):
+        timeline = Timeline(str(tmp_path / 'timeline.db'))
+        timeline.append(1, make_homework(1, 'reviewing', DAY))
+        timeline.append(1, make_homework(1, 'approved', 2 * DAY))
+        timeline.append(1, make_homework(2, 'reviewing', 3 * DAY))
+        timeline.append(2, make_homework(1, 'rejected', 4 * DAY))
+
+        assert timeline.history(1) == [
+            TimelineEvent('hw2', HomeworkStatus.REVIEWING, 3 * DAY),
+            TimelineEvent('hw1', HomeworkStatus.APPROVED, 2 * DAY),
+            TimelineEvent('hw1', HomeworkStatus.REVIEWING, DAY),
+        ], 'Проверьте, что история чата отдаётся от новых событий к старым'
+        assert timeline.history(1, homework='1', limit=1) == [
+            TimelineEvent('hw1', HomeworkStatus.APPROVED, 2 * DAY),
+        ]
+        timeline.close()
+
+    def test_events_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'timeline.db')
+        timeline = Timeline(path, flush_interval=60)
+        timeline.append('chat', make_homework(1, 'approved', DAY))
+        timeline.close()
+
+        timeline = Timeline(path)
+        assert len(timeline.history('chat')) == 1, (
+            'Проверьте, что буфер событий сбрасывается при закрытии'
+        )
+        timeline.close()
+
+    def test_write_error_keeps_events(self):
+        timeline = Timeline(':memory:', batch_size=1)
+        timeline._connection.execute(
+            'CREATE TRIGGER broken BEFORE INSERT ON events '
+            "BEGIN SELECT RAISE(ABORT, 'диск переполнен'); END"
+        )
+        errors = TIMELINE_WRITE_ERRORS.value
+        timeline.append(1, make_homework(1, 'reviewing', DAY))
+        assert TIMELINE_WRITE_ERRORS.value == errors + 1, (
+            'Проверьте, что ошибка записи журнала не выходит наружу '
+            'и учитывается в метрике'
+        )
+
+        timeline._connection.execute('DROP TRIGGER broken')
+        assert timeline.history(1) == [
+            TimelineEvent('hw1', HomeworkStatus.REVIEWING, DAY),
+        ], 'Проверьте, что события после сбоя записываются следующим разом'
+        timeline.close()
+
+    def test_buffer_is_capped_while_writes_fail(self):
+        now = [0]
+        timeline = Timeline(
+            ':memory:', batch_size=1, flush_interval=5, max_pending=3,
+            clock=lambda: now[0],
+        )
+        timeline._connection.execute(
+            'CREATE TRIGGER broken BEFORE INSERT ON events '
+            "BEGIN SELECT RAISE(ABORT, 'диск переполнен'); END"
+        )
+        errors = TIMELINE_WRITE_ERRORS.value
+        dropped = TIMELINE_DROPPED.value
+        for number in range(5):
+            timeline.append(1, make_homework(number, 'reviewing', DAY))
+        assert TIMELINE_WRITE_ERRORS.value == errors + 1, (
+            'Проверьте, что после сбоя запись повторяется не на каждое '
+            'событие, а раз в flush_interval'
+        )
+        assert TIMELINE_DROPPED.value == dropped + 2, (
+            'Проверьте, что буфер не растёт больше max_pending'
+        )
+
+        timeline._connection.execute('DROP TRIGGER broken')
+        now[0] = 5
+        timeline.append(1, make_homework(5, 'reviewing', DAY))
+        assert [event.name for event in timeline.history(1)] == [
+            'hw5', 'hw4', 'hw3',
+        ], 'Проверьте, что после сбоя записываются последние события'
+        timeline.close()
+
+    def test_review_stats(self):
+        timeline = Timeline(':memory:')
+        timeline.append(1, make_homework(1, 'reviewing', 0))
+        timeline.append(1, make_homework(1, 'rejected', DAY))
+        timeline.append(1, make_homework(1, 'reviewing', 2 * DAY))
+        timeline.append(1, make_homework(1, 'approved', 5 * DAY))
+        timeline.append(1, make_homework(2, 'reviewing', 6 * DAY))
+
+        stats = timeline.review_stats(1)
+        assert stats.count == 2
+        assert stats.average == 2 * DAY
+        assert stats.longest == 3 * DAY
+        assert stats.pending == 1, (
+            'Проверьте, что работы на ревью не попадают в среднее время'
+        )
+        assert timeline.review_stats(2).average is None
+
+    def test_parse_time(self):
+        assert parse_time('1970-01-02T00:00:00Z', None) == DAY
+        assert parse_time(None, 5) == 5
+        assert parse_time('вчера', 5) == 5
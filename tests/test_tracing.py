@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+import tracing
+from breaker import CircuitBreaker
+from fixtures.fakes import FakeOutbox, FakeSession
+from state import MemoryStateStore
+from subscriptions import Subscription
+
+
+class ListExporter:
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class TracedSession(FakeSession):
+
+    def __init__(self):
+        super().__init__(
+            [{'homework_name': 'hw', 'status': 'reviewing'}], current_date=100
+        )
+
+    def get(self, **kwargs):
+        with tracing.span('http.wait'):
+            return super().get(**kwargs)
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracing.configure(tracing.Tracer(exporter))
+    yield exporter
+    tracing.configure(None)
+
+
+class TestTracer:
+
+    def test_spans_nest_inside_trace(self, exporter):
+        with tracing.span('outside'):
+            pass
+        with pytest.raises(ValueError):
+            with tracing.trace('poll', chat_id=1):
+                with tracing.span('api.request') as span:
+                    span.set('http.status_code', 200)
+                raise ValueError('сбой')
+        assert [span.name for span in exporter.spans] == [
+            'api.request', 'poll'
+        ], 'Проверьте, что спаны вне трассы не пишутся'
+        child, root = exporter.spans
+        assert child.trace_id == root.trace_id
+        assert child.parent_id == root.span_id
+        assert root.parent_id is None
+        assert root.error == 'ValueError: сбой'
+        assert child.start >= root.start and child.end <= root.end
+
+    def test_disabled_and_unsampled_traces_are_free(self, exporter):
+        tracing.configure(None)
+        assert tracing.trace('poll') is tracing.NOOP_SPAN
+        tracing.configure(tracing.Tracer(exporter, sample_rate=0))
+        with tracing.trace('poll'):
+            assert tracing.span('api.request') is tracing.NOOP_SPAN, (
+                'Проверьте, что этапы трассы вне выборки не создают спанов'
+            )
+        assert exporter.spans == []
+
+    def test_file_is_otlp_json(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        exporter = tracing.OtlpFileExporter(str(path), batch_size=2)
+        tracer = tracing.Tracer(exporter)
+        with tracer.trace('poll', {'chat_id': 1}):
+            with tracer.span('api.parse', {}):
+                pass
+        exporter.close()
+        lines = path.read_text().splitlines()
+        assert len(lines) == 1
+        resource = json.loads(lines[0])['resourceSpans'][0]
+        assert resource['resource']['attributes'][0]['value'] == {
+            'stringValue': 'homework_bot'
+        }
+        spans = resource['scopeSpans'][0]['spans']
+        assert [span['name'] for span in spans] == ['api.parse', 'poll']
+        assert len(spans[1]['traceId']) == 32
+        assert len(spans[1]['spanId']) == 16
+        assert spans[0]['parentSpanId'] == spans[1]['spanId']
+        assert spans[1]['attributes'] == [
+            {'key': 'chat_id', 'value': {'intValue': '1'}}
+        ]
+
+
+class TestPollStages:
+
+    def test_poll_has_stage_spans(self, exporter, homework):
+        store = MemoryStateStore()
+        subscription = Subscription('token', 1)
+        homework.prepare_subscription(store, subscription, 50)
+        homework.poll_subscription(
+            FakeOutbox(), TracedSession(), store, CircuitBreaker(),
+            subscription,
+        )
+        spans = {span.name: span for span in exporter.spans}
+        assert set(spans) == {
+            'poll', 'api.request', 'http.wait', 'api.parse', 'status.notify'
+        }, 'Проверьте, что у опроса есть спаны всех этапов'
+        assert spans['http.wait'].parent_id == spans['api.request'].span_id
+        assert spans['poll'].attributes['outcome'] == 'changed'
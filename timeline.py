@@ -0,0 +1,234 @@
+"""История смен статусов работ в SQLite."""
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from metrics import TIMELINE_DROPPED, TIMELINE_WRITE_ERRORS
+from records import HomeworkStatus
+
+logger = logging.getLogger('homework_bot.timeline')
+
+STATUSES = tuple(HomeworkStatus)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+FINAL_STATUSES = frozenset((HomeworkStatus.APPROVED, HomeworkStatus.REJECTED))
+
+
+def parse_time(value, default):
+    """date_updated из ответа API в секундах эпохи или default."""
+    if not value:
+        return default
+    try:
+        moment = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    except ValueError:
+        return default
+    return int(moment.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+class TimelineEvent:
+    """Смена статуса работы: название, статус и время в секундах эпохи."""
+
+    __slots__ = ('name', 'status', 'at')
+
+    def __init__(self, name, status, at):
+        """Событие работы name."""
+        self.name = name
+        self.status = status
+        self.at = at
+
+    def __eq__(self, other):
+        """События равны, если совпадают все поля."""
+        if not isinstance(other, TimelineEvent):
+            return NotImplemented
+        return (self.name, self.status, self.at) == (
+            other.name, other.status, other.at
+        )
+
+    def __repr__(self):
+        """Отладочное представление события."""
+        return (
+            f'TimelineEvent({self.name!r}, {self.status.value!r}, {self.at})'
+        )
+
+
+class ReviewStats:
+    """Время ревью по чату.
+
+    count - завершённых ревью, average и longest - среднее и самое
+    долгое в секундах (None, если ревью не было), pending - работ,
+    которые сейчас на ревью.
+    """
+
+    __slots__ = ('count', 'average', 'longest', 'pending')
+
+    def __init__(self, count, average, longest, pending):
+        """Статистика из готовых значений."""
+        self.count = count
+        self.average = average
+        self.longest = longest
+        self.pending = pending
+
+
+class Timeline:
+    """Журнал смен статусов: записи только дописываются.
+
+    Событие - строка из чата, работы, статуса и времени с индексами
+    по чату и по работе; названия работ хранятся один раз в отдельной
+    таблице. chat_id хранится строкой: из env и из Telegram один
+    и тот же чат приходит то строкой, то числом. Записи копятся
+    в буфере и пишутся пачками, как в StateStore; запросы сначала
+    сбрасывают буфер. Ошибка SQLite не выходит наружу: она пишется
+    в лог, а события остаются в буфере и записываются следующей
+    попыткой, не чаще раза в flush_interval секунд, так что сбой
+    журнала не мешает опросу и уведомлениям. В буфере не больше
+    max_pending событий, при переполнении вытесняются самые старые.
+    Путь ':memory:' держит журнал в памяти.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS homeworks ('
+        'id INTEGER PRIMARY KEY, key TEXT, name TEXT, UNIQUE (key, name))',
+        'CREATE TABLE IF NOT EXISTS events ('
+        'chat_id TEXT, homework INTEGER, status INTEGER, at INTEGER)',
+        'CREATE INDEX IF NOT EXISTS events_by_chat ON events (chat_id, at)',
+        'CREATE INDEX IF NOT EXISTS events_by_homework '
+        'ON events (homework, at)',
+    )
+
+    def __init__(self, path, batch_size=500, flush_interval=5.0,
+                 max_pending=50000, mmap_size=64 * 1024 * 1024,
+                 clock=time.monotonic):
+        """Открывает журнал path и создаёт таблицы."""
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._pending = deque()
+        self._failing = False
+        self._ids = {}
+        self._flushed_at = clock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        with self._connection:
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
+
+    def append(self, chat_id, homework, now=None):
+        """Дописывает смену статуса работы Homework в чате."""
+        now = int(time.time()) if now is None else now
+        with self._lock:
+            self._pending.append((
+                str(chat_id), homework.key, homework.name,
+                STATUS_CODES[homework.status],
+                parse_time(homework.date_updated, now),
+            ))
+            if len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                TIMELINE_DROPPED.inc()
+            if (
+                len(self._pending) >= self.batch_size and not self._failing
+                or self.clock() - self._flushed_at >= self.flush_interval
+            ):
+                self.flush()
+
+    def flush(self):
+        """Записывает накопленные события одной транзакцией.
+
+        Возвращает False, если запись не удалась и события остались
+        в буфере.
+        """
+        with self._lock:
+            if self._pending:
+                try:
+                    with self._connection:
+                        rows = [
+                            (chat_id, self._homework_id(key, name), code, at)
+                            for chat_id, key, name, code, at in self._pending
+                        ]
+                        self._connection.executemany(
+                            'INSERT INTO events VALUES (?, ?, ?, ?)', rows
+                        )
+                except sqlite3.Error as error:
+                    # id работ из откатившейся транзакции недействительны.
+                    self._ids.clear()
+                    self._failing = True
+                    self._flushed_at = self.clock()
+                    TIMELINE_WRITE_ERRORS.inc()
+                    logger.error(
+                        f'Не удалось записать в журнал статусов '
+                        f'{len(self._pending)} событий - {error}'
+                    )
+                    return False
+                self._pending.clear()
+                self._failing = False
+            self._flushed_at = self.clock()
+            return True
+
+    def history(self, chat_id, homework=None, limit=20):
+        """Последние события чата, новые первыми.
+
+        homework - ключ работы, чтобы получить историю только её.
+        """
+        query = (
+            'SELECT h.name, e.status, e.at FROM events e '
+            'JOIN homeworks h ON h.id = e.homework WHERE e.chat_id = ?'
+        )
+        params = [str(chat_id)]
+        if homework is not None:
+            query += ' AND h.key = ?'
+            params.append(homework)
+        query += ' ORDER BY e.at DESC, e.rowid DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            self.flush()
+            rows = self._connection.execute(query, params).fetchall()
+        return [
+            TimelineEvent(name, STATUSES[code], at) for name, code, at in rows
+        ]
+
+    def review_stats(self, chat_id):
+        """Сколько длились ревью работ чата: от reviewing до вердикта."""
+        with self._lock:
+            self.flush()
+            rows = self._connection.execute(
+                'SELECT homework, status, at FROM events WHERE chat_id = ? '
+                'ORDER BY homework, at, rowid', (str(chat_id),)
+            ).fetchall()
+        durations = []
+        started = {}
+        for homework, code, at in rows:
+            status = STATUSES[code]
+            if status is HomeworkStatus.REVIEWING:
+                started.setdefault(homework, at)
+            elif status in FINAL_STATUSES and homework in started:
+                durations.append(at - started.pop(homework))
+        if not durations:
+            return ReviewStats(0, None, None, len(started))
+        return ReviewStats(
+            len(durations), sum(durations) / len(durations), max(durations),
+            len(started),
+        )
+
+    def close(self):
+        """Сбрасывает буфер и закрывает базу."""
+        self.flush()
+        self._connection.close()
+
+    def _homework_id(self, key, name):
+        homework_id = self._ids.get((key, name))
+        if homework_id is None:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO homeworks (key, name) VALUES (?, ?)',
+                (key, name),
+            )
+            homework_id = self._ids[(key, name)] = self._connection.execute(
+                'SELECT id FROM homeworks WHERE key = ? AND name = ?',
+                (key, name),
+            ).fetchone()[0]
+        return homework_id
@@ -0,0 +1,264 @@
+"""Трассировка этапов опроса с выгрузкой в формате OTLP JSON."""
+import json
+import random
+import threading
+import time
+
+SERVICE_NAME = 'homework_bot'
+SPAN_KIND_INTERNAL = 1
+STATUS_ERROR = 2
+
+_tracer = None
+
+
+class _NoopSpan:
+    """Пустой спан: его отдают, когда трассировка выключена."""
+
+    __slots__ = ()
+
+    def set(self, key, value):
+        """Атрибуты пустого спана не сохраняются."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Этап работы: имя, время начала и конца в наносекундах эпохи."""
+
+    __slots__ = (
+        'tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'attributes',
+        'start', 'end', 'error',
+    )
+
+    def __init__(self, tracer, trace_id, parent_id, name, attributes,
+                 start=None):
+        """Открывает спан name трассы trace_id."""
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = tracer.new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = tracer.clock() if start is None else start
+        self.end = None
+        self.error = None
+
+    def set(self, key, value):
+        """Добавляет атрибут спана."""
+        self.attributes[key] = value
+
+    def __enter__(self):
+        """Делает спан текущим в потоке."""
+        self.tracer.stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        """Закрывает спан; исключение отмечается в нём как ошибка."""
+        if exc is not None:
+            self.error = f'{exc_type.__name__}: {exc}'
+        self.tracer.stack().pop()
+        self.finish()
+        return False
+
+    def finish(self, end=None):
+        """Закрывает спан и отдаёт его экспортёру."""
+        self.end = self.tracer.clock() if end is None else end
+        self.tracer.exporter.export(self)
+
+
+class Tracer:
+    """Создаёт спаны и следит за текущим спаном потока.
+
+    Корневой спан (trace) попадает в выборку с вероятностью sample_rate;
+    спаны этапов (span) пишутся только внутри отобранного корневого, так
+    что вне выборки они ничего не стоят.
+    """
+
+    def __init__(self, exporter, sample_rate=1.0, rand=random.random,
+                 clock=time.time_ns):
+        """Трассировщик, отдающий спаны в exporter."""
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.rand = rand
+        self.clock = clock
+        self._local = threading.local()
+        self._ids = random.Random()
+
+    def new_id(self, bits):
+        """Случайный идентификатор в шестнадцатеричном виде."""
+        return format(self._ids.getrandbits(bits), f'0{bits // 4}x')
+
+    def stack(self):
+        """Открытые спаны текущего потока."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def trace(self, name, attributes):
+        """Корневой спан или дочерний, если поток уже внутри трассы."""
+        stack = self.stack()
+        if stack:
+            return self._child(stack[-1], name, attributes)
+        if self.rand() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(self, self.new_id(128), None, name, attributes)
+
+    def span(self, name, attributes):
+        """Дочерний спан текущего спана или пустой вне трассы."""
+        stack = self.stack()
+        if not stack:
+            return NOOP_SPAN
+        return self._child(stack[-1], name, attributes)
+
+    def record(self, name, start, end, attributes):
+        """Спан уже прошедшего этапа с известными началом и концом."""
+        stack = self.stack()
+        if stack:
+            parent = stack[-1]
+            Span(
+                self, parent.trace_id, parent.span_id, name, attributes,
+                start,
+            ).finish(end)
+
+    def active(self):
+        """Идёт ли в текущем потоке отобранная трасса."""
+        return bool(getattr(self._local, 'stack', None))
+
+    def _child(self, parent, name, attributes):
+        return Span(self, parent.trace_id, parent.span_id, name, attributes)
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+
+def encode_span(span):
+    """Спан в виде объекта OTLP JSON."""
+    encoded = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': SPAN_KIND_INTERNAL,
+        'startTimeUnixNano': str(span.start),
+        'endTimeUnixNano': str(span.end),
+        'attributes': [
+            _attribute(key, value) for key, value in span.attributes.items()
+        ],
+    }
+    if span.parent_id is not None:
+        encoded['parentSpanId'] = span.parent_id
+    if span.error is not None:
+        encoded['status'] = {'code': STATUS_ERROR, 'message': span.error}
+    return encoded
+
+
+class OtlpFileExporter:
+    """Пишет спаны в файл строками OTLP JSON.
+
+    Каждая строка - запрос ExportTraceServiceRequest, как у файлового
+    экспортёра коллектора OpenTelemetry, поэтому файл читает приёмник
+    otlpjsonfile. Спаны копятся в буфере и пишутся пачками
+    по batch_size или раз в flush_interval секунд.
+    """
+
+    def __init__(self, path, batch_size=512, flush_interval=5.0,
+                 service=SERVICE_NAME, clock=time.monotonic):
+        """Открывает файл path на дозапись."""
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.service = service
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flushed_at = clock()
+        self._file = open(path, 'a', encoding='UTF-8')
+
+    def export(self, span):
+        """Ставит закрытый спан в очередь на запись."""
+        with self._lock:
+            self._pending.append(span)
+            if (
+                len(self._pending) >= self.batch_size
+                or self.clock() - self._flushed_at >= self.flush_interval
+            ):
+                self._flush()
+
+    def flush(self):
+        """Записывает накопленные спаны."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Сбрасывает буфер и закрывает файл."""
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+    def _flush(self):
+        self._flushed_at = self.clock()
+        if not self._pending:
+            return
+        request = {'resourceSpans': [{
+            'resource': {'attributes': [
+                _attribute('service.name', self.service)
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': SERVICE_NAME},
+                'spans': [encode_span(span) for span in self._pending],
+            }],
+        }]}
+        self._pending = []
+        self._file.write(json.dumps(request, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+
+def configure(tracer):
+    """Включает трассировку; None выключает."""
+    global _tracer
+    _tracer = tracer
+
+
+def trace(name, **attributes):
+    """Корневой спан, например опроса подписки."""
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.trace(name, attributes)
+
+
+def span(name, **attributes):
+    """Спан этапа внутри текущей трассы."""
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, attributes)
+
+
+def record(name, start, end, **attributes):
+    """Спан прошедшего этапа; start и end - time.time_ns()."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.record(name, start, end, attributes)
+
+
+def active():
+    """Пишется ли сейчас трасса в этом потоке."""
+    tracer = _tracer
+    return tracer is not None and tracer.active()